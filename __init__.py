@@ -45,6 +45,7 @@ def register():
     from .source.model.material import texture
     texture.register()
 
+    # Only reads the cached result, any check of github runs on a background thread.
     from .source.updater.version_check import check_for_newer_version
     check_for_newer_version()
 
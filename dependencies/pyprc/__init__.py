@@ -2,14 +2,31 @@
 # These builds are extracted from the wheels published here:
 # https://github.com/BenHall-7/pyprc/releases
 # TODO: There may be an easier way in future Blender versions.
+# The binary is only loaded on first use, so registering the addon doesn't load it.
 from sys import platform
-if platform.startswith('win'):
-    from .win.pyprc import *
-elif platform.startswith('lin'):
-    from .linux.pyprc import *
-elif platform.startswith('dar'):
-    try:
-        # The Apple Silicon wheel is built manually from source.
-        from .macos.arm64.pyprc import *
-    except:
-        from .macos.x86.pyprc import *
\ No newline at end of file
+
+def _load():
+    if platform.startswith('win'):
+        from .win import pyprc as module
+    elif platform.startswith('lin'):
+        from .linux import pyprc as module
+    elif platform.startswith('dar'):
+        try:
+            # The Apple Silicon wheel is built manually from source.
+            from .macos.arm64 import pyprc as module
+        except:
+            from .macos.x86 import pyprc as module
+    else:
+        raise ImportError(f'No pyprc binary is available for platform {platform}')
+    globals().update({k: v for k, v in vars(module).items() if not k.startswith('__')})
+    globals()['_loaded'] = True
+
+_loaded = False
+
+def __getattr__(name: str):
+    # Only called for names that aren't defined yet, so this loads the binary once.
+    if not _loaded and not name.startswith('__'):
+        _load()
+        if name in globals():
+            return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
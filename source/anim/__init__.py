@@ -1,3 +1,4 @@
 from . import anim_data
 from . import export_anim
+from . import fcurve_index
 from . import import_anim
\ No newline at end of file
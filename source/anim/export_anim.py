@@ -1,11 +1,8 @@
 import bpy
 import mathutils
 import math
-import re
-#import numpy as np
+import numpy as np
 import time
-import cProfile
-import pstats
 
 from mathutils import Matrix, Quaternion
 from bpy.types import Operator, Panel, Context
@@ -15,6 +12,7 @@ from pathlib import Path
 
 from ...dependencies import ssbh_data_py
 from .import_anim import get_heirarchy_order
+from .fcurve_index import FCurveIndex, sample_fcurve
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -95,6 +93,11 @@ class SUB_OP_anim_export(Operator):
         description='Last Exported Frame',
         default=1,
     )
+    bake_pose: BoolProperty(
+        name='Bake Constraints',
+        description='Sample the evaluated pose on every frame, so bones driven by constraints such as IK are exported without baking the action first. Slower than reading the fcurves directly',
+        default=False,
+    )
     use_debug_timer: BoolProperty(
         name='Debug timing stats',
         description='Print advance import timing info to the console',
@@ -145,13 +148,16 @@ class SUB_OP_anim_export(Operator):
         if not self.filepath.endswith('.nuanmb'):
             self.filepath += '.nuanmb'
 
+        # Imported here, since registering the addon doesn't need the profiler.
+        import cProfile
+        import pstats
         with cProfile.Profile() as pr:
             if obj.type == 'ARMATURE':
                 export_model_anim_fast(
                     context, self, obj, self.filepath,
                     self.include_transform_track, self.include_material_track,
                     self.include_visibility_track, self.first_blender_frame,
-                    self.last_blender_frame)
+                    self.last_blender_frame, self.bake_pose)
             else:
                 # TODO: Make "fast" camera export using same technique (currently fighter camera animations take less than a second to export, so theres not much priority)
                 export_camera_anim(context, self, obj, self.filepath,
@@ -202,33 +208,41 @@ def get_smash_transform(m) -> Matrix:
     # Perform the transformation m in Blender's basis and convert back to Ultimate.
     return p @ m @ p.inverted()
 
-def transform_group_fix_floating_point_inaccuracies(trans_group: ssbh_data_py.anim_data.GroupData):
-    from math import isclose
-    for node in trans_group.nodes:
-        track = node.tracks[0]
-        if len(track.values) <= 1:
-            continue
-        first_transform = track.values[0]
-        for index, val in enumerate(first_transform.scale):
-            if isclose(val, 1, abs_tol=.00001):
-                first_transform.scale[index] = 1
-        for current_transform_index, current_transform in enumerate(track.values[1:], start=1):
-            # To avoid quaternion math issues, have to check if every value is close and replace the entire quaternion,
-            #  not just the 'x' or 'y' or 'z' or 'w'
-            all_rot_vals_close = True
-            for i in (0,1,2,3):
-                if not isclose(current_transform.rotation[i], first_transform.rotation[i], abs_tol=.00001):
-                    all_rot_vals_close = False
-            if all_rot_vals_close is True:
-                track.values[current_transform_index].rotation = first_transform.rotation
-            
-            for i in (0,1,2):
-                if isclose(current_transform.scale[i], first_transform.scale[i], abs_tol=.00001):
-                    track.values[current_transform_index].scale[i] = first_transform.scale[i]
-            
-            for i in (0,1,2):
-                if isclose(current_transform.translation[i], first_transform.translation[i], abs_tol=.00001):
-                    track.values[current_transform_index].translation[i] = first_transform.translation[i]
+def make_quaternions_continuous(rotations: np.ndarray):
+    '''
+    Flips the sign of quaternions in place so each frame is in the same hemisphere as the previous frame.
+    Without this, the game interpolates the "long way around" between frames.
+    Equivalent to checking prev.dot(current) < 0 frame by frame, but with a cumulative sign flip.
+    '''
+    if len(rotations) <= 1:
+        return
+    dots = np.einsum('ij,ij->i', rotations[:-1], rotations[1:])
+    # A negative dot flips the running sign. A dot of exactly 0 never flips, so the sign starts over from positive.
+    flips = np.concatenate(([0], np.cumsum(dots < 0.0)))
+    is_reset = np.concatenate(([True], dots == 0.0))
+    last_reset = np.maximum.accumulate(np.where(is_reset, np.arange(len(rotations)), 0))
+    signs = np.where((flips - flips[last_reset]) % 2 == 1, -1.0, 1.0)
+    rotations *= signs[:, np.newaxis]
+
+def fix_floating_point_inaccuracies(scales: np.ndarray, rotations: np.ndarray, translations: np.ndarray):
+    '''
+    Snaps values in place to the first frame's value when they are only off by floating point error, and the first frame's scale to 1.
+    Uses the same tolerance as math.isclose(a, b, abs_tol=.00001).
+    '''
+    if len(rotations) <= 1:
+        return
+    def isclose(a, b):
+        return np.abs(a - b) <= np.maximum(1e-09 * np.maximum(np.abs(a), np.abs(b)), .00001)
+    scales[0] = np.where(isclose(scales[0], 1.0), 1.0, scales[0])
+    # To avoid quaternion math issues, have to check if every value is close and replace the entire quaternion,
+    #  not just the 'x' or 'y' or 'z' or 'w'
+    all_rot_vals_close = np.all(isclose(rotations[1:], rotations[0]), axis=1)
+    rotations[1:][all_rot_vals_close] = rotations[0]
+    scales[1:] = np.where(isclose(scales[1:], scales[0]), scales[0], scales[1:])
+    translations[1:] = np.where(isclose(translations[1:], translations[0]), translations[0], translations[1:])
+
+def make_ssbh_transforms(scales: np.ndarray, rotations: np.ndarray, translations: np.ndarray) -> list[ssbh_data_py.anim_data.Transform]:
+    return [ssbh_data_py.anim_data.Transform(s, r, t) for s, r, t in zip(scales.tolist(), rotations.tolist(), translations.tolist())]
 
 def uv_transform_equality(a: ssbh_data_py.anim_data.UvTransform, b: ssbh_data_py.anim_data.UvTransform) -> bool:
     if a.rotation != b.rotation:
@@ -252,7 +266,115 @@ def does_armature_data_have_fcurves(arma: bpy.types.Object) -> bool:
         return False
     return True
 
-def export_model_anim_fast(context, operator: bpy.types.Operator, arma: bpy.types.Object, filepath, include_transform_track, include_material_track, include_visibility_track, first_blender_frame, last_blender_frame):
+def get_evaluated_pose_matrices(context: bpy.types.Context, arma: bpy.types.Object, first_blender_frame, last_blender_frame) -> np.ndarray:
+    '''
+    Evaluates the depsgraph once per frame and copies every pose bone's final pose space matrix into one buffer.
+    The returned array has the shape (frame_count, bone_count, 4, 4), with bones in the order of arma.pose.bones.
+    '''
+    scene = context.scene
+    original_frame, original_subframe = scene.frame_current, scene.frame_subframe
+    frame_count = last_blender_frame - first_blender_frame + 1
+    bone_count = len(arma.pose.bones)
+    buffer = np.empty((frame_count, bone_count * 16), dtype=np.float32)
+    for index, frame in enumerate(range(first_blender_frame, last_blender_frame + 1)):
+        # frame_set already evaluates the depsgraph, so there's no need for an extra view_layer.update()
+        scene.frame_set(frame)
+        evaluated_arma = arma.evaluated_get(context.evaluated_depsgraph_get())
+        evaluated_arma.pose.bones.foreach_get('matrix', buffer[index])
+    scene.frame_set(original_frame, subframe=original_subframe)
+    # Blender matrices are stored column major, so transpose to get the usual row major layout.
+    return buffer.reshape(frame_count, bone_count, 4, 4).transpose(0, 1, 3, 2).astype(np.float64)
+
+def get_matrix_basis_from_pose_matrices(arma: bpy.types.Object, pose_matrices: np.ndarray) -> np.ndarray:
+    '''
+    Converts sampled pose space matrices back to 'matrix basis' matrices, the same transforms the fcurves would have if the pose was baked.
+    '''
+    pose_bones = arma.pose.bones
+    bone_count = len(pose_bones)
+    parent_indices = np.array([pose_bones.find(pb.parent.name) if pb.parent else -1 for pb in pose_bones], dtype=np.int64)
+    has_parent = parent_indices >= 0
+    matrix_local = np.array([pb.bone.matrix_local for pb in pose_bones], dtype=np.float64).reshape(bone_count, 4, 4)
+
+    # pose_bone.matrix = parent.matrix @ rel_matrix_local @ matrix_basis, where root bones use their matrix_local.
+    rel_matrix_local = matrix_local.copy()
+    rel_matrix_local[has_parent] = np.linalg.inv(matrix_local[parent_indices[has_parent]]) @ matrix_local[has_parent]
+    parent_matrices = np.broadcast_to(np.identity(4), pose_matrices.shape).copy()
+    parent_matrices[:, has_parent] = pose_matrices[:, parent_indices[has_parent]]
+    return np.linalg.inv(parent_matrices @ rel_matrix_local) @ pose_matrices
+
+def find_negative_scale_matrix(arma: bpy.types.Object, matrix_basis: np.ndarray, first_blender_frame) -> tuple[str, int] | None:
+    '''
+    Returns (bone_name, frame) of the first baked matrix basis with negative scale, or None.
+    A negative determinant means an odd number of negative scale axes, which decomposing would silently turn into positive scale.
+    '''
+    negative = np.argwhere(np.linalg.det(matrix_basis[:, :, :3, :3]) < 0.0)
+    if len(negative) == 0:
+        return None
+    frame_index, bone_index = negative[0]
+    return arma.pose.bones[int(bone_index)].name, first_blender_frame + int(frame_index)
+
+def store_basis_values_from_matrix_basis(arma: bpy.types.Object, matrix_basis: np.ndarray, fcurve_index: FCurveIndex,
+                                         bone_name_to_location_values: dict[str, list[Location]],
+                                         bone_name_to_rotation_values: dict[str, list[Rotation]],
+                                         bone_name_to_scale_values: dict[str, list[Scale]]) -> set[bpy.types.PoseBone]:
+    '''
+    Stores the location, rotation and scale of each baked matrix basis.
+    Returns the pose bones that need to be exported, which are the keyframed bones and any bone moved by a constraint.
+    '''
+    pose_bones = arma.pose.bones
+
+    # Bones that don't move at all can be skipped, like the fcurve path skips unkeyed bones.
+    moved = np.any(~np.isclose(matrix_basis, np.identity(4), atol=1e-6), axis=(0, 2, 3))
+    keyed_bone_names = {bone_name for bone_name, _, _, _ in fcurve_index.get_bone_transform_items()}
+
+    animated_pose_bones: set[bpy.types.PoseBone] = set()
+    for bone_index, pose_bone in enumerate(pose_bones):
+        if moved[bone_index] or pose_bone.name in keyed_bone_names:
+            animated_pose_bones.add(pose_bone)
+        location_values = bone_name_to_location_values[pose_bone.name]
+        rotation_values = bone_name_to_rotation_values[pose_bone.name]
+        scale_values = bone_name_to_scale_values[pose_bone.name]
+        for index, matrix in enumerate(matrix_basis[:, bone_index]):
+            t, q, s = Matrix(matrix.tolist()).decompose()
+            location_values[index] = Location(t.x, t.y, t.z)
+            rotation_values[index] = Rotation(q.w, q.x, q.y, q.z)
+            scale_values[index] = Scale(s.x, s.y, s.z)
+    return animated_pose_bones
+
+def find_negative_scale_keyframe(fcurve_index: FCurveIndex, first_blender_frame, last_blender_frame) -> tuple[str, int, str] | None:
+    '''
+    Returns (bone_name, frame, axis) of the first scale keyframe in the frame range with a negative value, or None.
+    This only reads the keyframe arrays, so negative scale is found before every frame of every fcurve is sampled.
+    Curves can still overshoot below zero between keyframes, which the check after sampling catches.
+    '''
+    for bone_name, channel, array_index, fcurve in fcurve_index.get_bone_transform_items():
+        if channel != 'scale' or len(fcurve.keyframe_points) == 0:
+            continue
+        co = np.empty(len(fcurve.keyframe_points) * 2, dtype=np.float32)
+        fcurve.keyframe_points.foreach_get('co', co)
+        key_frames, key_values = co[0::2], co[1::2]
+        negative = np.flatnonzero((key_values < 0.0) & (key_frames >= first_blender_frame) & (key_frames <= last_blender_frame))
+        if len(negative) > 0:
+            return bone_name, int(key_frames[negative[0]]), 'XYZ'[array_index]
+    return None
+
+def collapse_constant_values(values: np.ndarray) -> np.ndarray:
+    # A track with the same value on every frame only needs the first value.
+    if len(values) > 1 and np.all(values == values[0]):
+        return values[:1]
+    return values
+
+def mat_track_values_to_ssbh_values(sub_type: str, values: np.ndarray) -> 'list[CustomVector|CustomFloat|CustomBool|PatternIndex|TextureTransform]':
+    if sub_type == 'VECTOR':
+        return values.tolist()
+    elif sub_type == 'TEXTURE':
+        return [ssbh_data_py.anim_data.UvTransform(*row) for row in values.tolist()]
+    elif sub_type == 'BOOL':
+        return (values[:, 0] != 0.0).tolist()
+    else:
+        return values[:, 0].tolist()
+
+def export_model_anim_fast(context, operator: bpy.types.Operator, arma: bpy.types.Object, filepath, include_transform_track, include_material_track, include_visibility_track, first_blender_frame, last_blender_frame, bake_pose=False):
     # SSBH Anim Setup
     ssbh_anim_data =  ssbh_data_py.anim_data.AnimData()
     final_frame_index = last_blender_frame - first_blender_frame
@@ -278,80 +400,86 @@ def export_model_anim_fast(context, operator: bpy.types.Operator, arma: bpy.type
             else: # root bones
                 bone_to_rel_matrix_local[pose_bone] = pose_bone.bone.matrix_local
 
-        # Go through the pose bones' fcurves and store all the values at each frame.
         animated_pose_bones: set[bpy.types.PoseBone] = set()
-        
-        object_level_transform_reported = False
-        for fcurve in arma.animation_data.action.fcurves:
-            regex = r'pose\.bones\[\"(.*)\"\]\.(.*)'
-            matches = re.match(regex, fcurve.data_path)
-            if matches is None: # A fcurve in the action that isn't a bone transform, such as the user keyframing the Armature Object itself.
-                object_level_transfrom_data_path_regex = r'^location$|^scale$|^rotation_quaternion$|^rotation_euler$'
-                if re.match(object_level_transfrom_data_path_regex, fcurve.data_path):
-                    if object_level_transform_reported == False:
-                        operator.report(type={'WARNING'}, message=f"The Armature's \"Object Mode\" location/rotation/scale was keyframed, this will not be exported! Make sure to enter Pose Mode, and keyframe a bone's location/rotation/scale instead!")
-                        object_level_transform_reported = True
-                    continue
+        fcurve_index = FCurveIndex(arma.animation_data.action)
+        if bake_pose:
+            # Sample the evaluated pose instead, so constraints such as IK are baked into the exported values.
+            # The original action is left untouched.
+            pose_matrices = get_evaluated_pose_matrices(context, arma, first_blender_frame, last_blender_frame)
+            matrix_basis = get_matrix_basis_from_pose_matrices(arma, pose_matrices)
+            negative_scale_matrix = find_negative_scale_matrix(arma, matrix_basis, first_blender_frame)
+            if negative_scale_matrix is not None:
+                bone_name, frame = negative_scale_matrix
+                operator.report(type={'ERROR'}, message=f"Negative Scale Detected! Negative scale is not supported, and so the export was cancelled! The first instance was on bone {bone_name} on blender frame {frame}.")
+                return
+            animated_pose_bones = store_basis_values_from_matrix_basis(
+                arma, matrix_basis, fcurve_index,
+                bone_name_to_location_values, bone_name_to_rotation_values, bone_name_to_scale_values)
+        else:
+            # Go through the pose bones' fcurves and store all the values at each frame.
+            if fcurve_index.object_transform_fcurves: # The user keyframed the Armature Object itself.
+                operator.report(type={'WARNING'}, message=f"The Armature's \"Object Mode\" location/rotation/scale was keyframed, this will not be exported! Make sure to enter Pose Mode, and keyframe a bone's location/rotation/scale instead!")
+            for fcurve in fcurve_index.unmatched_fcurves + fcurve_index.get_other_bone_fcurves():
                 operator.report(type={'WARNING'}, message=f"The fcurve with data path {fcurve.data_path} will not be exported, since it didn't match the pattern of a bone fcurve.")
-                continue
-            if len(matches.groups()) != 2: # TODO: Is this possible?
-                operator.report(type={'WARNING'}, message=f"The fcurve with data path {fcurve.data_path} will not be exported, its format only partially matched the expected pattern of a bone fcurve.")
-                continue
-            bone_name = matches.groups()[0]
-            transform_subtype = matches.groups()[1]
-            if transform_subtype == 'location':
-                for index, frame in enumerate(range(first_blender_frame, last_blender_frame+1)):
-                    # Check if the bone exists in our dictionary before accessing it
-                    if bone_name not in bone_name_to_location_values:
-                        # Create entries for this bone if it doesn't exist (likely an IK bone)
-                        bone_name_to_location_values[bone_name] = [Location(0.0, 0.0, 0.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
-                        bone_name_to_rotation_values[bone_name] = [Rotation(1.0, 0.0, 0.0, 0.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
-                        bone_name_to_scale_values[bone_name] = [Scale(1.0, 1.0, 1.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
-                        operator.report({'INFO'}, f"Added missing bone '{bone_name}' to animation export data")
+            negative_scale_keyframe = find_negative_scale_keyframe(fcurve_index, first_blender_frame, last_blender_frame)
+            if negative_scale_keyframe is not None:
+                bone_name, frame, axis = negative_scale_keyframe
+                operator.report(type={'ERROR'}, message=f"Negative Scale Detected! Negative scale is not supported, and so the export was cancelled! The first instance was on bone {bone_name} on blender frame {frame} in the {axis} axis.")
+                return
+            for bone_name, transform_subtype, _, fcurve in fcurve_index.get_bone_transform_items():
+                if transform_subtype == 'location':
+                    for index, frame in enumerate(range(first_blender_frame, last_blender_frame+1)):
+                        # Check if the bone exists in our dictionary before accessing it
+                        if bone_name not in bone_name_to_location_values:
+                            # Create entries for this bone if it doesn't exist (likely an IK bone)
+                            bone_name_to_location_values[bone_name] = [Location(0.0, 0.0, 0.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
+                            bone_name_to_rotation_values[bone_name] = [Rotation(1.0, 0.0, 0.0, 0.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
+                            bone_name_to_scale_values[bone_name] = [Scale(1.0, 1.0, 1.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
+                            operator.report({'INFO'}, f"Added missing bone '{bone_name}' to animation export data")
                     
-                    if fcurve.array_index == 0:
-                        bone_name_to_location_values[bone_name][index].x = fcurve.evaluate(frame)
-                    elif fcurve.array_index == 1:
-                        bone_name_to_location_values[bone_name][index].y = fcurve.evaluate(frame)
-                    elif fcurve.array_index == 2:
-                        bone_name_to_location_values[bone_name][index].z = fcurve.evaluate(frame)
-            elif transform_subtype == 'rotation_quaternion':
-                for index, frame in enumerate(range(first_blender_frame, last_blender_frame+1)):
-                    # Check if the bone exists in our dictionary before accessing it
-                    if bone_name not in bone_name_to_rotation_values:
-                        # Create entries for this bone if it doesn't exist (likely an IK bone)
-                        bone_name_to_location_values[bone_name] = [Location(0.0, 0.0, 0.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
-                        bone_name_to_rotation_values[bone_name] = [Rotation(1.0, 0.0, 0.0, 0.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
-                        bone_name_to_scale_values[bone_name] = [Scale(1.0, 1.0, 1.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
-                        operator.report({'INFO'}, f"Added missing bone '{bone_name}' to animation export data")
+                        if fcurve.array_index == 0:
+                            bone_name_to_location_values[bone_name][index].x = fcurve.evaluate(frame)
+                        elif fcurve.array_index == 1:
+                            bone_name_to_location_values[bone_name][index].y = fcurve.evaluate(frame)
+                        elif fcurve.array_index == 2:
+                            bone_name_to_location_values[bone_name][index].z = fcurve.evaluate(frame)
+                elif transform_subtype == 'rotation_quaternion':
+                    for index, frame in enumerate(range(first_blender_frame, last_blender_frame+1)):
+                        # Check if the bone exists in our dictionary before accessing it
+                        if bone_name not in bone_name_to_rotation_values:
+                            # Create entries for this bone if it doesn't exist (likely an IK bone)
+                            bone_name_to_location_values[bone_name] = [Location(0.0, 0.0, 0.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
+                            bone_name_to_rotation_values[bone_name] = [Rotation(1.0, 0.0, 0.0, 0.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
+                            bone_name_to_scale_values[bone_name] = [Scale(1.0, 1.0, 1.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
+                            operator.report({'INFO'}, f"Added missing bone '{bone_name}' to animation export data")
                         
-                    if fcurve.array_index == 0:
-                        bone_name_to_rotation_values[bone_name][index].w = fcurve.evaluate(frame)
-                    elif fcurve.array_index == 1:
-                        bone_name_to_rotation_values[bone_name][index].x = fcurve.evaluate(frame)
-                    elif fcurve.array_index == 2:
-                        bone_name_to_rotation_values[bone_name][index].y = fcurve.evaluate(frame)
-                    elif fcurve.array_index == 3:
-                        bone_name_to_rotation_values[bone_name][index].z = fcurve.evaluate(frame)
-            elif transform_subtype == 'scale':
-                for index, frame in enumerate(range(first_blender_frame, last_blender_frame+1)):
-                    # Check if the bone exists in our dictionary before accessing it
-                    if bone_name not in bone_name_to_scale_values:
-                        # Create entries for this bone if it doesn't exist (likely an IK bone)
-                        bone_name_to_location_values[bone_name] = [Location(0.0, 0.0, 0.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
-                        bone_name_to_rotation_values[bone_name] = [Rotation(1.0, 0.0, 0.0, 0.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
-                        bone_name_to_scale_values[bone_name] = [Scale(1.0, 1.0, 1.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
-                        operator.report({'INFO'}, f"Added missing bone '{bone_name}' to animation export data")
+                        if fcurve.array_index == 0:
+                            bone_name_to_rotation_values[bone_name][index].w = fcurve.evaluate(frame)
+                        elif fcurve.array_index == 1:
+                            bone_name_to_rotation_values[bone_name][index].x = fcurve.evaluate(frame)
+                        elif fcurve.array_index == 2:
+                            bone_name_to_rotation_values[bone_name][index].y = fcurve.evaluate(frame)
+                        elif fcurve.array_index == 3:
+                            bone_name_to_rotation_values[bone_name][index].z = fcurve.evaluate(frame)
+                elif transform_subtype == 'scale':
+                    for index, frame in enumerate(range(first_blender_frame, last_blender_frame+1)):
+                        # Check if the bone exists in our dictionary before accessing it
+                        if bone_name not in bone_name_to_scale_values:
+                            # Create entries for this bone if it doesn't exist (likely an IK bone)
+                            bone_name_to_location_values[bone_name] = [Location(0.0, 0.0, 0.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
+                            bone_name_to_rotation_values[bone_name] = [Rotation(1.0, 0.0, 0.0, 0.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
+                            bone_name_to_scale_values[bone_name] = [Scale(1.0, 1.0, 1.0) for _ in range(first_blender_frame, last_blender_frame + 1)]
+                            operator.report({'INFO'}, f"Added missing bone '{bone_name}' to animation export data")
                         
-                    if fcurve.array_index == 0:
-                        bone_name_to_scale_values[bone_name][index].x = fcurve.evaluate(frame)
-                    elif fcurve.array_index == 1:
-                        bone_name_to_scale_values[bone_name][index].y = fcurve.evaluate(frame)
-                    elif fcurve.array_index == 2:
-                        bone_name_to_scale_values[bone_name][index].z = fcurve.evaluate(frame)
-            animated_pose_bone = arma.pose.bones.get(bone_name)
-            if animated_pose_bone is not None:
-                animated_pose_bones.add(animated_pose_bone)
+                        if fcurve.array_index == 0:
+                            bone_name_to_scale_values[bone_name][index].x = fcurve.evaluate(frame)
+                        elif fcurve.array_index == 1:
+                            bone_name_to_scale_values[bone_name][index].y = fcurve.evaluate(frame)
+                        elif fcurve.array_index == 2:
+                            bone_name_to_scale_values[bone_name][index].z = fcurve.evaluate(frame)
+                animated_pose_bone = arma.pose.bones.get(bone_name)
+                if animated_pose_bone is not None:
+                    animated_pose_bones.add(animated_pose_bone)
 
         # Detect Negative Scale, Fix Zero Scale
         zero_scale_reported = False
@@ -397,6 +525,11 @@ def export_model_anim_fast(context, operator: bpy.types.Operator, arma: bpy.type
 
         # Convenience dict for later node access
         node_name_to_node = {node.name:node for node in trans_group.nodes}
+        # The values are gathered into arrays first, so the post processing can be done per node instead of per frame.
+        frame_count = last_blender_frame - first_blender_frame + 1
+        node_name_to_scales = {name: np.empty((frame_count, 3)) for name in node_name_to_node}
+        node_name_to_rotations = {name: np.empty((frame_count, 4)) for name in node_name_to_node}
+        node_name_to_translations = {name: np.empty((frame_count, 3)) for name in node_name_to_node}
 
         # Blender stores the 'matrix basis' values in the fcurves
         # Smash stores a 'relative matrix', such that bone.parent.final_matrix @ bone.relative_matrix = bone.final_matrix
@@ -430,25 +563,26 @@ def export_model_anim_fast(context, operator: bpy.types.Operator, arma: bpy.type
                         raw_rel_matrix = bone_to_world_matrix[bone.parent].inverted() @ bone_to_world_matrix[bone]
                     smash_rel_matrix = get_smash_transform(raw_rel_matrix)
                     t,q,s = smash_rel_matrix.decompose()
-                    transform = ssbh_data_py.anim_data.Transform(
-                        [s.x, s.y, s.z],
-                        [q.x, q.y, q.z, q.w],
-                        [t.x, t.y, t.z]
-                    )
-                    node.tracks[0].values.append(transform)
-                    # Check for quaternion interpolation issues
-                    if index > 0:
-                        pq = mathutils.Quaternion(node.tracks[0].values[index-1].rotation)
-                        cq = mathutils.Quaternion(node.tracks[0].values[index].rotation)
-                        if pq.dot(cq) < 0:
-                            node.tracks[0].values[index].rotation = [-c for c in node.tracks[0].values[index].rotation]
-        # Pre-Saving Optimizations
-        transform_group_fix_floating_point_inaccuracies(trans_group)
+                    node_name_to_scales[node.name][index] = s
+                    node_name_to_rotations[node.name][index] = (q.x, q.y, q.z, q.w)
+                    node_name_to_translations[node.name][index] = t
+        for node in trans_group.nodes:
+            scales = node_name_to_scales[node.name]
+            rotations = node_name_to_rotations[node.name]
+            translations = node_name_to_translations[node.name]
+            # Check for quaternion interpolation issues
+            make_quaternions_continuous(rotations)
+            # Pre-Saving Optimizations
+            fix_floating_point_inaccuracies(scales, rotations, translations)
+            node.tracks[0].values = make_ssbh_transforms(scales, rotations, translations)
         # Vanilla anims sort the nodes alphabetically. 
         # Without this, certain anims will behave incorrectly, such as the Trans bone motion not working in-game.
         trans_group.nodes.sort(key=lambda node: node.name)
 
-    if include_visibility_track and does_armature_data_have_fcurves(arma):
+    # The vis and mat track fcurves are in the same action, so they share one index.
+    data_fcurve_index = FCurveIndex(arma.data.animation_data.action) if does_armature_data_have_fcurves(arma) else None
+
+    if include_visibility_track and data_fcurve_index is not None:
         # Convenience variable for the sub_anim_properties
         sap: SUB_PG_sub_anim_data = arma.data.sub_anim_properties
         
@@ -456,17 +590,12 @@ def export_model_anim_fast(context, operator: bpy.types.Operator, arma: bpy.type
         vis_track_index_to_name: dict[int, str] = {}
         vis_track_index_to_values: dict[int, list[bool]] = {}
         fcurve: bpy.types.FCurve
-        for fcurve in arma.data.animation_data.action.fcurves:
-            regex = r'.*\[(\d*)\]\.value'
-            matches = re.match(regex, fcurve.data_path)
-            if matches is None: # Not a visibility fcurve, its probably a material track fcurve
-                continue
-            vis_track_index = int(matches.groups()[0])
+        for vis_track_index, fcurve in data_fcurve_index.vis_fcurves.items():
             if vis_track_index >= len(sap.vis_track_entries): # this can happen if the user removes entries manually but not the fcurves
                 operator.report(type={'WARNING'}, message=f'The fcurve with data path {fcurve.data_path} will be skipped, its index was out of bounds.')
                 continue
             vis_track_index_to_name[vis_track_index] = sap.vis_track_entries[vis_track_index].name
-            vis_track_index_to_values[vis_track_index] = [bool(fcurve.evaluate(frame)) for frame in range(first_blender_frame, last_blender_frame+1)]
+            vis_track_index_to_values[vis_track_index] = collapse_constant_values(sample_fcurve(fcurve, first_blender_frame, last_blender_frame) != 0.0).tolist()
 
         # Create Vis Group
         vis_group = ssbh_data_py.anim_data.GroupData(ssbh_data_py.anim_data.GroupType.Visibility)
@@ -483,26 +612,20 @@ def export_model_anim_fast(context, operator: bpy.types.Operator, arma: bpy.type
         # Sort Nodes
         vis_group.nodes.sort(key= lambda x: sap.vis_track_entries.find(x.name))
 
-    if include_material_track and does_armature_data_have_fcurves(arma):
+    if include_material_track and data_fcurve_index is not None:
         # Convenience variable for the sub_anim_properties
         sap: SUB_PG_sub_anim_data = arma.data.sub_anim_properties
 
         # Gather the Values
         # Not every CustomVector, CustomBool, etc will be animated, so only the animated ones should be exported.
         # In addition, fcurves may only exist for a few indices of a CustomVector or TextureTransform, since the user may not have animated them all
-        # Example: mat_name_prop_name_to_values['EyeL']['CustomVector31'] -> [[1.0,1.0,1.0,1.0], ...]
-        mat_name_prop_name_to_values: dict[str, dict[str, list[CustomVector|CustomFloat|CustomBool|PatternIndex|TextureTransform]]] = {}
-        for fcurve in arma.data.animation_data.action.fcurves:
-            regex = r"sub_anim_properties\.mat_tracks\[(\d+)\]\.properties\[(\d+)\](\.\w+)"
-            matches = re.match(regex, fcurve.data_path)
-            if matches is None: # The vis and mat track fcurves are in the same action, so its normal to not match every fcurve
-                continue
-            if len(matches.groups()) != 3: # TODO: Is this possible?
-                operator.report(type={'WARNING'}, message=f"The fcurve with data path {fcurve.data_path} will not be exported, its format only partially matched the expected pattern of a mat track.")
-                continue
+        # The values are kept as one array column per component, and only converted to ssbh_data_py values when the tracks are created.
+        # Example: mat_name_prop_name_to_values['EyeL']['CustomVector31'] -> np.array([[1.0,1.0,1.0,1.0], ...])
+        frame_count = final_frame_index + 1
+        mat_name_prop_name_to_values: dict[str, dict[str, np.ndarray]] = {}
+        for (material_index, property_index, array_index), fcurve in data_fcurve_index.mat_fcurves.items():
             # The material index may be out of bounds, this can happen due to improper removal of the MatTrack from the sub_anim_properties.
             # This should however not happen when removed properly through the implemented operators
-            material_index = int(matches.groups()[0])
             if material_index >= len(sap.mat_tracks):
                 operator.report(type={'WARNING'}, message=f'The fcurve with data path {fcurve.data_path} will be skipped, its material index was out of bounds.')
                 continue
@@ -514,50 +637,31 @@ def export_model_anim_fast(context, operator: bpy.types.Operator, arma: bpy.type
                 mat_name_prop_name_to_values[material_name] = {}
             # The property index may be out of bounds, this can happen due to improper removal of the MatTrackProperty from the MatTrack.
             # This should however not happen when removed properly through the implemented operators
-            property_index = int(matches.groups()[1])
             if property_index >= len(mat_track.properties):
                 operator.report(type={'WARNING'}, message=f'The fcurve with data path {fcurve.data_path} will be skipped, its property index was out of bounds.')
                 continue
             # Now that the property index is validated, can grab the coresponding MatTrackProperty
             mat_track_property: SUB_PG_mat_track_property = mat_track.properties[property_index]
             property_name = mat_track_property.name
-            # This dict won't exist yet for the first fcurve belonging to a material's property, so we add it now.
-            # If it didn't exist, then the default values also didn't exist yet so nows a good time to add them.
+            # This array won't exist yet for the first fcurve belonging to a material's property, so we add it now, filled with the default values.
             # The default values need to be filled out because an fcurve for each array_index may not exist.
             # This only applies to the CustomVector and TextureTransforms, all others only have one fcurve for the property.  
-            if mat_name_prop_name_to_values.get(material_name).get(property_name) is None:
+            values = mat_name_prop_name_to_values[material_name].get(property_name)
+            if values is None:
                 if mat_track_property.sub_type == 'VECTOR':
-                    cv = mat_track_property.custom_vector
-                    # Use numpy as this one line takes way to long
-                    #mat_name_prop_name_to_values[material_name][property_name] = [[cv[0], cv[1], cv[2], cv[3]] for _ in range(0, final_frame_index+1)]
-                    #mat_name_prop_name_to_values[material_name][property_name] = np.full((final_frame_index+1, 4), [cv[0], cv[1], cv[2], cv[3]]).tolist()
-                    # Nevermind it seems like the numpy array needs to be converted back into a list before being saved
-                    mat_name_prop_name_to_values[material_name][property_name] = [[cv[0], cv[1], cv[2], cv[3]] for _ in range(0, final_frame_index+1)]
+                    values = np.tile(np.array(mat_track_property.custom_vector, dtype=np.float64), (frame_count, 1))
                 elif mat_track_property.sub_type == 'TEXTURE':
-                    tt = mat_track_property.texture_transform
-                    mat_name_prop_name_to_values[material_name][property_name] = [ssbh_data_py.anim_data.UvTransform(tt[0], tt[1], tt[2], tt[3], tt[4]) for _ in range(0, final_frame_index+1)]
+                    values = np.tile(np.array(mat_track_property.texture_transform, dtype=np.float64), (frame_count, 1))
                 else: # Bools, Floats, PatternIndex have only one fcurve, so any default value filled here would get replaced anyways
-                    mat_name_prop_name_to_values[material_name][property_name] = []
+                    values = np.zeros((frame_count, 1))
+                mat_name_prop_name_to_values[material_name][property_name] = values
             # Finally can add the values at each frame
-            for index, frame in enumerate(range(first_blender_frame, last_blender_frame+1)):
-                if mat_track_property.sub_type == 'VECTOR':
-                    mat_name_prop_name_to_values[material_name][property_name][index][fcurve.array_index] = fcurve.evaluate(frame)
-                elif mat_track_property.sub_type == 'BOOL':
-                    mat_name_prop_name_to_values[material_name][property_name].append(bool(fcurve.evaluate(frame)))
-                elif mat_track_property.sub_type == 'TEXTURE':
-                    if fcurve.array_index == 0:
-                        mat_name_prop_name_to_values[material_name][property_name][index].scale_u = fcurve.evaluate(frame)
-                    elif fcurve.array_index == 1:
-                        mat_name_prop_name_to_values[material_name][property_name][index].scale_v = fcurve.evaluate(frame)
-                    elif fcurve.array_index == 2:
-                        mat_name_prop_name_to_values[material_name][property_name][index].rotation = fcurve.evaluate(frame)
-                    elif fcurve.array_index == 3:
-                        mat_name_prop_name_to_values[material_name][property_name][index].translate_u = fcurve.evaluate(frame)
-                    elif fcurve.array_index == 4:
-                        mat_name_prop_name_to_values[material_name][property_name][index].translate_v = fcurve.evaluate(frame)
-                else:
-                    mat_name_prop_name_to_values[material_name][property_name].append(fcurve.evaluate(frame))
-                
+            if mat_track_property.sub_type in ('VECTOR', 'TEXTURE'):
+                if array_index < values.shape[1]:
+                    values[:, array_index] = sample_fcurve(fcurve, first_blender_frame, last_blender_frame)
+            else:
+                values[:, 0] = sample_fcurve(fcurve, first_blender_frame, last_blender_frame)
+
         # Now we can finally process the data
         # Create the material group
         mat_group = ssbh_data_py.anim_data.GroupData(ssbh_data_py.anim_data.GroupType.Material)
@@ -566,10 +670,11 @@ def export_model_anim_fast(context, operator: bpy.types.Operator, arma: bpy.type
         for mat_name in mat_name_prop_name_to_values:
             node = ssbh_data_py.anim_data.NodeData(mat_name)
             mat_group.nodes.append(node)
-            for prop_name in mat_name_prop_name_to_values[mat_name]:
+            for prop_name, values in mat_name_prop_name_to_values[mat_name].items():
                 track = ssbh_data_py.anim_data.TrackData(prop_name)
                 node.tracks.append(track)
-                track.values.extend(mat_name_prop_name_to_values[mat_name][prop_name])
+                sub_type = sap.mat_tracks[mat_name].properties[prop_name].sub_type
+                track.values.extend(mat_track_values_to_ssbh_values(sub_type, collapse_constant_values(values)))
         # Sort the nodes and tracks by their user-defined position
         mat_group.nodes.sort(key= lambda x: sap.mat_tracks.find(x.name))
         for node in mat_group.nodes:
@@ -604,6 +709,8 @@ def export_camera_anim(context, operator, camera: bpy.types.Object, filepath, fi
 
     track_name_to_track = {track.name : track for track in camera_group.nodes[0].tracks}
     trans_track = transform_group.nodes[0].tracks[0]
+    frame_count = last_blender_frame - first_blender_frame + 1
+    scales, rotations, translations = np.empty((frame_count, 3)), np.empty((frame_count, 4)), np.empty((frame_count, 3))
     for index, frame in enumerate(range(first_blender_frame, last_blender_frame + 1)):
         context.scene.frame_set(frame)
         track_name_to_track['FieldOfView'].values.append(camera.data.angle_y)
@@ -614,18 +721,12 @@ def export_camera_anim(context, operator, camera: bpy.types.Object, filepath, fi
         original_matrix = axis_correction.inverted() @ fixed_matrix
 
         mt, mq, ms = original_matrix.decompose()
-        new_ssbh_transform = ssbh_data_py.anim_data.Transform(
-            [ms[0], ms[1], ms[2]], 
-            [mq.x, mq.y, mq.z, mq.w],
-            [mt[0], mt[1], mt[2]]
-        )
-        trans_track.values.append(new_ssbh_transform)
-        # Check for quaternion interpolation issues
-        if index > 0:
-            pq = mathutils.Quaternion(trans_track.values[index-1].rotation)
-            cq = mathutils.Quaternion(trans_track.values[index].rotation)
-            if pq.dot(cq) < 0:
-                trans_track.values[index].rotation = [-c for c in trans_track.values[index].rotation]
+        scales[index] = ms
+        rotations[index] = (mq.x, mq.y, mq.z, mq.w)
+        translations[index] = mt
+    # Check for quaternion interpolation issues
+    make_quaternions_continuous(rotations)
+    trans_track.values = make_ssbh_transforms(scales, rotations, translations)
 
     ssbh_anim_data.groups.append(transform_group)
     ssbh_anim_data.groups.append(camera_group)
@@ -0,0 +1,196 @@
+import re
+import bpy
+import numpy as np
+
+# Compiled once, since actions from mocap retargets can have tens of thousands of fcurves.
+BONE_DATA_PATH_REGEX = re.compile(r'^pose\.bones\[\"(.+?)\"\]\.?(.+)$')
+OBJECT_TRANSFORM_DATA_PATH_REGEX = re.compile(r'^location$|^scale$|^rotation_quaternion$|^rotation_euler$|^rotation_axis_angle$')
+VIS_TRACK_DATA_PATH_REGEX = re.compile(r'.*\[(\d+)\]\.value$')
+MAT_TRACK_DATA_PATH_REGEX = re.compile(r'sub_anim_properties\.mat_tracks\[(\d+)\]\.properties\[(\d+)\]\.(\w+)')
+
+class FCurveIndex():
+    '''
+    Sorts the fcurves of an action by what they animate, parsing each data path only once.
+    Bone fcurves are keyed by (bone_name, channel, array_index), where the channel is the rest of the data path such as 'location' or '["custom_prop"]'.
+    Vis track fcurves are keyed by the vis track entry index.
+    Mat track fcurves are keyed by (mat_track_index, property_index, array_index).
+    '''
+    def __init__(self, action: bpy.types.Action):
+        self.bone_fcurves: dict[tuple[str, str, int], bpy.types.FCurve] = {}
+        self.bone_name_to_fcurves: dict[str, list[bpy.types.FCurve]] = {}
+        self.object_transform_fcurves: list[bpy.types.FCurve] = []
+        self.vis_fcurves: dict[int, bpy.types.FCurve] = {}
+        self.mat_fcurves: dict[tuple[int, int, int], bpy.types.FCurve] = {}
+        self.unmatched_fcurves: list[bpy.types.FCurve] = []
+        if action is None:
+            return
+        for fcurve in action.fcurves:
+            data_path = fcurve.data_path
+            if data_path.startswith('pose.bones'):
+                matches = BONE_DATA_PATH_REGEX.match(data_path)
+                if matches is not None:
+                    bone_name, channel = matches.groups()
+                    self.bone_fcurves[(bone_name, channel, fcurve.array_index)] = fcurve
+                    self.bone_name_to_fcurves.setdefault(bone_name, []).append(fcurve)
+                    continue
+            elif data_path.startswith('sub_anim_properties.mat_tracks'):
+                matches = MAT_TRACK_DATA_PATH_REGEX.match(data_path)
+                if matches is not None:
+                    mat_track_index, property_index = int(matches.group(1)), int(matches.group(2))
+                    self.mat_fcurves[(mat_track_index, property_index, fcurve.array_index)] = fcurve
+                    continue
+            elif OBJECT_TRANSFORM_DATA_PATH_REGEX.match(data_path):
+                self.object_transform_fcurves.append(fcurve)
+                continue
+            else:
+                matches = VIS_TRACK_DATA_PATH_REGEX.match(data_path)
+                if matches is not None:
+                    self.vis_fcurves[int(matches.group(1))] = fcurve
+                    continue
+            self.unmatched_fcurves.append(fcurve)
+
+    def get_bone_fcurve(self, bone_name: str, channel: str, array_index: int) -> bpy.types.FCurve | None:
+        return self.bone_fcurves.get((bone_name, channel, array_index))
+
+    def get_bone_fcurves(self, bone_name: str) -> list[bpy.types.FCurve]:
+        return self.bone_name_to_fcurves.get(bone_name, [])
+
+    def get_bone_transform_items(self):
+        '''
+        Yields (bone_name, channel, array_index, fcurve) for fcurves directly on a pose bone's properties.
+        Paths that go through the bone to something else, like a constraint's influence or a custom property, are in get_other_bone_fcurves instead.
+        '''
+        for (bone_name, channel, array_index), fcurve in self.bone_fcurves.items():
+            if channel.isidentifier():
+                yield bone_name, channel, array_index, fcurve
+
+    def get_other_bone_fcurves(self) -> list[bpy.types.FCurve]:
+        '''
+        Returns the fcurves under a pose bone that aren't on one of its properties, such as custom properties and constraints.
+        '''
+        return [fcurve for (_, channel, _), fcurve in self.bone_fcurves.items() if not channel.isidentifier()]
+
+# The values of blender's keyframe interpolation enum from foreach_get.
+INTERPOLATION_CONSTANT = 0
+INTERPOLATION_LINEAR = 1
+INTERPOLATION_BEZIER = 2
+# Solving for the bezier parameter to this many frames is more precise than blender's own float evaluation.
+BEZIER_FRAME_TOLERANCE = 1e-7
+BEZIER_NEWTON_STEPS = 6
+BEZIER_BISECTION_STEPS = 40
+
+def read_keyframe_array(keyframe_points, attribute: str) -> np.ndarray:
+    values = np.empty(len(keyframe_points) * 2, dtype=np.float32)
+    keyframe_points.foreach_get(attribute, values)
+    return values.reshape((-1, 2)).astype(np.float64)
+
+def evaluate_bezier_segments(frames: np.ndarray, start: np.ndarray, start_handle: np.ndarray,
+                             end_handle: np.ndarray, end: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Evaluates one bezier segment per frame, where each point array has an (x, y) row per frame.
+    Returns (values, valid), where valid is False for segments whose x doesn't always increase, which blender solves differently.
+    '''
+    # Shorten handles that reach past the other key like BKE_fcurve_correct_bezpart.
+    start_delta = start - start_handle
+    end_delta = end - end_handle
+    length = end[:, 0] - start[:, 0]
+    start_length = np.abs(start_delta[:, 0])
+    end_length = np.abs(end_delta[:, 0])
+    start_handle = start - np.where(start_length > length, length / np.maximum(start_length, 1e-20), 1.0)[:, None] * start_delta
+    end_handle = end - np.where(end_length > length, length / np.maximum(end_length, 1e-20), 1.0)[:, None] * end_delta
+    valid = (start_handle[:, 0] >= start[:, 0]) & (end_handle[:, 0] <= end[:, 0])
+
+    def coefficients(axis: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # The bezier as a cubic polynomial ((a * t + b) * t + c) * t + d.
+        p0, p1, p2, p3 = start[:, axis], start_handle[:, axis], end_handle[:, axis], end[:, axis]
+        return p3 - p0 + 3.0 * (p1 - p2), 3.0 * (p0 - 2.0 * p1 + p2), 3.0 * (p1 - p0), p0
+
+    # x only increases along valid segments, so Newton's method from the linear guess finds the t where x reaches the frame.
+    ax, bx, cx, dx = coefficients(0)
+    t = np.clip((frames - start[:, 0]) / length, 0.0, 1.0)
+    for _ in range(BEZIER_NEWTON_STEPS):
+        error = ((ax * t + bx) * t + cx) * t + dx - frames
+        slope = (3.0 * ax * t + 2.0 * bx) * t + cx
+        t = np.clip(t - error / np.where(slope > 1e-12, slope, np.inf), 0.0, 1.0)
+
+    # Bisect the few segments where x is nearly flat and Newton's method hasn't converged.
+    error = ((ax * t + bx) * t + cx) * t + dx - frames
+    unconverged = np.flatnonzero(np.abs(error) > BEZIER_FRAME_TOLERANCE)
+    if len(unconverged) > 0:
+        low = np.zeros(len(unconverged), dtype=np.float64)
+        high = np.ones(len(unconverged), dtype=np.float64)
+        a, b, c, d, target = ax[unconverged], bx[unconverged], cx[unconverged], dx[unconverged], frames[unconverged]
+        for _ in range(BEZIER_BISECTION_STEPS):
+            middle = (low + high) * 0.5
+            below = ((a * middle + b) * middle + c) * middle + d < target
+            low = np.where(below, middle, low)
+            high = np.where(below, high, middle)
+        t[unconverged] = (low + high) * 0.5
+
+    ay, by, cy, dy = coefficients(1)
+    return ((ay * t + by) * t + cy) * t + dy, valid
+
+def sample_fcurve(fcurve: bpy.types.FCurve, first_frame: int, last_frame: int) -> np.ndarray:
+    '''
+    Returns the value of the fcurve on every whole frame from first_frame to last_frame, the same as calling fcurve.evaluate() on each frame.
+    Frames on a keyframe, in constant extrapolation, or in a constant, linear or bezier segment are calculated from the keyframe arrays.
+    Only easing interpolations, linear extrapolation and curves with modifiers fall back to fcurve.evaluate().
+    '''
+    frames = np.arange(first_frame, last_frame + 1, dtype=np.float64)
+    keyframe_points = fcurve.keyframe_points
+    key_count = len(keyframe_points)
+    if key_count == 0 or len(fcurve.modifiers) > 0:
+        return np.array([fcurve.evaluate(frame) for frame in frames.tolist()], dtype=np.float64)
+
+    co = read_keyframe_array(keyframe_points, 'co')
+    key_frames = co[:, 0]
+    key_values = co[:, 1]
+    if np.any(np.diff(key_frames) <= 0.0): # Unsorted or stacked keyframes, let blender sort it out
+        return np.array([fcurve.evaluate(frame) for frame in frames.tolist()], dtype=np.float64)
+
+    values = np.empty(len(frames), dtype=np.float64)
+    needs_evaluate = np.ones(len(frames), dtype=bool)
+    key_indices = np.minimum(np.searchsorted(key_frames, frames), key_count - 1)
+    on_key = key_frames[key_indices] == frames
+    values[on_key] = key_values[key_indices[on_key]]
+    needs_evaluate[on_key] = False
+    if fcurve.extrapolation == 'CONSTANT':
+        before = frames < key_frames[0]
+        after = frames > key_frames[-1]
+        values[before] = key_values[0]
+        values[after] = key_values[-1]
+        needs_evaluate[before | after] = False
+
+    # Frames between two keys use the interpolation of the key before them.
+    inside = needs_evaluate & (frames > key_frames[0]) & (frames < key_frames[-1])
+    if np.any(inside):
+        interpolations = np.empty(key_count, dtype=np.int32)
+        keyframe_points.foreach_get('interpolation', interpolations)
+        frame_indices = np.flatnonzero(inside)
+        starts = key_indices[frame_indices] - 1
+        ends = starts + 1
+        segment_interpolations = interpolations[starts]
+
+        constant = segment_interpolations == INTERPOLATION_CONSTANT
+        values[frame_indices[constant]] = key_values[starts[constant]]
+        needs_evaluate[frame_indices[constant]] = False
+
+        linear = segment_interpolations == INTERPOLATION_LINEAR
+        linear_starts, linear_ends, linear_indices = starts[linear], ends[linear], frame_indices[linear]
+        factors = (frames[linear_indices] - key_frames[linear_starts]) / (key_frames[linear_ends] - key_frames[linear_starts])
+        values[linear_indices] = key_values[linear_starts] + factors * (key_values[linear_ends] - key_values[linear_starts])
+        needs_evaluate[linear_indices] = False
+
+        bezier = segment_interpolations == INTERPOLATION_BEZIER
+        if np.any(bezier):
+            handle_left = read_keyframe_array(keyframe_points, 'handle_left')
+            handle_right = read_keyframe_array(keyframe_points, 'handle_right')
+            bezier_starts, bezier_ends, bezier_indices = starts[bezier], ends[bezier], frame_indices[bezier]
+            bezier_values, valid = evaluate_bezier_segments(frames[bezier_indices], co[bezier_starts], handle_right[bezier_starts],
+                                                            handle_left[bezier_ends], co[bezier_ends])
+            values[bezier_indices[valid]] = bezier_values[valid]
+            needs_evaluate[bezier_indices[valid]] = False
+
+    for index in np.flatnonzero(needs_evaluate).tolist():
+        values[index] = fcurve.evaluate(frames[index].item())
+    return values
@@ -5,8 +5,7 @@ import re
 import collections
 import time
 import numpy as np
-import cProfile
-import pstats
+import tracemalloc
 import os
 from pathlib import Path
 
@@ -57,11 +56,21 @@ class SUB_OP_import_selected_anim(bpy.types.Operator):
         description='What frame to start importing the track on',
         default=1,
     )
+    use_chunked_import: BoolProperty(
+        name='Low Memory Import',
+        description='Write each bone\'s keyframes before converting the next bone. The whole animation file is still read into memory, so memory use still grows with the animation length',
+        default=False,
+    )
     use_debug_timer: BoolProperty(
         name='Debug timing stats',
         description='Print advance import timing info to the console',
         default=False,
     )
+    use_debug_memory: BoolProperty(
+        name='Debug memory stats',
+        description='Print the peak python memory use of the import to the console. Slows down the import',
+        default=False,
+    )
 
     @classmethod
     def poll(cls, context):
@@ -89,6 +98,11 @@ class SUB_OP_import_selected_anim(bpy.types.Operator):
         ssp.last_anim_import_dir = str(Path(selected_anim.path).parent)
         obj: bpy.types.Object = context.object
         
+        if self.use_debug_memory:
+            tracemalloc.start()
+        # Imported here, since registering the addon doesn't need the profiler.
+        import cProfile
+        import pstats
         with cProfile.Profile() as pr:
             use_keyframe_insert_auto = bpy.context.scene.tool_settings.use_keyframe_insert_auto
             bpy.context.scene.tool_settings.use_keyframe_insert_auto = False
@@ -99,7 +113,8 @@ class SUB_OP_import_selected_anim(bpy.types.Operator):
                 bpy.ops.object.mode_set(mode='POSE', toggle=False)
                 import_model_anim(context, selected_anim.path,
                                         self.include_transform_track, self.include_material_track,
-                                        self.include_visibility_track, self.first_blender_frame)
+                                        self.include_visibility_track, self.first_blender_frame,
+                                        self.use_chunked_import)
                 bpy.ops.object.mode_set(mode=old_mode, toggle=False)
             else:
                 import_camera_anim(self, context, selected_anim.path, self.first_blender_frame)
@@ -108,6 +123,10 @@ class SUB_OP_import_selected_anim(bpy.types.Operator):
             stats = pstats.Stats(pr)
             stats.sort_stats(pstats.SortKey.TIME)
             stats.print_stats()
+        if self.use_debug_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f'Animation Import peak python memory: {peak / (1024 * 1024):.2f} MiB')
             
         return {'FINISHED'}
     
@@ -117,7 +136,9 @@ class SUB_OP_import_selected_anim(bpy.types.Operator):
         layout.prop(self, "include_material_track")
         layout.prop(self, "include_visibility_track")
         layout.prop(self, "first_blender_frame")
+        layout.prop(self, "use_chunked_import")
         layout.prop(self, "use_debug_timer")
+        layout.prop(self, "use_debug_memory")
 
 class SUB_PT_import_anim(Panel):
     bl_space_type = 'VIEW_3D'
@@ -198,11 +219,21 @@ class SUB_OP_import_anim(Operator):
         description='What frame to start importing the track on',
         default=1,
     )
+    use_chunked_import: BoolProperty(
+        name='Low Memory Import',
+        description='Write each bone\'s keyframes before converting the next bone. The whole animation file is still read into memory, so memory use still grows with the animation length',
+        default=False,
+    )
     use_debug_timer: BoolProperty(
         name='Debug timing stats',
         description='Print advance import timing info to the console',
         default=False,
     )
+    use_debug_memory: BoolProperty(
+        name='Debug memory stats',
+        description='Print the peak python memory use of the import to the console. Slows down the import',
+        default=False,
+    )
 
     filepath: StringProperty(subtype="FILE_PATH")
 
@@ -228,6 +259,11 @@ class SUB_OP_import_anim(Operator):
         ssp.last_anim_import_dir = str(Path(self.filepath).parent)
         obj: bpy.types.Object = context.object
         
+        if self.use_debug_memory:
+            tracemalloc.start()
+        # Imported here, since registering the addon doesn't need the profiler.
+        import cProfile
+        import pstats
         with cProfile.Profile() as pr:
             use_keyframe_insert_auto = bpy.context.scene.tool_settings.use_keyframe_insert_auto
             bpy.context.scene.tool_settings.use_keyframe_insert_auto = False
@@ -238,7 +274,8 @@ class SUB_OP_import_anim(Operator):
                 bpy.ops.object.mode_set(mode='POSE', toggle=False)
                 import_model_anim(context, self.filepath,
                                         self.include_transform_track, self.include_material_track,
-                                        self.include_visibility_track, self.first_blender_frame)
+                                        self.include_visibility_track, self.first_blender_frame,
+                                        self.use_chunked_import)
                 bpy.ops.object.mode_set(mode=old_mode, toggle=False)
             else:
                 import_camera_anim(self, context, self.filepath, self.first_blender_frame)
@@ -247,6 +284,10 @@ class SUB_OP_import_anim(Operator):
             stats = pstats.Stats(pr)
             stats.sort_stats(pstats.SortKey.TIME)
             stats.print_stats()
+        if self.use_debug_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f'Animation Import peak python memory: {peak / (1024 * 1024):.2f} MiB')
 
         return {'FINISHED'}
   
@@ -422,11 +463,76 @@ class BoneFCurves():
         self.translation.set_keyframe_values_from_stash()
         self.rotation.set_keyframe_values_from_stash()
         self.scale.set_keyframe_values_from_stash()
+    def set_keyframe_values_from_array(self, co: np.ndarray):
+        # co has the shape (10, key_count, 2), with (frame, value) pairs for location xyz, rotation wxyz and scale xyz
+        fcurves = (
+            self.translation.x, self.translation.y, self.translation.z,
+            self.rotation.w, self.rotation.x, self.rotation.y, self.rotation.z,
+            self.scale.x, self.scale.y, self.scale.z,
+        )
+        for fcurve, fcurve_co in zip(fcurves, co):
+            fcurve.keyframe_points.add(count=len(fcurve_co))
+            fcurve.keyframe_points.foreach_set('co', fcurve_co.ravel())
+
+
+def get_bone_keyframe_co(bone: bpy.types.PoseBone, node, bone_to_node, frame_start: int) -> np.ndarray:
+    '''
+    Converts every frame of the bone's transform track to its matrix basis.
+    Returns an array with the shape (10, key_count, 2) for BoneFCurves.set_keyframe_values_from_array.
+    Setting bone.matrix computes the matrix basis from the parent's pose matrix that it was given,
+    so a bone's keyframes never depend on the frame the other bones were last posed in, only on its parents being converted first.
+    '''
+    track = node.tracks[0]
+    key_count = len(track.values)
+    co = np.empty((10, key_count, 2), dtype=np.float32)
+    co[:, :, 0] = np.arange(frame_start, frame_start + key_count)
+    for index in range(key_count):
+        raw_matrix = get_raw_matrix(bone_to_node, bone, index, node)
+        if bone.parent is None:
+            # The root bone
+            y_up_to_z_up = Matrix.Rotation(math.radians(90), 4, 'X')
+            x_major_to_y_major = Matrix.Rotation(math.radians(-90), 4, 'Z')
+            bone.matrix = y_up_to_z_up @ raw_matrix @ x_major_to_y_major
+            matrix_basis = bone.matrix_basis
+        else:
+            # The anim transform is relative to the parent bone's animated world transform.
+            bone.matrix = bone.parent.matrix @ get_blender_transform(raw_matrix).transposed()
+            # Matrix basis is the transform set for the pose bone by the user.
+            # The fcurves work on these user configurable values.
+            matrix_basis = apply_transform_flags(bone.matrix_basis, track.transform_flags)
+        t, r, s = matrix_basis.decompose()
+        co[:, index, 1] = (t[0], t[1], t[2], r[0], r[1], r[2], r[3], s[0], s[1], s[2])
+    return co
+
+def import_transform_group(arma: bpy.types.Object, transform_group, frame_start: int, use_chunked_import: bool=False):
+    '''
+    Converts the transform track of every animated bone, parents before children, and writes the keyframes to new fcurves.
+    By default every bone is converted before any fcurve is written.
+    With use_chunked_import, each bone's keyframes are written and freed before converting the next bone,
+    so only one bone's converted frames are held at a time.
+    The tracks read by ssbh_data_py stay in memory either way, so peak memory still grows with the frame count.
+    '''
+    bones: list[bpy.types.PoseBone] = arma.pose.bones
+    bone_to_node = {bones[n.name]:n for n in transform_group.nodes if n.name in bones}
+    fcurves = arma.animation_data.action.fcurves
+    reordered: list[bpy.types.PoseBone] = get_heirarchy_order(list(bones)) # Do this to gaurantee we never process a child before its parent
+    if use_chunked_import:
+        for bone in reordered:
+            node = bone_to_node.get(bone)
+            # Some bones may not be animated, but their children may be.
+            if node is not None:
+                BoneFCurves(bone.name, fcurves, 0).set_keyframe_values_from_array(get_bone_keyframe_co(bone, node, bone_to_node, frame_start))
+        return
 
+    bone_to_fcurves = {b:BoneFCurves(b.name, fcurves, 0) for b in bone_to_node} # only create fcurves for animated bones
+    bone_to_co = {bone:get_bone_keyframe_co(bone, bone_to_node[bone], bone_to_node, frame_start) for bone in reordered if bone in bone_to_node}
+    for bone, bone_fcurves in bone_to_fcurves.items():
+        bone_fcurves.set_keyframe_values_from_array(bone_to_co[bone])
 
 def import_model_anim(context: bpy.types.Context, filepath: str,
                       include_transform_track, include_material_track,
-                      include_visibility_track, first_blender_frame):
+                      include_visibility_track, first_blender_frame,
+                      use_chunked_import=False):
     # Load the anim data first with ssbh_data_py since blender setup relies on data from it
     ssbh_anim_data = ssbh_data_py.anim_data.read_anim(filepath)
     # Blender Action setup
@@ -447,44 +553,7 @@ def import_model_anim(context: bpy.types.Context, filepath: str,
     # Transform group import stuff
     transform_group = name_to_group_dict.get('Transform') if include_transform_track else None
     if transform_group:
-        bones: list[bpy.types.PoseBone] = arma.pose.bones
-        bone_to_node = {bones[n.name]:n for n in transform_group.nodes if n.name in bones}
-        reordered: list[bpy.types.PoseBone] = get_heirarchy_order(list(bones)) # Do this to gaurantee we never process a child before its parent
-        bone_to_fcurves = {b:BoneFCurves(b.name, arma.animation_data.action.fcurves, len(n.tracks[0].values)) for b,n in bone_to_node.items()} # only create fcurves for animated bones
-
-        for index, frame in enumerate(range(scene.frame_start, scene.frame_end + 1)): # +1 because range() excludes the final value
-            for bone in reordered:
-                node = bone_to_node.get(bone)
-                # Some bones may not be animated, but their children may be.
-                if node is None: 
-                    continue
-
-                # Bones either have a value on the first frame or every frame.
-                if index >= len(node.tracks[0].values): 
-                    continue 
-
-                raw_matrix = get_raw_matrix(bone_to_node, bone, index, node)
-
-                bone_fcurves = bone_to_fcurves[bone]
-                if bone.parent is None:
-                    # The root bone
-                    y_up_to_z_up = Matrix.Rotation(math.radians(90), 4, 'X')
-                    x_major_to_y_major = Matrix.Rotation(math.radians(-90), 4, 'Z')
-                    bone.matrix = y_up_to_z_up @ raw_matrix @ x_major_to_y_major
-
-                    bone_fcurves.stash_keyframe_set_from_matrix(index, frame, bone.matrix_basis)
-                else:
-                    # The anim transform is relative to the parent bone's animated world transform.
-                    bone.matrix = bone.parent.matrix @ get_blender_transform(raw_matrix).transposed()
-
-                    # Matrix basis is the transform set for the pose bone by the user.
-                    # The fcurves work on these user configurable values.
-                    matrix_basis = apply_transform_flags(bone.matrix_basis, node.tracks[0].transform_flags)
-
-                    bone_fcurves.stash_keyframe_set_from_matrix(index, frame, matrix_basis)
-
-        for bone, bone_fcurves in bone_to_fcurves.items():
-            bone_fcurves.set_keyframe_values_from_stash()
+        import_transform_group(arma, transform_group, scene.frame_start, use_chunked_import)
 
     # Visibility group import stuff
     visibility_group = name_to_group_dict.get('Visibility') if include_visibility_track else None
@@ -1,5 +1,7 @@
 import bpy
 
+from ..anim.fcurve_index import FCurveIndex
+
 class SUB_OP_apply_ik_animation_operator(bpy.types.Operator):
     """Bake IK Animation to Original Bones and Remove IK Bones"""
     bl_idname = "sub.apply_ik_animation"
@@ -66,19 +68,13 @@ class SUB_OP_apply_ik_animation_operator(bpy.types.Operator):
         # Clean up keyframes for deleted bones
         if armature_object.animation_data and armature_object.animation_data.action:
             action = armature_object.animation_data.action
-            fcurves_to_remove = []
+            fcurve_index = FCurveIndex(action)
             
             # Find all fcurves related to the deleted IK bones
-            for i, fcurve in enumerate(action.fcurves):
-                for bone_name in ik_bones_to_delete:
-                    # Check if fcurve data_path contains bone name in the format pose.bones["BoneName"]
-                    if f'pose.bones["{bone_name}"]' in fcurve.data_path:
-                        fcurves_to_remove.append(i)
-                        break
+            fcurves_to_remove = [fcurve for bone_name in ik_bones_to_delete for fcurve in fcurve_index.get_bone_fcurves(bone_name)]
             
-            # Remove the identified fcurves in reverse order to avoid index shifting issues
-            for i in sorted(fcurves_to_remove, reverse=True):
-                action.fcurves.remove(action.fcurves[i])
+            for fcurve in fcurves_to_remove:
+                action.fcurves.remove(fcurve)
             
             if fcurves_to_remove:
                 self.report({'INFO'}, f"Removed {len(fcurves_to_remove)} keyframe channels from deleted IK bones.")
@@ -1,6 +1,8 @@
 import bpy
 from bpy.types import Operator
 
+from ..anim.fcurve_index import FCurveIndex
+
 class SUB_OP_transfer_hip_animation(Operator):
     bl_idname = "sub.transfer_hip_animation"
     bl_label = "Transfer Hip Animation"
@@ -41,15 +43,10 @@ class SUB_OP_transfer_hip_animation(Operator):
             return {'CANCELLED'}
         
         action = armature.animation_data.action
+        fcurve_index = FCurveIndex(action)
         
         # Find hip X location fcurve
-        hip_x_fcurve = None
-        hip_path = f'pose.bones["{hip_bone.name}"].location'
-        
-        for fc in action.fcurves:
-            if fc.data_path == hip_path and fc.array_index == 0:  # X location
-                hip_x_fcurve = fc
-                break
+        hip_x_fcurve = fcurve_index.get_bone_fcurve(hip_bone.name, 'location', 0)
                 
         if not hip_x_fcurve:
             self.report({'ERROR'}, "No X location keyframes found for Hip bone")
@@ -76,13 +73,8 @@ class SUB_OP_transfer_hip_animation(Operator):
             keyframes[i] = (keyframes[i][0], keyframes[i][1] - first_value, keyframes[i][2])
         
         # Create or get Trans Z fcurve
-        trans_z_fcurve = None
         trans_path = f'pose.bones["{trans_bone.name}"].location'
-        
-        for fc in action.fcurves:
-            if fc.data_path == trans_path and fc.array_index == 2:  # Z location
-                trans_z_fcurve = fc
-                break
+        trans_z_fcurve = fcurve_index.get_bone_fcurve(trans_bone.name, 'location', 2)
         
         if not trans_z_fcurve:
             trans_z_fcurve = action.fcurves.new(trans_path, index=2)
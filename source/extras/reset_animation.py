@@ -3,6 +3,8 @@ from bpy.types import Operator
 from bpy.props import BoolProperty
 import logging
 
+from ..anim.fcurve_index import FCurveIndex
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -52,23 +54,16 @@ class SUB_OT_reset_bone_locations(Operator):
         location_fcurves = []
         scale_fcurves = []
         
-        for fcurve in action.fcurves:
-            # Parse the data path to get bone name
-            # Format: pose.bones["BoneName"].location[0]
-            if "pose.bones" not in fcurve.data_path:
-                continue
-                
-            # Extract bone name
-            bone_name = fcurve.data_path.split('"')[1]
-            
+        fcurve_index = FCurveIndex(action)
+        for bone_name, channel, _, fcurve in fcurve_index.get_bone_transform_items():
             # Skip excluded bones
             if bone_name in excluded_bones:
                 continue
             
             # Categorize fcurve
-            if ".location" in fcurve.data_path:
+            if channel == 'location':
                 location_fcurves.append(fcurve)
-            elif ".scale" in fcurve.data_path:
+            elif channel == 'scale':
                 scale_fcurves.append(fcurve)
         
         # Reset location to 0 and scale to 1 for all bones except excluded ones
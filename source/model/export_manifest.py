@@ -0,0 +1,100 @@
+import os
+import json
+import hashlib
+
+from pathlib import Path
+from typing import Callable
+
+MANIFEST_FILE_NAME = '.smush_blender_export_manifest.json'
+MANIFEST_VERSION = 1
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+def hash_file(path: Path) -> str | None:
+    try:
+        return hash_bytes(path.read_bytes())
+    except OSError:
+        return None
+
+def get_temp_path(path: Path) -> Path:
+    # Keep the extension, since some writers like ultimate_tex pick the output format from it.
+    return path.with_name(path.stem + '.tmp' + path.suffix)
+
+class ExportManifest():
+    '''
+    Records the content hash of every file an export wrote, stored next to the exported files.
+    Files are only written when their bytes change, so packers and sync tools can rely on file modification times.
+    Textures also record the hash of the source pixels and the format, so unchanged images aren't encoded again.
+    '''
+    def __init__(self, folder: Path):
+        self.path = folder.joinpath(MANIFEST_FILE_NAME)
+        self.files: dict[str, str] = {}
+        self.textures: dict[str, dict[str, str]] = {}
+        self.written: list[str] = []
+        self.skipped: list[str] = []
+        try:
+            manifest = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return
+        if manifest.get('version') != MANIFEST_VERSION:
+            return
+        self.files = manifest.get('files', {})
+        self.textures = manifest.get('textures', {})
+
+    def save_if_changed(self, path: Path, save: Callable[[str], None], record: bool=True) -> bool:
+        '''
+        Calls save with a temporary path next to path, and only replaces path if the saved bytes are different.
+        Returns True if path was written. Files saved with record=False aren't listed in the manifest.
+        '''
+        temp_path = get_temp_path(path)
+        try:
+            save(str(temp_path))
+        except Exception:
+            if temp_path.exists():
+                temp_path.unlink()
+            raise
+        return self.replace_if_changed(path, temp_path, record)
+
+    def replace_if_changed(self, path: Path, temp_path: Path, record: bool=True) -> bool:
+        '''
+        Moves the already saved temp_path to path if the bytes are different, or deletes it otherwise.
+        Returns True if path was written.
+        '''
+        new_hash = hash_file(temp_path)
+        changed = not path.exists() or hash_file(path) != new_hash
+        if changed:
+            os.replace(temp_path, path)
+        else:
+            temp_path.unlink()
+        if record:
+            self.files[path.name] = new_hash
+            (self.written if changed else self.skipped).append(path.name)
+        return changed
+
+    def is_texture_unchanged(self, path: Path, pixel_hash: str, format: str) -> bool:
+        '''
+        True if the .nutexb at path was encoded from the same pixels in the same format, and hasn't been changed on disk since.
+        '''
+        entry = self.textures.get(path.name)
+        if entry is None or entry.get('pixel_hash') != pixel_hash or entry.get('format') != format:
+            return False
+        return hash_file(path) == entry.get('file_hash')
+
+    def skip_texture(self, path: Path):
+        self.files[path.name] = self.textures[path.name]['file_hash']
+        self.skipped.append(path.name)
+
+    def record_texture(self, path: Path, pixel_hash: str, format: str):
+        # Call after save_if_changed, which already hashed the file.
+        self.textures[path.name] = {'pixel_hash': pixel_hash, 'format': format, 'file_hash': self.files.get(path.name) or hash_file(path)}
+
+    def save(self) -> bool:
+        '''
+        Saves the manifest the same way as the exported files, so an export that changed nothing leaves the manifest untouched too.
+        Only the hashes are stored, never anything that changes on every export like timestamps or the written and skipped lists.
+        Returns True if the manifest was written.
+        '''
+        manifest = {'version': MANIFEST_VERSION, 'files': self.files, 'textures': self.textures}
+        text = json.dumps(manifest, indent=4, sort_keys=True)
+        return self.save_if_changed(self.path, lambda temp_path: Path(temp_path).write_text(text), record=False)
@@ -7,8 +7,6 @@ import math
 import bmesh
 import re
 import traceback
-import cProfile
-import pstats
 
 from pathlib import Path
 from bpy_extras.io_utils import ImportHelper
@@ -16,14 +14,37 @@ from bpy.props import StringProperty, BoolProperty, EnumProperty
 from bpy.types import Operator, Panel, EditBone, Object, Context, EditBone, Mesh, MeshVertex, ShapeKey
 from mathutils import Vector, Matrix
 
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, NamedTuple
 if TYPE_CHECKING:
     from .skel.helper_bone_data import SubHelperBoneData, AimConstraint, OrientConstraint
     from ..blender_property_extensions import SubSceneProperties
+    from .mesh.mesh_conversion import CornerMesh
 
 from ...dependencies import ssbh_data_py
 from ...dependencies import pyprc
 from .material import material_inputs
+from .mesh.mesh_object_arrays import MeshObjectArrays, make_ssbh_mesh_object
+from .mesh import export_cache
+from .skel.bone_order import get_parent_first_order, get_vanilla_order, get_parent_indices
+from .mesh.export_validation import validate_export_meshes, SMASH_UV_NAMES, SMASH_COLOR_NAMES
+from .export_manifest import ExportManifest
+
+
+class ExportMesh(NamedTuple):
+    '''
+    The faces of a processed temporary mesh that use one material.
+    Every material of a mesh shares the same temporary mesh, so no per material copies are made.
+    mesh is the object the vertex groups, material slots and name are read from, mesh_data is the temporary mesh.
+    Meshes reused from the export cache have no temporary mesh, only the cached arrays.
+    A "_VIS" shape key split from arrays shares the ExportMesh of its base mesh, with shape_key_name set.
+    '''
+    mesh: Object
+    mesh_data: Mesh | None
+    material_index: int
+    material: bpy.types.Material | None
+    cached_arrays: MeshObjectArrays | None = None
+    cache_key: str | None = None
+    shape_key_name: str | None = None
 
 
 class SUB_PT_export_model(Panel):
@@ -204,6 +225,7 @@ class SUB_OP_model_exporter(Operator):
         description='Ignore or Apply the Mesh Modifiers',
         items=(
             ('APPLY', 'Apply Modifiers', 'Applies any mesh modifiers. Remember that some modifiers work strangely with un-applied transforms, if you notice export issues please apply transforms before exporting.'),
+            ('EVALUATED', 'Apply Modifiers (Evaluated)', 'Reads the already evaluated mesh with all modifiers instead of applying them one at a time. Faster, and the original mesh is never copied or modified. Shape keys are still ignored unless split into "VIS" meshes.'),
             ('IGNORE', 'Ignore Modifiers', 'Ignores the mesh modifiers.'),
         ),
         default='APPLY',
@@ -228,6 +250,30 @@ class SUB_OP_model_exporter(Operator):
         ),
         default='NONE',
     )
+    optimize_vertex_cache: BoolProperty(
+        name='Optimize Vertex Cache',
+        description='Reorders triangles and vertices for better GPU vertex cache use in game. Slower to export, and the cache stats of each mesh are reported',
+        default=False,
+    )
+    tangent_method: EnumProperty(
+        name='Tangents',
+        description='How to calculate the exported tangents',
+        items=(
+            ('BLENDER', "Blender's MikkTSpace", "Uses blender's MikkTSpace tangents, which match normal maps baked in Blender or other programs."),
+            ('VECTORIZED', 'Vectorized MikkTSpace (Experimental)', 'Experimental. Calculates MikkTSpace style tangents from the exported vertices instead of the temporary blender mesh. Faster for large meshes, but not yet verified to match blender on every mesh. Compare with test/test_tangent_parity.py'),
+        ),
+        default='BLENDER',
+    )
+    use_export_cache: BoolProperty(
+        name='Reuse Unchanged Meshes',
+        description='Meshes that are unchanged since their last export in this session reuse the previously exported data instead of being processed again. Warnings for reused meshes are only reported on their first export',
+        default=False,
+    )
+    use_export_manifest: BoolProperty(
+        name='Only Write Changed Files',
+        description='Files whose contents are unchanged are not rewritten, so their modification times are kept. Textures are only encoded again if their pixels or format changed. Hashes are stored in a manifest file in the export folder',
+        default=False,
+    )
     use_debug_timer: BoolProperty(
         name='Print debug timing stats',
         description='Prints advance import timing info to the console, useful for development of this plugin.',
@@ -249,11 +295,15 @@ class SUB_OP_model_exporter(Operator):
     
     def execute(self, context):
         start = time.perf_counter()
+        # Imported here, since registering the addon doesn't need the profiler.
+        import cProfile
+        import pstats
         with cProfile.Profile() as pr:
             export_model(self, context, self.directory, self.include_numdlb, self.include_numshb, self.include_numshexb,
                     self.include_nusktb, self.include_numatb, self.include_nuhlpb, self.include_nutexb, self.linked_nusktb_settings,
                     self.optimize_mesh_weights_to_parent_bone, self.armature_position, self.apply_modifiers,
-                    self.split_shape_keys, self.ignore_underscore_meshes)
+                    self.split_shape_keys, self.ignore_underscore_meshes, self.optimize_vertex_cache, self.use_export_cache,
+                    self.use_export_manifest, self.tangent_method)
         if self.use_debug_timer:
             stats = pstats.Stats(pr)
             stats.sort_stats(pstats.SortKey.TIME)
@@ -349,9 +399,28 @@ def weights_to_parent_bones(ssbh_mesh_data: ssbh_data_py.mesh_data.MeshData, ssb
 
 def export_model(operator: bpy.types.Operator, context, directory, include_numdlb, include_numshb, include_numshexb, include_nusktb,
                 include_numatb, include_nuhlpb, include_nutexb, linked_nusktb_settings, optimize_mesh_weights:str, armature_position: str,
-                apply_modifiers: str, split_shape_keys: str, ignore_underscore_meshes:str):
+                apply_modifiers: str, split_shape_keys: str, ignore_underscore_meshes:str, optimize_vertex_cache: bool=False,
+                use_export_cache: bool=False, use_export_manifest: bool=False, tangent_method: str='BLENDER'):
     # Prepare the scene for export and find the meshes to export.
     arma: bpy.types.Object = context.scene.sub_scene_properties.model_export_arma
+    unprocessed_meshes = get_unprocessed_meshes(arma, ignore_underscore_meshes)
+
+    # Check everything that would stop the mesh export up front, before the scene is modified or any mesh is processed.
+    if include_numshb or include_numshexb or include_numatb or include_numdlb:
+        report = validate_export_meshes(unprocessed_meshes, arma, apply_modifiers, split_shape_keys,
+                                        include_numshb or include_numshexb, include_numdlb or include_numatb)
+        for warning in report.warnings:
+            operator.report({'WARNING'}, warning)
+        if len(report.errors) > 0:
+            operator.report({'ERROR'}, report.message())
+            # Only skip the files with problems, so the skeleton, helper bones and any unaffected files are still exported.
+            skipped_files = report.skipped_files()
+            include_numshb = include_numshb and '.numshb' not in skipped_files
+            include_numshexb = include_numshexb and '.numshexb' not in skipped_files
+            include_numdlb = include_numdlb and '.numdlb' not in skipped_files
+            include_numatb = include_numatb and '.numatb' not in skipped_files
+            include_nutexb = include_nutexb and '.nutexb' not in skipped_files
+
     context.view_layer.objects.active = arma
 
     # Track old_pose_position to return armature to whatever setting the user had
@@ -373,22 +442,10 @@ def export_model(operator: bpy.types.Operator, context, directory, include_numdl
         selected_object.select_set(False)
 
     folder = Path(directory)
+    manifest = ExportManifest(folder) if use_export_manifest else None
     # Create and save files individually to make this step more robust.
     # Users can avoid errors in generating a file by disabling export for that file.
     if include_numshb or include_numshexb or include_numatb or include_numdlb:
-        # Only Mesh Objects, Skip Empty Objects
-        if ignore_underscore_meshes == 'IGNORE_STARTING_UNDERSCORE':
-            unprocessed_meshes: list[Object] = [child for child in arma.children if child.type == 'MESH' and len(child.data.vertices) > 0 and not child.name.startswith("_")] 
-        else:
-            unprocessed_meshes: list[Object] = [child for child in arma.children if child.type == 'MESH' and len(child.data.vertices) > 0] 
-        
-        # Remove swing meshes
-        unprocessed_meshes = [mesh for mesh in unprocessed_meshes if mesh.data.sub_swing_data_linked_mesh.is_swing_mesh == False]
-        
-        # TODO: Is it possible to keep the correct order for non imported meshes?
-        # TODO: Should users just re-order meshes in ssbh_editor instead?
-        unprocessed_meshes.sort(key=lambda mesh: mesh.get("numshb order", 10000))
-
         if len(unprocessed_meshes) == 0:
             message = f'No meshes are parented to the armature {arma.name}. Exported .NUMDLB, .NUMSHB, .NUMATB, and .NUMSHEXB files will have no entries.'
             operator.report({'WARNING'}, message)
@@ -401,13 +458,17 @@ def export_model(operator: bpy.types.Operator, context, directory, include_numdl
             group_name_to_unprocessed_meshes[trim_name(mesh.name)].add(mesh)
         
         ssbh_mesh_data = None
+        # The exported arrays of every ssbh mesh object, reused for the .numshexb and .adjb.
+        mesh_object_arrays: list[MeshObjectArrays] = []
         ssbh_modl_data = None
         ssbh_matl_data = None
-        group_name_to_unprocessed_meshes_to_export_meshes, new_shape_key_meshes = get_processed_meshes(operator, context, group_name_to_unprocessed_meshes, apply_modifiers, split_shape_keys, armature_position)
+        group_name_to_unprocessed_meshes_to_export_meshes, new_shape_key_meshes = get_processed_meshes(operator, context, group_name_to_unprocessed_meshes, apply_modifiers, split_shape_keys, armature_position,
+                                                                                                    (apply_modifiers, armature_position, optimize_vertex_cache, tangent_method) if use_export_cache else None,
+                                                                                                    tangent_method == 'BLENDER')
         try:
             if include_numshb:
                 try:
-                    ssbh_mesh_data = make_ssbh_mesh_data(operator, context, group_name_to_unprocessed_meshes_to_export_meshes)
+                    ssbh_mesh_data, mesh_object_arrays = make_ssbh_mesh_data(operator, context, group_name_to_unprocessed_meshes_to_export_meshes, optimize_vertex_cache, tangent_method)
                 except Exception as e:
                     operator.report({'ERROR'}, f'Failed to make ssbh mesh data, but will try to make the rest. Error="{e}" ; Traceback=\n{traceback.format_exc()}')
 
@@ -418,11 +479,11 @@ def export_model(operator: bpy.types.Operator, context, directory, include_numdl
                     operator.report({'ERROR'}, f'Failed to make modl_data (.NUMDLB), but will try to make the rest. Error="{e}" ; Traceback=\n{traceback.format_exc()}')
             
             if include_numatb:
-                just_export_meshes = set()
+                # A list, since ExportMesh can hold cached numpy arrays that can't be hashed.
+                just_export_meshes: list[ExportMesh] = []
                 for unprocessed_meshes_to_export_meshes in group_name_to_unprocessed_meshes_to_export_meshes.values():
                     for export_meshes in unprocessed_meshes_to_export_meshes.values():
-                        for export_mesh in export_meshes:
-                            just_export_meshes.add(export_mesh)
+                        just_export_meshes.extend(export_meshes)
                 
                 ssbh_matl_data = create_matl(operator, just_export_meshes)
                 if ssbh_matl_data is not None:
@@ -433,20 +494,24 @@ def export_model(operator: bpy.types.Operator, context, directory, include_numdl
                     try:
                         materials = get_mesh_materials(operator, just_export_meshes)
                         from .material.texture.export_nutexb import export_nutexb_from_blender_materials
-                        export_nutexb_from_blender_materials(operator, materials, folder)
+                        export_nutexb_from_blender_materials(operator, materials, folder, manifest)
                     except Exception as e:
                         operator.report({'ERROR'}, f'Texture exporting stopped early, error = {e} ; Traceback=\n{traceback.format_exc()}')
             if include_numshexb:
                 if ssbh_mesh_data is not None:
                     try:
-                        create_and_save_meshex(operator, folder, ssbh_mesh_data)
+                        create_and_save_meshex(operator, folder, ssbh_mesh_data, mesh_object_arrays, manifest)
                     except Exception as e:
                         operator.report({'ERROR'}, f'Failed to make mesh ex data (.NUMSHEXB), but will try to make the rest. Error="{e}" ; Traceback=\n{traceback.format_exc()}')
         finally:
+            temp_meshes: set[Mesh] = set()
             for group_name, unprocessed_meshes_to_export_meshes in group_name_to_unprocessed_meshes_to_export_meshes.items():
                 for unprocessed_mesh, export_meshes in unprocessed_meshes_to_export_meshes.items():
                     for export_mesh in export_meshes:
-                        bpy.data.meshes.remove(export_mesh.data)
+                        if export_mesh.mesh_data is not None:
+                            temp_meshes.add(export_mesh.mesh_data)
+            for temp_mesh in temp_meshes:
+                bpy.data.meshes.remove(temp_mesh)
             for new_shape_key_mesh in new_shape_key_meshes:
                 bpy.data.meshes.remove(new_shape_key_mesh.data)
 
@@ -460,45 +525,45 @@ def export_model(operator: bpy.types.Operator, context, directory, include_numdl
 
     if include_numshb:
         if ssbh_mesh_data is not None:
-            path = str(folder.joinpath('model.numshb'))
+            path = folder.joinpath('model.numshb')
             try:
-                ssbh_mesh_data.save(path)
+                save_export_file(manifest, path, ssbh_mesh_data.save)
             except Exception as e:
                 operator.report({'ERROR'}, f'Failed to save {path}: {e}')
 
     if include_nusktb:
         if ssbh_skel_data is not None:
-            path = str(folder.joinpath('model.nusktb'))
+            path = folder.joinpath('model.nusktb')
             try:
-                ssbh_skel_data.save(path)
+                save_export_file(manifest, path, ssbh_skel_data.save)
             except Exception as e:
                 operator.report({'ERROR'}, f'Failed to save .nusktb, Error="{e}" ; Traceback=\n{traceback.format_exc()}')
-        prc_path = str(folder.joinpath('update.prc'))
+        prc_path = folder.joinpath('update.prc')
         if prc is not None:
             try:
-                prc.save(prc_path)
+                save_export_file(manifest, prc_path, prc.save)
             except Exception as e:
                 operator.report({'ERROR'}, f'Failed to save update.prc, Error="{e}" ; Traceback=\n{traceback.format_exc()}')
 
     if include_nuhlpb:
         try:
-            create_and_save_nuhlpb(folder.joinpath('model.nuhlpb'), arma)
+            create_and_save_nuhlpb(folder.joinpath('model.nuhlpb'), arma, manifest)
         except Exception as e:
             operator.report({'ERROR'}, f'Failed to create .nuhlpb, Error="{e}" ; Traceback=\n{traceback.format_exc()}')
 
     if include_numdlb:
         if ssbh_modl_data is not None:
-            path = str(folder.joinpath('model.numdlb'))
+            path = folder.joinpath('model.numdlb')
             try:
-                ssbh_modl_data.save(path)
+                save_export_file(manifest, path, ssbh_modl_data.save)
             except Exception as e:
                 operator.report({'ERROR'}, f'Failed to save {path}: {e}')
 
     if include_numatb:
         if ssbh_matl_data is not None:
-            path = str(folder.joinpath('model.numatb'))
+            path = folder.joinpath('model.numatb')
             try:
-                ssbh_matl_data.save(path)
+                save_export_file(manifest, path, ssbh_matl_data.save)
             except Exception as e:
                 operator.report({'ERROR'}, f'Failed to save .numatb, Error="{e}" ; Traceback=\n{traceback.format_exc()}')
     
@@ -507,13 +572,11 @@ def export_model(operator: bpy.types.Operator, context, directory, include_numdl
         if all(data is not None for data in (ssbh_matl_data, ssbh_modl_data, ssbh_mesh_data)):
             renormal_meshes: list[tuple[str, int]] = [(entry.mesh_object_name, entry.mesh_object_subindex) for entry in ssbh_modl_data.entries if entry.material_label.startswith("RENORMAL")]
             if len(renormal_meshes) > 0:
-                ssbh_adj_data = ssbh_data_py.adj_data.AdjData()
-                for mesh_object_index, mesh_object in enumerate(ssbh_mesh_data.objects):
-                    if (mesh_object.name, mesh_object.subindex) in renormal_meshes:
-                        ssbh_adj_data.entries.append(ssbh_data_py.adj_data.AdjEntryData.from_mesh_object(mesh_object_index, mesh_object))
-                path = str(folder.joinpath('model.adjb'))
+                renormal_indices = [i for i, mesh_object in enumerate(ssbh_mesh_data.objects) if (mesh_object.name, mesh_object.subindex) in renormal_meshes]
+                ssbh_adj_data = make_ssbh_adj_data(ssbh_mesh_data, mesh_object_arrays, renormal_indices)
+                path = folder.joinpath('model.adjb')
                 try:
-                    ssbh_adj_data.save(path)
+                    save_export_file(manifest, path, ssbh_adj_data.save)
                 except Exception as e:
                     operator.report({'ERROR'}, f'Failed to save .adjb, Error="{e}" ; Traceback=\n{traceback.format_exc()}')
                     
@@ -523,6 +586,38 @@ def export_model(operator: bpy.types.Operator, context, directory, include_numdl
 
     arma.data.pose_position = old_pose_position
 
+    if manifest is not None:
+        try:
+            manifest.save()
+        except Exception as e:
+            operator.report({'ERROR'}, f'Failed to save {manifest.path}: {e}')
+        else:
+            operator.report({'INFO'}, f'Wrote {len(manifest.written)} changed files, skipped {len(manifest.skipped)} unchanged files.')
+
+def get_unprocessed_meshes(arma: bpy.types.Object, ignore_underscore_meshes: str) -> list[Object]:
+    # Only Mesh Objects, Skip Empty Objects
+    if ignore_underscore_meshes == 'IGNORE_STARTING_UNDERSCORE':
+        unprocessed_meshes: list[Object] = [child for child in arma.children if child.type == 'MESH' and len(child.data.vertices) > 0 and not child.name.startswith("_")] 
+    else:
+        unprocessed_meshes: list[Object] = [child for child in arma.children if child.type == 'MESH' and len(child.data.vertices) > 0] 
+    
+    # Remove swing meshes
+    unprocessed_meshes = [mesh for mesh in unprocessed_meshes if mesh.data.sub_swing_data_linked_mesh.is_swing_mesh == False]
+    
+    # TODO: Is it possible to keep the correct order for non imported meshes?
+    # TODO: Should users just re-order meshes in ssbh_editor instead?
+    unprocessed_meshes.sort(key=lambda mesh: mesh.get("numshb order", 10000))
+    return unprocessed_meshes
+
+def save_export_file(manifest: ExportManifest | None, path: Path, save):
+    '''
+    Saves with save(path), or only replaces an existing file if the saved bytes changed when there is a manifest.
+    '''
+    if manifest is None:
+        save(str(path))
+    else:
+        manifest.save_if_changed(path, save)
+
 def create_skel_and_prc(operator, context, linked_nusktb_settings, folder) -> tuple[ssbh_data_py.skel_data.SkelData, Any]:
     try:
         ssbh_skel_data, prc = make_skel(operator, context, linked_nusktb_settings)
@@ -552,29 +647,42 @@ def create_skel_and_prc(operator, context, linked_nusktb_settings, folder) -> tu
     return (ssbh_skel_data, prc)
 
 
-def create_and_save_meshex(operator, folder, ssbh_mesh_data):
-    meshex = ssbh_data_py.meshex_data.MeshExData.from_mesh_objects(ssbh_mesh_data.objects)
+def create_and_save_meshex(operator, folder, ssbh_mesh_data, mesh_object_arrays: list[MeshObjectArrays], manifest: ExportManifest | None = None):
+    from .mesh.mesh_ex import get_group_bounding_spheres
+    # Only the names are converted for grouping, since the bounding spheres come from the already exported arrays.
+    names = [mesh_object.name for mesh_object in ssbh_mesh_data.objects]
+    meshex = ssbh_data_py.meshex_data.MeshExData.from_mesh_objects([ssbh_data_py.mesh_data.MeshObjectData(o.name, o.subindex) for o in ssbh_mesh_data.objects])
+    bounding_spheres = get_group_bounding_spheres(names, [arrays.positions for arrays in mesh_object_arrays])
+    for group, (center, radius) in zip(meshex.mesh_object_groups, bounding_spheres):
+        group.bounding_sphere = ssbh_data_py.meshex_data.BoundingSphere(center, radius)
 
-    path = str(folder.joinpath('model.numshexb'))
+    path = folder.joinpath('model.numshexb')
     try:
-        meshex.save(path)
+        save_export_file(manifest, path, meshex.save)
     except Exception as e:
         operator.report({'ERROR'}, f'Failed to save {path}: {e}')
 
 
-def get_mesh_materials(operator, export_meshes) -> set[bpy.types.Material]:
+def make_ssbh_adj_data(ssbh_mesh_data, mesh_object_arrays: list[MeshObjectArrays], mesh_object_indices: list[int]) -> ssbh_data_py.adj_data.AdjData:
+    from .mesh.mesh_ex import calculate_vertex_adjacencies
+    # The adjacency of each mesh object is calculated in parallel from the exported arrays.
+    ssbh_adj_data = ssbh_data_py.adj_data.AdjData()
+    adjacencies = calculate_vertex_adjacencies([(mesh_object_arrays[i].vertex_indices, mesh_object_arrays[i].positions) for i in mesh_object_indices])
+    for mesh_object_index, adjacency in zip(mesh_object_indices, adjacencies):
+        entry = ssbh_data_py.adj_data.AdjEntryData(mesh_object_index)
+        entry.vertex_adjacency = adjacency
+        ssbh_adj_data.entries.append(entry)
+    return ssbh_adj_data
+
+def get_mesh_materials(operator, export_meshes: list[ExportMesh]) -> set[bpy.types.Material]:
     #  Gather Material Info
     materials = set()
-    for mesh in export_meshes:
-        if len(mesh.data.materials) > 0:
-            if mesh.data.materials[0] is not None:
-                if len(mesh.data.materials) > 1:
-                    message = f'The mesh {mesh.name} has more than one material slot. Only the first material will be exported.'
-                    operator.report({'WARNING'}, message)
-
-                materials.add(mesh.data.materials[0])
+    for export_mesh in export_meshes:
+        if len(export_mesh.mesh.material_slots) > 0:
+            if export_mesh.material is not None:
+                materials.add(export_mesh.material)
             else:
-                message = f'The mesh {mesh.name} has no material created for the first material slot.' 
+                message = f'The mesh {export_mesh.mesh.name} has no material created for material slot {export_mesh.material_index}.' 
                 message += ' Cannot create model.numatb. Create a material or disable .NUMATB export.'
                 raise RuntimeError(message)
 
@@ -609,15 +717,16 @@ def create_and_save_matl(operator, folder, export_meshes):
         operator.report({'ERROR'}, f'Failed to save .numatb, Error="{e}" ; Traceback=\n{traceback.format_exc()}')
 
 
-def get_material_label_from_mesh(operator, mesh):
+def get_material_label_from_mesh(operator, export_mesh: ExportMesh):
+    mesh = export_mesh.mesh
     if len(mesh.material_slots) == 0:
         message = f'No material assigned for {mesh.name}. Cannot create model.numdlb. Assign a material or disable .NUMDLB export.'
         raise RuntimeError(message)
 
-    material = mesh.material_slots[0].material
+    material = export_mesh.material
 
     if material is None:
-        message = f'The mesh {mesh.name} has no material created for the first material slot.' 
+        message = f'The mesh {mesh.name} has no material created for material slot {export_mesh.material_index}.' 
         message += ' Cannot create model.numdlb. Create a material or disable .NUMDLB export.'
         raise RuntimeError(message)
 
@@ -910,23 +1019,55 @@ def create_texture_sampler(operator, input, material_label, param_name):
     return texture_attribute, sampler_attribute
 
 
-def per_loop_to_per_vertex(per_loop, vertex_indices, dim):
-    # Consider the following per loop data.
-    # index, value
-    # 0, 1
-    # 1, 3
-    # 0, 1
-    
-    # This generates the following per vertex data.
-    # vertex, value
-    # 0, 1
-    # 1, 3
+def get_vis_shape_key_names(mesh_object: Object) -> list[str]:
+    if mesh_object.data.shape_keys is None:
+        return []
+    return [key_block.name for key_block in mesh_object.data.shape_keys.key_blocks if "_VIS" in key_block.name]
 
-    # Convert from 1D per loop to 2D per vertex using numpy indexing magic.
-    _, cols = dim
-    per_vertex = np.zeros(dim, dtype=np.float32)
-    per_vertex[vertex_indices] = per_loop.reshape((-1, cols))
-    return per_vertex
+def can_split_shape_keys_from_arrays(mesh_object: Object, apply_modifiers: str, armature_position: str) -> bool:
+    '''
+    The "_VIS" keys can be read straight from the key data if the exported vertices are the mesh vertices, unmoved by any modifier.
+    Otherwise the keys are split into object copies that go through the modifiers like any other mesh.
+    '''
+    # Blender weights smooth normals by corner angles, which only keep their values under rotation and uniform scale.
+    # Other transforms need the normals recalculated for the transformed mesh like the object copies.
+    matrix = np.array(mesh_object.matrix_basis, dtype=np.float64)[:3, :3]
+    gram = matrix.T @ matrix
+    if not np.allclose(gram, np.eye(3) * gram[0, 0], rtol=0.0, atol=1e-6 * max(gram[0, 0], 1e-20)):
+        return False
+    if apply_modifiers == 'IGNORE':
+        return True
+    # Armature modifiers don't move anything in the rest position.
+    return all(modifier.type == 'ARMATURE' and armature_position == 'REST' for modifier in mesh_object.modifiers)
+
+def get_shape_key_corner_data(mesh_object: Object, shape_key_name: str, corner_mesh: 'CornerMesh') -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Returns (positions, corner_normals, moved_vertices) of the shape key for the vertices and corners of the processed corner_mesh.
+    The corner normals are calculated by blender, so flat faces, sharp edges and custom normals match an object copy with the key applied.
+    '''
+    mesh_data: Mesh = mesh_object.data
+    key_block = mesh_data.shape_keys.key_blocks[shape_key_name]
+    key_positions = np.zeros(len(key_block.data) * 3, dtype=np.float32)
+    key_block.data.foreach_get('co', key_positions)
+    key_positions = key_positions.reshape((-1, 3))
+    base_positions = np.zeros(len(mesh_data.vertices) * 3, dtype=np.float32)
+    mesh_data.vertices.foreach_get('co', base_positions)
+    moved = np.any(key_positions != base_positions.reshape((-1, 3)), axis=1)
+    key_normals = np.array(key_block.normals_split_get(), dtype=np.float64).reshape((-1, 3))
+
+    source_vertex_indices = corner_mesh.source_vertex_indices
+    if source_vertex_indices is None:
+        source_vertex_indices = np.arange(len(corner_mesh.positions))
+    source_corner_indices = corner_mesh.source_corner_indices
+    if source_corner_indices is None:
+        source_corner_indices = np.arange(len(corner_mesh.corner_vertices))
+
+    # The same transforms as the base mesh in process_mesh, where transforming the mesh also transforms its normals.
+    matrix_basis = np.array(mesh_object.matrix_basis, dtype=np.float64)
+    positions = key_positions[source_vertex_indices].astype(np.float64) @ matrix_basis[:3, :3].T + matrix_basis[:3, 3]
+    corner_normals = key_normals[source_corner_indices] @ np.linalg.inv(matrix_basis[:3, :3])
+    corner_normals /= np.maximum(np.linalg.norm(corner_normals, axis=1, keepdims=True), 1e-20)
+    return positions, corner_normals, moved[source_vertex_indices]
 
 def split_mesh_shape_keys_to_new_meshes(operator: Operator, context: Context, mesh_object: Object) -> set[Object]:
     if mesh_object.data.shape_keys is None:
@@ -954,9 +1095,9 @@ def split_mesh_shape_keys_to_new_meshes(operator: Operator, context: Context, me
     return new_meshes
 
 def process_mesh(operator: Operator, context: Context, mesh_object_copy: Object, mesh_name_in_errors: str,
-                apply_modifiers: str, armature_position: str) -> set[Object]:
+                apply_modifiers: str, armature_position: str, calc_tangents: bool=True) -> list[ExportMesh]:
     """
-    Always returns at least one mesh, but since processing a mesh may split it by material, more than one mesh could be returned. 
+    Returns one ExportMesh per material used by the faces of the mesh. They all share mesh_object_copy, which is only split by material when exporting.
     """
 
     # Apply any transforms before exporting to preserve vertex positions.
@@ -981,22 +1122,70 @@ def process_mesh(operator: Operator, context: Context, mesh_object_copy: Object,
                 else:
                     bpy.ops.object.modifier_apply(modifier=modifier.name)
 
+    return prepare_export_mesh_data(operator, mesh_object_copy, mesh_object_copy.data, mesh_name_in_errors, calc_tangents)
+
+def process_evaluated_mesh(operator: Operator, context: Context, mesh_object: Object, mesh_name_in_errors: str, calc_tangents: bool=True) -> list[ExportMesh]:
+    """
+    Like process_mesh, but reads the mesh with all modifiers already applied from the depsgraph.
+    The original object and mesh are only read, the export meshes use a new temporary mesh instead of a copy of the object.
+    """
+    # The depsgraph shows the current shape key mix, so temporarily show only the basis.
+    # This matches shape_key_clear() in process_mesh, and only changes display settings that are restored afterwards.
+    shape_keys = mesh_object.data.shape_keys
+    old_show_only_shape_key = mesh_object.show_only_shape_key
+    old_active_shape_key_index = mesh_object.active_shape_key_index
+    if shape_keys is not None:
+        mesh_object.show_only_shape_key = True
+        mesh_object.active_shape_key_index = 0
+    try:
+        depsgraph = context.evaluated_depsgraph_get()
+        evaluated_mesh_object = mesh_object.evaluated_get(depsgraph)
+        mesh_data: Mesh = bpy.data.meshes.new_from_object(evaluated_mesh_object, preserve_all_data_layers=True, depsgraph=depsgraph)
+    finally:
+        if shape_keys is not None:
+            mesh_object.show_only_shape_key = old_show_only_shape_key
+            mesh_object.active_shape_key_index = old_active_shape_key_index
+
+    export_meshes: list[ExportMesh] = []
+    try:
+        # Apply any transforms before exporting to preserve vertex positions.
+        # Assume the meshes have no children that would inherit their transforms.
+        mesh_data.transform(mesh_object.matrix_basis)
+        export_meshes = prepare_export_mesh_data(operator, mesh_object, mesh_data, mesh_name_in_errors, calc_tangents)
+    finally:
+        if len(export_meshes) == 0:
+            bpy.data.meshes.remove(mesh_data)
+    return export_meshes
+
+def prepare_export_mesh_data(operator: Operator, mesh_object: Object, mesh_data: Mesh, mesh_name_in_errors: str, calc_tangents: bool=True) -> list[ExportMesh]:
+    """
+    Cleans up and triangulates mesh_data in place, then returns one ExportMesh per material used by its faces.
+    mesh_object is only read for its material slots.
+    If calc_tangents is False, convert_corner_mesh calculates the tangents from the exported arrays instead.
+    """
     # Cleanup and dissolve degen
     # https://blender.stackexchange.com/questions/139615/bmesh-ops-method-to-get-loose-vertices-edges-and-delete-from-that-list
     # https://blender.stackexchange.com/questions/206751/set-the-context-to-run-dissolve-degenerate-from-the-python-shell
+    # Store the vertex index before cleaning up, so exported vertices can be traced back to the shape key data.
+    source_vertex_indices = mesh_data.attributes.new(name='_smush_blender_vertex_index', type='INT', domain='POINT')
+    source_vertex_indices.data.foreach_set('value', np.arange(len(mesh_data.vertices), dtype=np.int32))
+    # Triangulating copies each corner's attributes, so shape key corner normals can be traced back the same way.
+    source_corner_indices = mesh_data.attributes.new(name='_smush_blender_corner_index', type='INT', domain='CORNER')
+    source_corner_indices.data.foreach_set('value', np.arange(len(mesh_data.loops), dtype=np.int32))
+
     bm = bmesh.new()
-    bm.from_mesh(mesh_object_copy.data)
+    bm.from_mesh(mesh_data)
     bmesh.ops.dissolve_degenerate(bm, dist=0.0001, edges=bm.edges)
     unlinked_verts = [v for v in bm.verts if len(v.link_faces) == 0]
     bmesh.ops.delete(bm, geom=unlinked_verts, context='VERTS')
-    bm.to_mesh(mesh_object_copy.data)
-    mesh_object_copy.data.update()
+    bm.to_mesh(mesh_data)
+    mesh_data.update()
     bm.clear()
     
     # Get the custom normals from the original mesh.
     # We use the copy here since applying transforms alters the normals.
-    loop_normals = np.zeros(len(mesh_object_copy.data.loops) * 3, dtype=np.float32)
-    mesh_object_copy.data.loops.foreach_get('normal', loop_normals)
+    loop_normals = np.zeros(len(mesh_data.loops) * 3, dtype=np.float32)
+    mesh_data.loops.foreach_get('normal', loop_normals)
 
     # Pad to 4 components for fitting in the color attribute.
     loop_normals = loop_normals.reshape((-1, 3))
@@ -1007,15 +1196,15 @@ def process_mesh(operator: Operator, context: Context, mesh_object_copy: Object,
     # This allows us to edit the mesh without affecting custom normals.
     # Use FLOAT_COLOR since FLOAT_VECTOR doesn't add a key for some reason.
     # TODO: Is it ok to always assume FLOAT_COLOR will allow signed values?
-    normals_color = mesh_object_copy.data.color_attributes.new(name='_smush_blender_custom_normals', type='FLOAT_COLOR', domain='CORNER')
+    normals_color = mesh_data.color_attributes.new(name='_smush_blender_custom_normals', type='FLOAT_COLOR', domain='CORNER')
     normals_color.data.foreach_set('color', loop_normals)
 
     # Check if any of the faces are not tris, and converts them into tris
-    if any(len(f.vertices) != 3 for f in mesh_object_copy.data.polygons):
+    if any(len(f.vertices) != 3 for f in mesh_data.polygons):
         operator.report({'WARNING'}, f'Mesh {mesh_name_in_errors} has non triangular faces. Triangulating a temporary mesh for export.')
 
         # https://blender.stackexchange.com/questions/45698
-        me = mesh_object_copy.data
+        me = mesh_data
         # Get a BMesh representation
         bm = bmesh.new()
         bm.from_mesh(me)
@@ -1027,70 +1216,59 @@ def process_mesh(operator: Operator, context: Context, mesh_object_copy: Object,
         bm.free()
 
     # Blender stores normals and UVs per loop rather than per vertex.
-    # Edges with more than one value per vertex need to be split.
-    split_duplicate_loop_attributes(mesh_object_copy)
-    # Rarely this will create some loose verts
-    bm = bmesh.new()
-    bm.from_mesh(mesh_object_copy.data)
-    unlinked_verts = [v for v in bm.verts if len(v.link_faces) == 0]
-    bmesh.ops.delete(bm, geom=unlinked_verts, context='VERTS')
-    bm.to_mesh(mesh_object_copy.data)
-    mesh_object_copy.data.update()
-    bm.clear()
+    # Vertices with more than one value per vertex are split later in convert_corner_mesh without editing the mesh.
 
-    # Split mesh by material
-    bm = bmesh.new()
-    bm.from_mesh(mesh_object_copy.data)
-    material_indices: set[int] = {f.material_index for f in bm.faces}
-    #bm.to_mesh(mesh_object_copy.data)
-    #mesh_object_copy.data.update()
-    bm.clear()
-    split_meshes: set[Object] = set()
-    for material_index in material_indices:
-        dest_obj: bpy.types.Object = mesh_object_copy.copy()
-        dest_obj.data: bpy.types.Mesh = mesh_object_copy.data.copy()
-        dest_bm = bmesh.new()
-        dest_bm.from_mesh(dest_obj.data)
-        dest_faces_to_split = [f for f in dest_bm.faces if f.material_index != material_index]
-        if len(dest_faces_to_split) > 0:
-            bmesh.ops.delete(dest_bm, geom=dest_faces_to_split, context='FACES')
-            dest_bm.to_mesh(dest_obj.data)
-        dest_bm.clear()
-        dest_obj.data.update()
-        mat = dest_obj.material_slots[material_index].material
-        dest_obj.data.materials.clear()
-        dest_obj.data.materials.append(mat)
-        split_meshes.add(dest_obj)
-    
-    for split_mesh in split_meshes:
-        # Extract the custom normals preserved in the color attribute.
-        # Color attributes should not be affected by splitting or triangulating.
-        # This avoids the datatransfer modifier not handling vertices at the same position.
-        loop_normals = np.zeros(len(split_mesh.data.loops) * 4, dtype=np.float32)
-        normals_color = split_mesh.data.color_attributes['_smush_blender_custom_normals']
-        normals_color.data.foreach_get('color', loop_normals)
+    # Extract the custom normals preserved in the color attribute.
+    # Color attributes should not be affected by triangulating.
+    # This avoids the datatransfer modifier not handling vertices at the same position.
+    loop_normals = np.zeros(len(mesh_data.loops) * 4, dtype=np.float32)
+    normals_color = mesh_data.color_attributes['_smush_blender_custom_normals']
+    normals_color.data.foreach_get('color', loop_normals)
 
-        # Remove the dummy fourth component.
-        loop_normals = loop_normals.reshape((-1, 4))[:,:3]
+    # Remove the dummy fourth component.
+    loop_normals = loop_normals.reshape((-1, 4))[:,:3]
 
-        # Assign the preserved custom normals to the temp mesh.
-        split_mesh.data.normals_split_custom_set(loop_normals)
-        split_mesh.data.update()
+    # Assign the preserved custom normals to the temp mesh.
+    mesh_data.normals_split_custom_set(loop_normals)
+    mesh_data.update()
+
+    # Calculate tangents now that the necessary attributes are initialized.
+    # Use Blender's implementation since it uses mikktspace.
+    # Mikktspace is necessary to properly bake normal maps in Blender or external programs.
+    # This addresses a number of consistency issues with how normals are encoded/decoded.
+    # This will be similar to the in game tangents apart from different smoothing.
+    # The vanilla tangents can still cause seams, so they aren't worth preserving.
+    # This is done once here instead of once per material in convert_corner_mesh.
+    if calc_tangents and len(mesh_data.polygons) > 0:
+        mesh_data.calc_tangents()
+
+    # Split mesh by material.
+    # The faces aren't separated here, convert_corner_mesh only converts the faces of its material.
+    material_indices = np.zeros(len(mesh_data.polygons), dtype=np.int64)
+    mesh_data.polygons.foreach_get('material_index', material_indices)
+    return [
+        ExportMesh(mesh_object, mesh_data, material_index, get_slot_material(mesh_object, material_index))
+        for material_index in np.unique(material_indices).tolist()
+    ]
 
-    return split_meshes
+def get_slot_material(mesh_object: Object, material_index: int) -> bpy.types.Material | None:
+    material_slots = mesh_object.material_slots
+    return material_slots[material_index].material if material_index < len(material_slots) else None
 
 def get_processed_meshes(operator: bpy.types.Operator, context: bpy.types.Context,
                     group_name_to_unprocessed_meshes: dict[str, set[bpy.types.Object]],
-                    apply_modifiers: str, split_shape_keys: str, armature_position: str) -> tuple[dict[str, dict[Object, set[Object]]], set[object]]:
+                    apply_modifiers: str, split_shape_keys: str, armature_position: str,
+                    export_cache_options: tuple | None = None, calc_tangents: bool = True) -> tuple[dict[str, dict[Object, list[ExportMesh]]], set[object]]:
     '''
     Splitting by shape key and by material may add more meshes to export, so need to track the new meshes.
+    If export_cache_options isn't None, unchanged meshes reuse their cached arrays instead of being processed, and the options are part of the cache key.
     In addition the new shapekeys could be named completely differently
     Example:
-    group_name_to_export_meshes_to_temp_meshes: dict[str, dict[Mesh, set[Mesh]]]
+    group_name_to_export_meshes_to_temp_meshes: dict[str, dict[Mesh, list[ExportMesh]]]
     |-> Cube             "Group Name"       # This is the trimmed name that will show up in the numshb
         |-> Cube.001     "Unprocessed Mesh" # This is the mesh in blender un-modified with its un-trimmed name and shape keys that the user wants to export.
             |-> Cube.003 "Export Mesh"      # Every blender mesh will make at least one temporary "Export Mesh". This is the mesh that has been modified and cleaned up.
-            |-> Cube.004 "Export Mesh"      # Maybe this one has two export meshes because it had more than one material
+            |-> Cube.003 "Export Mesh"      # Maybe this one has two export meshes because it had more than one material, both share the same temporary mesh
             |-> Cube.005 "Export Mesh"      # Or maybe it had shape keys
         |-> Cube.002     "Unprocessed Mesh" # For proper error reporting, unprocessed meshes need to be tracked as well
             |-> Cube.006 "Export Mesh"      # Since saying "Cube.006 Failed" would not be helpful when "Cube.006" is not a mesh the user made
@@ -1107,9 +1285,16 @@ def get_processed_meshes(operator: bpy.types.Operator, context: bpy.types.Contex
     new_shape_key_meshes: set[Object] = set()
     # If a mesh was succesfully split into multiple shapekey
     meshes_that_split_into_shapekeys: set[Object] = set()
+    # Meshes whose "_VIS" keys are made from the key data and the processed base mesh, without any object copies.
+    unprocessed_mesh_to_shape_key_names: dict[Object, list[str]] = {}
     if split_shape_keys in ('EXPORT_INCLUDE_ORIGINAL', 'EXPORT_EXCULDE_ORIGINAL'):
         for group_name, unprocessed_meshes in group_name_to_unprocessed_meshes.items():
             for unprocessed_mesh in unprocessed_meshes:
+                if can_split_shape_keys_from_arrays(unprocessed_mesh, apply_modifiers, armature_position):
+                    shape_key_names = get_vis_shape_key_names(unprocessed_mesh)
+                    if len(shape_key_names) > 0:
+                        unprocessed_mesh_to_shape_key_names[unprocessed_mesh] = shape_key_names
+                    continue
                 meshes = split_mesh_shape_keys_to_new_meshes(operator, context, unprocessed_mesh)
                 if len(meshes) > 0:
                     new_shape_key_meshes |= meshes
@@ -1133,138 +1318,158 @@ def get_processed_meshes(operator: bpy.types.Operator, context: bpy.types.Contex
     
 
     # Return Dictionary initialization
-    group_name_to_unprocessed_meshes_to_export_meshes: dict[str, dict[Object, set[Object]]] = {}
+    group_name_to_unprocessed_meshes_to_export_meshes: dict[str, dict[Object, list[ExportMesh]]] = {}
     for group_name, unprocessed_meshes in group_name_to_unprocessed_meshes.items():
         group_name_to_unprocessed_meshes_to_export_meshes[group_name] = {}
         for unprocessed_mesh in unprocessed_meshes:
-            group_name_to_unprocessed_meshes_to_export_meshes[group_name][unprocessed_mesh] = set() 
+            group_name_to_unprocessed_meshes_to_export_meshes[group_name][unprocessed_mesh] = []
 
     # Process meshes
+    ssp: SubSceneProperties = context.scene.sub_scene_properties
     for group_name, unprocessed_meshes in group_name_to_unprocessed_meshes.items():
         for unprocessed_mesh in unprocessed_meshes:
+            cache_key = None
+            # Split "_VIS" keys are converted from the processed base mesh, so those meshes can't be reused from the cache.
+            if export_cache_options is not None and unprocessed_mesh not in unprocessed_mesh_to_shape_key_names:
+                cache_key = export_cache.get_mesh_object_hash(unprocessed_mesh, ssp.model_export_arma, export_cache_options)
+                cached_mesh_objects = export_cache.get_cached_mesh_objects(unprocessed_mesh.name, cache_key) if cache_key is not None else None
+                if cached_mesh_objects is not None:
+                    group_name_to_unprocessed_meshes_to_export_meshes[group_name][unprocessed_mesh].extend(
+                        ExportMesh(unprocessed_mesh, None, material_index, get_slot_material(unprocessed_mesh, material_index), arrays, cache_key)
+                        for material_index, arrays in cached_mesh_objects
+                    )
+                    continue
+
+            if apply_modifiers == 'EVALUATED':
+                export_meshes = process_evaluated_mesh(operator, context, unprocessed_mesh, unprocessed_mesh.name, calc_tangents)
+                group_name_to_unprocessed_meshes_to_export_meshes[group_name][unprocessed_mesh].extend(e._replace(cache_key=cache_key) for e in export_meshes)
+                continue
+
             # Make a copy of the mesh so that the original remains unmodified.
-            # The copy is out here so that is deleted regardless of error
+            # The copy is out here so that is deleted on error, otherwise export_model deletes it after exporting.
             unprocessed_mesh_copy: bpy.types.Object = unprocessed_mesh.copy()
             unprocessed_mesh_copy.data: bpy.types.Mesh = unprocessed_mesh.data.copy()
-            # This is needed for split_duplicate_loop_attributes()
+            # This is needed for applying modifiers with bpy.ops
             context.collection.objects.link(unprocessed_mesh_copy)
+            export_meshes: list[ExportMesh] = []
             try:
-                group_name_to_unprocessed_meshes_to_export_meshes[group_name][unprocessed_mesh] |= process_mesh(operator, context, unprocessed_mesh_copy, unprocessed_mesh.name, apply_modifiers, armature_position)
+                export_meshes = process_mesh(operator, context, unprocessed_mesh_copy, unprocessed_mesh.name, apply_modifiers, armature_position, calc_tangents)
+                context.collection.objects.unlink(unprocessed_mesh_copy)
             finally:
-                bpy.data.meshes.remove(unprocessed_mesh_copy.data)
+                if len(export_meshes) == 0:
+                    bpy.data.meshes.remove(unprocessed_mesh_copy.data)
+            group_name_to_unprocessed_meshes_to_export_meshes[group_name][unprocessed_mesh].extend(e._replace(cache_key=cache_key) for e in export_meshes)
 
+    # Each "_VIS" key reuses the processed base mesh, and only gets new positions and normals in make_ssbh_mesh_data.
+    for unprocessed_mesh, shape_key_names in unprocessed_mesh_to_shape_key_names.items():
+        unprocessed_meshes_to_export_meshes = group_name_to_unprocessed_meshes_to_export_meshes[trim_name(unprocessed_mesh.name)]
+        if split_shape_keys == 'EXPORT_EXCULDE_ORIGINAL':
+            base_export_meshes = unprocessed_meshes_to_export_meshes.pop(unprocessed_mesh)
+        else:
+            base_export_meshes = unprocessed_meshes_to_export_meshes[unprocessed_mesh]
+        for shape_key_name in shape_key_names:
+            # Split keys aren't cached on their own, since they share the unprocessed mesh with the base mesh.
+            shape_key_export_meshes = group_name_to_unprocessed_meshes_to_export_meshes.setdefault(trim_name(shape_key_name), {}).setdefault(unprocessed_mesh, [])
+            shape_key_export_meshes.extend(e._replace(cache_key=None, shape_key_name=shape_key_name) for e in base_export_meshes)
 
     return group_name_to_unprocessed_meshes_to_export_meshes, new_shape_key_meshes
     
-def make_ssbh_mesh_data(operator: Operator, context: Context, group_name_to_unprocessed_meshes_to_export_meshes: dict[str, dict[Object, set[Object]]]) -> ssbh_data_py.mesh_data.MeshData:
+def make_ssbh_mesh_data(operator: Operator, context: Context, group_name_to_unprocessed_meshes_to_export_meshes: dict[str, dict[Object, list[ExportMesh]]],
+                        optimize_vertex_cache: bool=False, tangent_method: str='BLENDER') -> tuple[ssbh_data_py.mesh_data.MeshData, list[MeshObjectArrays]]:
+    '''
+    Returns the mesh data and the arrays of each of its mesh objects in the same order.
+    '''
+    from .mesh.mesh_conversion import convert_corner_mesh, get_material_corners
+    from .mesh.shape_key_variants import make_shape_key_corner_mesh
     ssbh_mesh_data = ssbh_data_py.mesh_data.MeshData()
+    mesh_object_arrays: list[MeshObjectArrays] = []
+    # Every material and split "_VIS" key of a mesh reads from the same CornerMesh, so each processed mesh is only read once.
+    corner_meshes: dict[str, 'CornerMesh'] = {}
+    shape_key_corner_meshes: dict[tuple[str, str], 'CornerMesh'] = {}
     for group_name, unprocessed_meshes_to_export_meshes in group_name_to_unprocessed_meshes_to_export_meshes.items():
         subindex = 0
         for unprocessed_mesh, export_meshes in unprocessed_meshes_to_export_meshes.items():
+            material_index_to_arrays: list[tuple[int, MeshObjectArrays]] = []
             for export_mesh in export_meshes:
-                ssbh_mesh_object = make_mesh_object(operator, context, export_mesh, group_name, subindex, unprocessed_mesh.name)
-                ssbh_mesh_data.objects.append(ssbh_mesh_object)
+                if export_mesh.cached_arrays is not None:
+                    arrays = export_mesh.cached_arrays
+                else:
+                    if unprocessed_mesh.name not in corner_meshes:
+                        corner_meshes[unprocessed_mesh.name] = make_corner_mesh(context, export_mesh.mesh, export_mesh.mesh_data, unprocessed_mesh.name, tangent_method)
+                    corner_mesh = corner_meshes[unprocessed_mesh.name]
+                    if export_mesh.shape_key_name is not None:
+                        # The key's mesh is shared by every material like the base mesh.
+                        key = (unprocessed_mesh.name, export_mesh.shape_key_name)
+                        if key not in shape_key_corner_meshes:
+                            positions, corner_normals, moved_vertices = get_shape_key_corner_data(unprocessed_mesh, export_mesh.shape_key_name, corner_mesh)
+                            shape_key_corner_meshes[key] = make_shape_key_corner_mesh(corner_mesh, positions, corner_normals, moved_vertices)
+                        corner_mesh = shape_key_corner_meshes[key]
+                    corners = get_material_corners(corner_mesh, export_mesh.material_index)
+                    arrays = convert_corner_mesh(corner_mesh, corners, unprocessed_mesh.name, subindex, optimize_vertex_cache, operator.report)
+                ssbh_mesh_data.objects.append(make_ssbh_mesh_object(group_name, subindex, arrays))
+                mesh_object_arrays.append(arrays)
+                material_index_to_arrays.append((export_mesh.material_index, arrays))
                 subindex += 1
-    return ssbh_mesh_data
+            # Only cache the mesh once all of its materials exported without errors.
+            cache_keys = {export_mesh.cache_key for export_mesh in export_meshes}
+            if len(cache_keys) == 1 and None not in cache_keys:
+                export_cache.store_cached_mesh_objects(unprocessed_mesh.name, cache_keys.pop(), material_index_to_arrays)
+    return ssbh_mesh_data, mesh_object_arrays
+
+def get_vertex_group_weights(mesh_data: bpy.types.Mesh, group_indices_to_keep: list[int], vertex_indices_to_read: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Returns flat (vertex_index, group_index, weight) arrays for every vertex group assignment whose group is in group_indices_to_keep.
+    Only the sorted vertex indices in vertex_indices_to_read are read.
+    Blender has no foreach_get for the nested MeshVertex.groups collection, so this is the only per vertex python loop left.
+    '''
+    if len(group_indices_to_keep) == 0 or len(vertex_indices_to_read) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
 
-def make_mesh_object(operator, context, mesh: bpy.types.Object, group_name, i, mesh_name):
-    # ssbh_data_py accepts lists, tuples, or numpy arrays for AttributeData.data.
+    # Each vertex's groups are only looked up once, which is most of the cost.
+    if len(vertex_indices_to_read) == len(mesh_data.vertices):
+        vertex_groups = [v.groups for v in mesh_data.vertices]
+    else:
+        vertex_groups = [mesh_data.vertices[i].groups for i in vertex_indices_to_read.tolist()]
+    group_counts = np.fromiter(map(len, vertex_groups), dtype=np.int64, count=len(vertex_groups))
+    groups = [g for vertex_group in vertex_groups for g in vertex_group]
+    vertex_indices = np.repeat(vertex_indices_to_read.astype(np.int64), group_counts)
+    group_indices = np.fromiter((g.group for g in groups), dtype=np.int64, count=len(groups))
+    # Weights are divided in double precision, the same as the old python float math.
+    weights = np.fromiter((g.weight for g in groups), dtype=np.float64, count=len(groups))
+
+    keep = np.isin(group_indices, group_indices_to_keep)
+    return vertex_indices[keep], group_indices[keep], weights[keep]
+
+def make_corner_mesh(context: Context, mesh: bpy.types.Object, mesh_data: bpy.types.Mesh, mesh_name: str, tangent_method: str='BLENDER') -> 'CornerMesh':
+    '''
+    Reads the processed and triangulated mesh_data into a CornerMesh for the bpy free conversion in mesh_conversion.
+    This reads every material at once, so each material only selects its corners instead of reading the mesh again.
+    '''
+    from .mesh.mesh_conversion import CornerMesh
     # foreach_get and foreach_set provide substantially faster access to property collections in Blender.
     # https://devtalk.blender.org/t/alternative-in-2-80-to-create-meshes-from-python-using-the-tessfaces-api/7445/3
-    mesh_data: bpy.types.Mesh = mesh.data
-    ssbh_mesh_object = ssbh_data_py.mesh_data.MeshObjectData(group_name, i)
-    position0 = ssbh_data_py.mesh_data.AttributeData('Position0')
-
-    # TODO: Is there a better way to account for the change of coordinates?
-    axis_correction = np.array(Matrix.Rotation(math.radians(90), 3, 'X'))
 
     # For example, vertices is a bpy_prop_collection of MeshVertex, which has a "co" attribute for position.
     positions = np.zeros(len(mesh_data.vertices) * 3, dtype=np.float32)
     mesh_data.vertices.foreach_get('co', positions)
     # The output data is flattened, so we need to reshape it into the appropriate number of rows and columns.
-    position0.data = positions.reshape((-1, 3)) @ axis_correction
-    ssbh_mesh_object.positions = [position0]
+    positions = positions.reshape((-1, 3))
 
     # Store vertex indices as a numpy array for faster indexing later.
-    vertex_indices = np.zeros(len(mesh_data.loops), dtype=np.uint32)
-    mesh_data.loops.foreach_get('vertex_index', vertex_indices)
-    ssbh_mesh_object.vertex_indices = vertex_indices
+    loop_vertex_indices = np.zeros(len(mesh_data.loops), dtype=np.uint32)
+    mesh_data.loops.foreach_get('vertex_index', loop_vertex_indices)
 
-    # Export Normals
-    normal0 = ssbh_data_py.mesh_data.AttributeData('Normal0')
     loop_normals = np.zeros(len(mesh_data.loops) * 3, dtype=np.float32)
     mesh_data.loops.foreach_get('normal', loop_normals)
-    normals = per_loop_to_per_vertex(loop_normals, vertex_indices, (len(mesh_data.vertices), 3))
-    normals = normals @ axis_correction
-
-    # Pad normals to 4 components instead of 3 components.
-    # This actually results in smaller file sizes since HalFloat4 is smaller than Float3.
-    normals = np.append(normals, np.zeros((normals.shape[0],1)), axis=1)
-            
-    normal0.data = normals
-    ssbh_mesh_object.normals = [normal0]
-
-    # Export Weights
-    # TODO: Reversing a vertex -> group lookup to a group -> vertex lookup is expensive.
-    # TODO: Does Blender not expose this directly?
-    group_to_weights = { vg.index : (vg.name, []) for vg in mesh.vertex_groups }
-    has_unweighted_vertices = False
-    # TODO: Skip this for performance reasons if there are no vertex groups?
-    '''
-    Vertex groups can either be 'Deform' groups used for actual mesh deformation, or 'Other'
-    Only want the 'Deform' groups exported.
-    '''
-    ssp: SubSceneProperties = context.scene.sub_scene_properties
-    arma = ssp.model_export_arma
-    deform_vertex_group_indices = {vg.index for vg in mesh.vertex_groups if vg.name in arma.data.bones}
-    for vertex in mesh_data.vertices:
-        vertex: MeshVertex 
-        deform_groups = [g for g in vertex.groups if g.group in deform_vertex_group_indices]
-        if len(deform_groups) > 4:
-            # We won't fix this automatically since removing influences may break animations.
-            message = f'Vertex with more than 4 weights detected for mesh {mesh_name}.'
-            message += ' Select all in Edit Mode and click Mesh > Weights > Limit Total with the limit set to 4.'
-            message += ' Weights may need to be reassigned after limiting totals.'
-            raise RuntimeError(message)
+    loop_normals = loop_normals.reshape((-1, 3))
 
-        # Only report this warning once.
-        if len(deform_groups) == 0 or all([g.weight == 0.0 for g in deform_groups]):
-            has_unweighted_vertices = True
-
-        # Blender doesn't enforce normalization, since it normalizes while animating.
-        # Normalize on export to ensure the weights work correctly in game.
-        weight_sum = sum([g.weight for g in deform_groups])
-        for group in deform_groups:
-            # Remove unused weights on export.
-            if group.weight > 0.0:
-                ssbh_weight = ssbh_data_py.mesh_data.VertexWeight(vertex.index, group.weight / weight_sum)
-                group_to_weights[group.group][1].append(ssbh_weight)
-
-    if has_unweighted_vertices:
-        message = f'Mesh {mesh_name} has unweighted vertices or vertices with only 0.0 weights.'
-        operator.report({'WARNING'}, message)
+    # The mesh is already triangulated, so every face has 3 loops.
+    triangle_materials = np.zeros(len(mesh_data.polygons), dtype=np.int64)
+    mesh_data.polygons.foreach_get('material_index', triangle_materials)
 
-    # Avoid adding unused influences if there are no weights.
-    # Some meshes are parented to a bone instead of using vertex skinning.
-    # This requires the influence list to be empty to save properly.
-    ssbh_mesh_object.bone_influences = []
-    for name, weights in group_to_weights.values():
-        # Assume all influence names are valid since some in game models have influences not in the skel.
-        # For example, fighter/miifighter/model/b_deacon_m weights vertices to effect bones.
-        if len(weights) > 0:
-            ssbh_mesh_object.bone_influences.append(ssbh_data_py.mesh_data.BoneInfluence(name, weights))
-
-    # Mesh version 1.10 only has 16-bit unsigned vertex indices for skin weights.
-    # Meshes without vertex skinning can use the full range of 32-bit unsigned vertex indices.
-    vertex_index = vertex_indices.max()
-    if len(ssbh_mesh_object.bone_influences) > 0 and vertex_index > 65535:
-        message = f'Vertex index {vertex_index} exceeds the limit of 65535 for mesh {mesh_name}.'
-        message += ' Reduce the number of vertices or split the mesh into smaller meshes.'
-        message += ' Note that splitting duplicate UVs will increase the vertex count.'
-        raise RuntimeError(message)
-
-    smash_uv_names = ['map1', 'bake1', 'uvSet', 'uvSet1', 'uvSet2']
-    for uv_layer in mesh.data.uv_layers:
+    smash_uv_names = SMASH_UV_NAMES
+    corner_uvs: list[tuple[str, np.ndarray]] = []
+    for uv_layer in mesh_data.uv_layers:
         if uv_layer.name not in smash_uv_names:
             # TODO: Use more specific exception classes?
             valid_attribute_list = ', '.join(smash_uv_names)
@@ -1273,20 +1478,13 @@ def make_mesh_object(operator, context, mesh: bpy.types.Object, group_name, i, m
             message += f' Valid names are {valid_attribute_list}.'
             raise RuntimeError(message)
 
-        ssbh_uv_layer = ssbh_data_py.mesh_data.AttributeData(uv_layer.name)
-        loop_uvs = np.zeros(len(mesh.data.loops) * 2, dtype=np.float32)
+        loop_uvs = np.zeros(len(mesh_data.loops) * 2, dtype=np.float32)
         uv_layer.data.foreach_get("uv", loop_uvs)
+        corner_uvs.append((uv_layer.name, loop_uvs.reshape((-1, 2))))
 
-        uvs = per_loop_to_per_vertex(loop_uvs, vertex_indices, (len(mesh.data.vertices), 2))
-        # Flip vertical.
-        uvs[:,1] = 1.0 - uvs[:,1]
-        ssbh_uv_layer.data = uvs
-
-        ssbh_mesh_object.texture_coordinates.append(ssbh_uv_layer)
-
-    # Export Color Set
-    smash_color_names = ['colorSet1', 'colorSet2', 'colorSet2_1', 'colorSet2_2', 'colorSet2_3', 'colorSet3', 'colorSet4', 'colorSet5', 'colorSet6', 'colorSet7']
-    for attribute in mesh.data.color_attributes:
+    smash_color_names = SMASH_COLOR_NAMES
+    colors: list[tuple[str, np.ndarray, bool]] = []
+    for attribute in mesh_data.color_attributes:
         if attribute.name == '_smush_blender_custom_normals':
             continue
 
@@ -1298,15 +1496,13 @@ def make_mesh_object(operator, context, mesh: bpy.types.Object, group_name, i, m
             message += f' Valid names are {valid_attribute_list}.'
             raise RuntimeError(message)
 
-        ssbh_color_layer = ssbh_data_py.mesh_data.AttributeData(attribute.name)
-
         # ssbh_data expects all colors to be 32 bit floats in the range 0.0 to 1.0.
         # Blender currently supports 'POINT' or 'CORNER' and 'FLOAT_COLOR' or 'BYTE_COLOR'.
         # Raise an error if we encounter an unexpected data type or domain.
         if attribute.domain == 'CORNER':
-            colors = np.zeros(len(mesh.data.loops) * 4, dtype=np.float32)
+            values = np.zeros(len(mesh_data.loops) * 4, dtype=np.float32)
         elif attribute.domain == 'POINT':
-            colors = np.zeros(len(mesh.data.vertices) * 4, dtype=np.float32)
+            values = np.zeros(len(mesh_data.vertices) * 4, dtype=np.float32)
         else:
             message = f'Color attribute {attribute.name} has unsupported domain {attribute.domain}.'
             raise RuntimeError(message)
@@ -1314,117 +1510,56 @@ def make_mesh_object(operator, context, mesh: bpy.types.Object, group_name, i, m
         # 'BYTE_COLOR' also uses an array of 4 floats.
         # https://docs.blender.org/api/current/bpy_types_enum_items/attribute_type_items.html#rna-enum-attribute-type-items
         if attribute.data_type == 'FLOAT_COLOR' or attribute.data_type == 'BYTE_COLOR':
-            attribute.data.foreach_get('color', colors)
+            attribute.data.foreach_get('color', values)
         else:
             message = f'Color attribute {attribute.name} has unsupported data type {attribute.data_type}.'
             raise RuntimeError(message)
 
-        # Only face corner data is stored per loop.
-        # Unsupported domains are already checked above.
-        if attribute.domain == 'CORNER':
-            colors = per_loop_to_per_vertex(colors, vertex_indices, (len(mesh.data.vertices), 4))
-        
-        colors = colors.reshape((len(mesh.data.vertices), 4))
-        ssbh_color_layer.data = colors
-
-        ssbh_mesh_object.color_sets.append(ssbh_color_layer)
+        colors.append((attribute.name, values.reshape((-1, 4)), attribute.domain == 'CORNER'))
 
-    # Calculate tangents now that the necessary attributes are initialized.
-    # Use Blender's implementation since it uses mikktspace.
-    # Mikktspace is necessary to properly bake normal maps in Blender or external programs.
-    # This addresses a number of consistency issues with how normals are encoded/decoded.
-    # This will be similar to the in game tangents apart from different smoothing.
-    # The vanilla tangents can still cause seams, so they aren't worth preserving.
-    mesh.data.calc_tangents()
+    corner_tangents = None
+    corner_bitangent_signs = None
+    if tangent_method != 'VECTORIZED':
+        # The tangents were calculated with mikktspace by process_mesh.
+        corner_tangents = np.zeros(len(mesh_data.loops) * 3, dtype=np.float32)
+        mesh_data.loops.foreach_get('tangent', corner_tangents)
+        corner_tangents = corner_tangents.reshape((-1, 3))
 
-    tangent0 = ssbh_data_py.mesh_data.AttributeData('Tangent0')
+        corner_bitangent_signs = np.zeros(len(mesh_data.loops), dtype=np.float32)
+        mesh_data.loops.foreach_get('bitangent_sign', corner_bitangent_signs)
+    # Calculated tangents use the same UV map as calc_tangents.
+    active_uv_layer = mesh_data.uv_layers.active
+    tangent_uv_name = active_uv_layer.name if active_uv_layer is not None else None
 
-    loop_tangents = np.zeros(len(mesh.data.loops) * 3, dtype=np.float32)
-    mesh.data.loops.foreach_get('tangent', loop_tangents)
-
-    loop_bitangent_signs = np.zeros(len(mesh.data.loops), dtype=np.float32)
-    mesh.data.loops.foreach_get('bitangent_sign', loop_bitangent_signs)
-
-    tangents = per_loop_to_per_vertex(loop_tangents, vertex_indices, (len(mesh.data.vertices), 3))
-    bitangent_signs = per_loop_to_per_vertex(loop_bitangent_signs, vertex_indices, (len(mesh.data.vertices), 1))
-    tangent0.data = np.append(tangents @ axis_correction, bitangent_signs * -1.0, axis=1)
-
-    ssbh_mesh_object.tangents = [tangent0]
-            
-    return ssbh_mesh_object
-
-
-def add_duplicate_uv_edges(edges_to_split, bm, uv_layer):
-    # Blender stores uvs per loop rather than per vertex.
-    # Find edges connected to vertices with more than one uv coord.
-    # This allows converting to per vertex later by splitting edges.
-    index_to_uv = {}
-    for face in bm.faces:
-        for loop in face.loops:
-            vertex_index = loop.vert.index
-            uv = loop[uv_layer].uv
-            # Use strict equality since UVs are unlikely to change unintentionally.
-            if vertex_index not in index_to_uv:
-                index_to_uv[vertex_index] = uv
-            elif uv != index_to_uv[vertex_index]:
-                edges_to_split.extend(loop.vert.link_edges)
-
-
-def add_duplicate_normal_edges(edges_to_split, bm):
-    # The original normals are preserved in a color attribute.
-    normal_layer = bm.loops.layers.float_color.get('_smush_blender_custom_normals')
-
-    # Find edges connected to vertices with more than one normal.
-    # This allows converting to per vertex later by splitting edges.
-    index_to_normal = {}
-    for face in bm.faces:
-        for loop in face.loops:
-            vertex_index = loop.vert.index
-            normal = loop[normal_layer]
-            # Small fluctuations in normal vectors are expected during processing.
-            # Check if the angle between normals is sufficiently large.
-            # Assume normal vectors are normalized to have length 1.0.
-            if vertex_index not in index_to_normal:
-                index_to_normal[vertex_index] = normal
-            elif not math.isclose(normal.dot(index_to_normal[vertex_index]), 1.0, abs_tol=0.001, rel_tol=0.001):
-                # Get any edges containing this vertex.
-                edges_to_split.extend(loop.vert.link_edges)
-
-
-def split_duplicate_loop_attributes(mesh: bpy.types.Object):
-    bpy.context.view_layer.objects.active = mesh
-    bpy.ops.object.mode_set(mode = 'EDIT')
-
-    me: bpy.types.Mesh = mesh.data
-    bm = bmesh.from_edit_mesh(me)
-
-    edges_to_split: list[bmesh.types.BMEdge] = []
-
-    add_duplicate_normal_edges(edges_to_split, bm)
-
-    for layer_name in bm.loops.layers.uv.keys():
-        uv_layer = bm.loops.layers.uv.get(layer_name)
-        add_duplicate_uv_edges(edges_to_split, bm, uv_layer)
-
-    # Duplicate edges cause problems with split_edges.
-    edges_to_split = list(set(edges_to_split))
-
-    # Don't modify the mesh if no edges need to be split.
-    # This check also seems to prevent a potential crash.
-    if len(edges_to_split) > 0:
-        bmesh.ops.split_edges(bm, edges=edges_to_split)
-        bmesh.update_edit_mesh(me)
+    # Export Weights
+    '''
+    Vertex groups can either be 'Deform' groups used for actual mesh deformation, or 'Other'
+    Only want the 'Deform' groups exported.
+    '''
+    ssp: SubSceneProperties = context.scene.sub_scene_properties
+    arma = ssp.model_export_arma
+    deform_vertex_group_indices = [vg.index for vg in mesh.vertex_groups if vg.name in arma.data.bones]
+    weight_vertex_indices, weight_group_indices, weights = get_vertex_group_weights(mesh_data, deform_vertex_group_indices, np.arange(len(mesh_data.vertices)))
+    group_names = [vg.name for vg in mesh.vertex_groups]
 
-    bm.free()
+    source_vertex_indices = None
+    source_vertex_attribute = mesh_data.attributes.get('_smush_blender_vertex_index')
+    if source_vertex_attribute is not None:
+        source_vertex_indices = np.zeros(len(mesh_data.vertices), dtype=np.int32)
+        source_vertex_attribute.data.foreach_get('value', source_vertex_indices)
 
-    bpy.ops.object.mode_set(mode='OBJECT')
-    bpy.context.view_layer.objects.active = None
+    source_corner_indices = None
+    source_corner_attribute = mesh_data.attributes.get('_smush_blender_corner_index')
+    if source_corner_attribute is not None:
+        source_corner_indices = np.zeros(len(mesh_data.loops), dtype=np.int32)
+        source_corner_attribute.data.foreach_get('value', source_corner_indices)
 
-    # Check if any edges were split.
-    return len(edges_to_split) > 0
+    return CornerMesh(positions, loop_vertex_indices, loop_normals, corner_uvs, colors, corner_tangents, corner_bitangent_signs, tangent_uv_name,
+                      triangle_materials, weight_vertex_indices, weight_group_indices, weights, group_names, source_vertex_indices,
+                      source_corner_indices)
 
 
-def make_ssbh_modl_data(operator, context, group_name_to_unprocessed_meshes_to_export_meshes: dict[str, dict[Object, set[Object]]]):
+def make_ssbh_modl_data(operator, context, group_name_to_unprocessed_meshes_to_export_meshes: dict[str, dict[Object, list[ExportMesh]]]):
     ssbh_modl_data = ssbh_data_py.modl_data.ModlData()
 
     ssbh_modl_data.model_name = 'model'
@@ -1445,26 +1580,43 @@ def make_ssbh_modl_data(operator, context, group_name_to_unprocessed_meshes_to_e
     return ssbh_modl_data
 
 
-def get_smash_transform(m) -> Matrix:
-    # This is the inverse of the get_blender_transform permutation matrix.
-    # https://en.wikipedia.org/wiki/Matrix_similarity
-    p = Matrix([
-        [0, 1, 0, 0],
-        [-1, 0, 0, 0],
-        [0, 0, 1, 0],
-        [0, 0, 0, 1]
-    ])
-    # Perform the transformation m in Blender's basis and convert back to Ultimate.
-    return (p @ m @ p.inverted()).transposed()
+# This is the inverse of the get_blender_transform permutation matrix.
+# https://en.wikipedia.org/wiki/Matrix_similarity
+SMASH_BASIS = np.array([
+    [0, 1, 0, 0],
+    [-1, 0, 0, 0],
+    [0, 0, 1, 0],
+    [0, 0, 0, 1]
+], dtype=np.float64)
+
+# Root bones are rotated -90 degrees on X and then 90 degrees on Z before the basis change.
+SMASH_ROOT_ROTATION = np.array(Matrix.Rotation(math.radians(90), 4, 'Z') @ Matrix.Rotation(math.radians(-90), 4, 'X'), dtype=np.float64)
 
+def get_smash_transforms(matrices: np.ndarray) -> np.ndarray:
+    # Perform the transformations in Blender's basis and convert back to Ultimate, for an array of shape (n, 4, 4).
+    return (SMASH_BASIS @ matrices @ np.linalg.inv(SMASH_BASIS)).transpose(0, 2, 1)
 
-def get_smash_root_transform(bone: bpy.types.EditBone) -> Matrix:
-    bone.transform(Matrix.Rotation(math.radians(-90), 4, 'X'))
-    bone.transform(Matrix.Rotation(math.radians(90), 4, 'Z'))
-    unreoriented_matrix = get_smash_transform(bone.matrix)
-    bone.transform(Matrix.Rotation(math.radians(-90), 4, 'Z'))
-    bone.transform(Matrix.Rotation(math.radians(90), 4, 'X'))
-    return unreoriented_matrix
+def get_ssbh_bone_transforms(arma_data: bpy.types.Armature, bones: list[tuple[str, str | None]]) -> np.ndarray:
+    '''
+    Returns the Ultimate transform of each (name, parent_name) bone, as an array of shape (n, 4, 4).
+    The rest matrices are read from Bone.matrix_local all at once, so no edit bones are created or modified.
+    '''
+    bone_count = len(arma_data.bones)
+    matrix_local = np.zeros(bone_count * 16, dtype=np.float32)
+    arma_data.bones.foreach_get('matrix_local', matrix_local)
+    # Blender matrices are stored column major, so transpose to get the usual row major layout.
+    matrix_local = matrix_local.reshape((bone_count, 4, 4)).transpose(0, 2, 1).astype(np.float64)
+
+    name_to_index = {bone.name: index for index, bone in enumerate(arma_data.bones)}
+    bone_indices = np.array([name_to_index[name] for name, _ in bones], dtype=np.int64)
+    parent_indices = np.array([name_to_index[parent] if parent is not None else -1 for _, parent in bones], dtype=np.int64)
+    has_parent = parent_indices >= 0
+
+    # Child bones are relative to their parent, and root bones are reoriented instead.
+    matrices = matrix_local[bone_indices]
+    matrices[has_parent] = np.linalg.inv(matrix_local[parent_indices[has_parent]]) @ matrices[has_parent]
+    matrices[~has_parent] = SMASH_ROOT_ROTATION @ matrices[~has_parent]
+    return get_smash_transforms(matrices)
 
 def read_vanilla_nusktb(path, mode):
     if not path:
@@ -1479,29 +1631,11 @@ def read_vanilla_nusktb(path, mode):
         raise RuntimeError(message)
 
 
-def get_ssbh_bone(blender_bone: bpy.types.EditBone, parent_index):
-    if blender_bone.parent:
-        unreoriented_matrix = get_smash_transform(blender_bone.parent.matrix.inverted() @ blender_bone.matrix)
-        m = list(list(r) for r in unreoriented_matrix)
-        #return ssbh_data_py.skel_data.BoneData(blender_bone.name, unreoriented_matrix, parent_index)
-        return ssbh_data_py.skel_data.BoneData(blender_bone.name, m, parent_index)
-    else:
-        m = list(list(r) for r in get_smash_root_transform(blender_bone))
-        #return ssbh_data_py.skel_data.BoneData(blender_bone.name, get_smash_root_transform(blender_bone), None)
-        return ssbh_data_py.skel_data.BoneData(blender_bone.name, m, None)
-    
-def get_parent_first_ordered_bones(arma: bpy.types.Object) -> list[bpy.types.EditBone]:
-    ''' Edit Bones are not guaranteed to appear in such a way where the child appears after its parent
+def get_parent_first_ordered_bones(arma: bpy.types.Object) -> list[tuple[str, str | None]]:
+    ''' Bones are not guaranteed to appear in such a way where the child appears after its parent
         This will make sure that parent bones always appear before their children
     '''
-    edit_bones: list[EditBone] = arma.data.edit_bones
-    parent_first_ordered_bones: list[EditBone] = []
-    for bone in edit_bones:
-        # only need to do this on the root bones, of which there could be several
-        if not bone.parent:
-            parent_first_ordered_bones.append(bone)
-            parent_first_ordered_bones.extend(child for child in bone.children_recursive)
-    return parent_first_ordered_bones
+    return get_parent_first_order([(bone.name, bone.parent.name if bone.parent else None) for bone in arma.data.bones])
 
 def get_standard_bone_changes(arma: bpy.types.Object, vanilla_nusktb: Path) -> tuple[set[str], set[str]]:
     vanilla_skel: ssbh_data_py.skel_data.SkelData = read_vanilla_nusktb(vanilla_nusktb, None)
@@ -1514,7 +1648,7 @@ def get_standard_bone_changes(arma: bpy.types.Object, vanilla_nusktb: Path) -> t
 
     return new_bones, missing_bones
 
-def make_update_prc(operator: Operator, context, bones_not_in_vanilla: list[EditBone]):
+def make_update_prc(operator: Operator, context, bones_not_in_vanilla: list[str]):
     ssp: SubSceneProperties = context.scene.sub_scene_properties
     prc_root = pyprc.param(ssp.vanilla_update_prc) # Read the .prc into 'prc_root'
     bones_fake_list = dict(prc_root).get(pyprc.hash('bones'))
@@ -1522,33 +1656,24 @@ def make_update_prc(operator: Operator, context, bones_not_in_vanilla: list[Edit
         operator.report({'ERROR'}, 'No "bones" list in update.prc! (Did you load another prc instead?)')
         return
     bones_real_list = list(bones_fake_list)
-    for bone in bones_not_in_vanilla:
-        if bone.name.startswith('H_') or bone.name.startswith('S_'):
+    for bone_name in bones_not_in_vanilla:
+        if bone_name.startswith('H_') or bone_name.startswith('S_'):
             continue
         new_prc_struct = prc_root.struct([
-                            (pyprc.hash('name'), prc_root.hash(pyprc.hash(bone.name.lower())))
+                            (pyprc.hash('name'), prc_root.hash(pyprc.hash(bone_name.lower())))
                         ])
         bones_real_list.append(new_prc_struct)
     bones_fake_list.set_list(bones_real_list)
     return prc_root
 
-def find_non_helper_ancestor_index(bone: EditBone, bones: list[EditBone]) -> int:
-    if bone.parent is None:
-        return None
-    if bone.parent.name.startswith('H_'):
-        return find_non_helper_ancestor_index(bone.parent, bones)
-    return bones.index(bone.parent)
-
 def make_skel(operator, context, mode):
     ssp: SubSceneProperties = context.scene.sub_scene_properties
     arma: bpy.types.Object = ssp.model_export_arma
     arma_data: bpy.types.Armature = arma.data
     prc = None
-    bpy.context.view_layer.objects.active = arma
-    # The object should be selected and visible before entering edit mode.
-    arma.select_set(True)
-    arma.hide_set(False)
-    bpy.ops.object.mode_set(mode='EDIT')
+    # The rest matrices are read from the bones, so any unsaved edit mode changes need to be written to them first.
+    if arma.mode == 'EDIT':
+        arma.update_from_editmode()
 
     skel = ssbh_data_py.skel_data.SkelData()
 
@@ -1564,57 +1689,26 @@ def make_skel(operator, context, mode):
     
     parent_first_ordered_bones = get_parent_first_ordered_bones(arma)
 
-    new_bones: list[EditBone] = []
-    bones_not_in_vanilla: list[EditBone] = []
+    ordered_bones = parent_first_ordered_bones
+    bones_not_in_vanilla: list[str] = []
     if mode == 'ORDER_AND_VALUES' or mode == 'ORDER_ONLY':
-        for vanilla_bone in vanilla_skel.bones:
-            blender_bone = arma_data.edit_bones.get(vanilla_bone.name)
-            if blender_bone:
-                new_bones.append(blender_bone)
-
-        for blender_bone in parent_first_ordered_bones:
-            if blender_bone not in new_bones:
-                bones_not_in_vanilla.append(blender_bone)
-                if blender_bone.name.startswith('H_') or blender_bone.name.startswith('S_'): # Need to insert new helper or swing bones at the end
-                    new_bones.append(blender_bone)
-                    continue
-                if blender_bone.parent:
-                    if blender_bone.parent.name.startswith('H_'): # Makes sure the new normal bone is not at the bottom bone section
-                        non_helper_ancestor_index = find_non_helper_ancestor_index(blender_bone, new_bones)
-                        if non_helper_ancestor_index is not None:
-                            new_bones.insert(non_helper_ancestor_index + 1, blender_bone)
-                        else:
-                            new_bones.append(blender_bone)
-                    else:
-                        parent_index = new_bones.index(blender_bone.parent)
-                        new_bones.insert(parent_index + 1, blender_bone)
-                else:
-                    new_bones.append(blender_bone)
-
-        vanilla_skel_name_to_bone = {bone.name : bone for bone in vanilla_skel.bones}
-        for new_bone in new_bones:
-            ssbh_bone = get_ssbh_bone(new_bone, new_bones.index(new_bone.parent) if new_bone.parent else None)
+        # New bones are placed by name, so the ordering doesn't need to search the bone lists.
+        ordered_bones, bones_not_in_vanilla = get_vanilla_order(parent_first_ordered_bones, [bone.name for bone in vanilla_skel.bones])
 
-            if preserve_values:
-                vanilla_bone = vanilla_skel_name_to_bone.get(new_bone.name)
-                if vanilla_bone:
-                    ssbh_bone.transform = vanilla_bone.transform
-
-            skel.bones.append(ssbh_bone)
-    else:
-        for bone in parent_first_ordered_bones:
-            ssbh_bone = get_ssbh_bone(bone, parent_first_ordered_bones.index(bone.parent) if bone.parent else None)
-            skel.bones.append(ssbh_bone)
+    vanilla_skel_name_to_bone = {bone.name : bone for bone in vanilla_skel.bones} if preserve_values else {}
+    transforms = get_ssbh_bone_transforms(arma_data, ordered_bones).tolist()
+    for (name, _), parent_index, transform in zip(ordered_bones, get_parent_indices(ordered_bones), transforms):
+        vanilla_bone = vanilla_skel_name_to_bone.get(name)
+        if vanilla_bone:
+            transform = vanilla_bone.transform
+        skel.bones.append(ssbh_data_py.skel_data.BoneData(name, transform, parent_index))
 
     if ssp.vanilla_update_prc != '':
         prc = make_update_prc(operator, context, bones_not_in_vanilla)
 
-    bpy.ops.object.mode_set(mode='OBJECT')
-    arma.select_set(False)
-    bpy.context.view_layer.objects.active = None
     return skel, prc
 
-def create_and_save_nuhlpb(path: Path, arma: bpy.types.Object):
+def create_and_save_nuhlpb(path: Path, arma: bpy.types.Object, manifest: ExportManifest | None = None):
     ssbh_hlpb                    = ssbh_data_py.hlpb_data.HlpbData()
     ssbh_hlpb.major_version      = arma.data.sub_helper_bone_data.major_version
     ssbh_hlpb.minor_version      = arma.data.sub_helper_bone_data.minor_version
@@ -1642,5 +1736,5 @@ def create_and_save_nuhlpb(path: Path, arma: bpy.types.Object):
                                         quat1             = [oc.quat1[1], oc.quat1[2], oc.quat1[3], oc.quat1[0]],
                                         quat2             = [oc.quat2[1], oc.quat2[2], oc.quat2[3], oc.quat2[0]],
                                     ) for oc in arma.data.sub_helper_bone_data.orient_constraints]
-    ssbh_hlpb.save(str(path))
+    save_export_file(manifest, path, ssbh_hlpb.save)
      
\ No newline at end of file
@@ -1,4 +1,8 @@
+import ast
 import bpy
+import hashlib
+
+from pathlib import Path
 
 from . import matl_params
 from . import material_inputs
@@ -89,12 +93,109 @@ def hide_unlinked_outputs(node):
         if output.is_linked is False:
             output.hide = True
 
+# The custom property storing the checksum of the generator that built the node group.
+CHECKSUM_PROPERTY = 'smush_master_shader_checksum'
+# The custom property storing the (major, minor) blender version that saved the library.
+BLENDER_VERSION_PROPERTY = 'smush_master_shader_blender_version'
+
+def get_node_definitions() -> str:
+    '''
+    Returns the syntax tree of this module without docstrings,
+    so editing comments, docstrings or formatting doesn't change the checksum.
+    '''
+    tree = ast.parse(Path(__file__).read_text(encoding='utf-8'))
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.FunctionDef, ast.ClassDef)) and ast.get_docstring(node, clean=False) is not None:
+            node.body = node.body[1:] or [ast.Pass()]
+    # Line numbers aren't part of the dump.
+    return ast.dump(tree)
+
+def get_parameter_definitions() -> str:
+    return repr((
+        sorted(matl_params.param_id_to_ui_name.items()),
+        sorted(matl_params.vec4_param_name_to_socket_params.items()),
+        sorted(matl_params.texture_param_name_to_socket_params.items()),
+        sorted(material_inputs.vec4_param_to_inputs.items()),
+        sorted(material_inputs.float_param_to_inputs.items()),
+        sorted(material_inputs.bool_param_to_inputs.items()),
+    ))
+
+def get_master_shader_checksum() -> str:
+    '''
+    Changes whenever the sockets in matl_params or material_inputs or the nodes built here change,
+    so a library saved by an older version of the generator is never used.
+    '''
+    digest = hashlib.sha256()
+    digest.update(get_parameter_definitions().encode())
+    digest.update(get_node_definitions().encode())
+    return digest.hexdigest()[:16]
+
+def get_master_shader_library_path(checksum: str) -> Path:
+    return Path(__file__).parent / 'shader_file' / f'master_shader_{checksum}.blend'
+
+def append_master_shader(library_path: Path, checksum: str) -> bool:
+    '''
+    Appends the master shader from the saved library, which is much faster than building it node by node.
+    Appending instead of linking keeps saved .blend files working after the addon is updated or moved.
+    '''
+    master_shader_name = get_master_shader_name()
+    try:
+        with bpy.data.libraries.load(str(library_path), link=False) as (data_from, data_to):
+            if master_shader_name in data_from.node_groups:
+                data_to.node_groups = [master_shader_name]
+    except (OSError, RuntimeError) as e:
+        print(f'Failed to load the master shader library {library_path}, building it instead. exception info=`{e}`')
+        return False
+
+    node_group = bpy.data.node_groups.get(master_shader_name, None)
+    if node_group is None:
+        return False
+    # Older blender versions may not support every node saved by newer versions.
+    saved_version = tuple(node_group.get(BLENDER_VERSION_PROPERTY, ()))
+    if node_group.get(CHECKSUM_PROPERTY) != checksum or saved_version > tuple(bpy.app.version[:2]):
+        bpy.data.node_groups.remove(node_group)
+        return False
+    # The library is saved with a fake user, but the procedural node group never had one.
+    node_group.use_fake_user = False
+    return True
+
 def create_master_shader():
     master_shader_name = get_master_shader_name()
     # Check if already exists and just skip if it does
     if bpy.data.node_groups.get(master_shader_name, None) is not None:
         return
 
+    checksum = get_master_shader_checksum()
+    library_path = get_master_shader_library_path(checksum)
+    if library_path.exists() and append_master_shader(library_path, checksum):
+        return
+
+    build_master_shader(checksum)
+
+def save_master_shader_library() -> Path:
+    '''
+    Builds the master shader and saves it as the library for the current checksum, removing libraries for older checksums.
+    Run tools/generate_master_shader_library.py in blender after changing matl_params, material_inputs or this file.
+    '''
+    master_shader_name = get_master_shader_name()
+    if (node_group := bpy.data.node_groups.get(master_shader_name, None)) is not None:
+        bpy.data.node_groups.remove(node_group)
+
+    checksum = get_master_shader_checksum()
+    build_master_shader(checksum)
+    node_group = bpy.data.node_groups[master_shader_name]
+    node_group[BLENDER_VERSION_PROPERTY] = list(bpy.app.version[:2])
+
+    library_path = get_master_shader_library_path(checksum)
+    bpy.data.libraries.write(str(library_path), {node_group}, fake_user=True, compress=True)
+    for old_library_path in library_path.parent.glob('master_shader_*.blend'):
+        if old_library_path != library_path:
+            old_library_path.unlink()
+    return library_path
+
+def build_master_shader(checksum: str):
+    master_shader_name = get_master_shader_name()
+
     # Create a dummy material just for use in creation
     mat = bpy.data.materials.new(master_shader_name)
     mat.use_nodes = True
@@ -109,6 +210,7 @@ def create_master_shader():
     node_group_node.node_tree = node_group_node_tree
 
     node_group_node.name = 'Master'
+    node_group_node_tree[CHECKSUM_PROPERTY] = checksum
 
     # Make the one output
     node_group_node_tree.interface.new_socket(in_out="OUTPUT", socket_type='NodeSocketShader', name='Cycles Output')
@@ -4,7 +4,6 @@ from pathlib import Path
 from mathutils import Color
 import tempfile
 import numpy as np  # Add NumPy import for faster array processing
-from multiprocessing.pool import ThreadPool  # For parallel processing
 import time
 # PIL dependency removed - using Blender native functionality instead
 
@@ -23,7 +22,8 @@ def process_image_in_parallel(func, args_list, max_workers=4):
     print(f"Processing {len(args_list)} images in parallel with {max_workers} workers")
     start_time = time.time()
     
-    # Create thread pool
+    # Create thread pool, imported here since registering the addon doesn't need it
+    from multiprocessing.pool import ThreadPool
     pool = ThreadPool(processes=max_workers)
     
     # Map function over arguments
@@ -1,4 +1,8 @@
 import bpy
+import os
+import time
+import tempfile
+import numpy as np
 
 from pathlib import Path
 from subprocess import run, CalledProcessError
@@ -7,8 +11,30 @@ from .convert_nutexb_to_png import get_ultimate_tex_path
 from ..create_matl_from_blender_materials import has_sub_matl_data, get_linked_materials
 from .default_textures import generated_default_texture_name_value
 from ...export_model import would_trimmed_names_be_unique, get_problematic_names, trim_name
+from ...export_manifest import ExportManifest, hash_bytes, get_temp_path
 
-def export_nutexb_from_blender_materials(operator: bpy.types.Operator, materials: set[bpy.types.Material], export_dir: Path):
+def get_image_pixel_hash(image: bpy.types.Image) -> str:
+    # Reading the pixels is much faster than saving the .png and encoding BC7, so unchanged images can be skipped cheaply.
+    pixels = np.zeros(len(image.pixels), dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    header = f'{tuple(image.size)} {image.channels} {image.alpha_mode}'.encode()
+    return hash_bytes(header + pixels.tobytes())
+
+def encode_nutexb(png_path: Path, nutexb_path: Path, format: str) -> tuple[str | None, float]:
+    '''
+    Runs ultimate_tex on one image. Returns (error, seconds), where error is None on success.
+    Runs on a pool thread, so this must not touch any blender data.
+    '''
+    start = time.perf_counter()
+    try:
+        run([get_ultimate_tex_path(), str(png_path), str(nutexb_path), "--format", format], capture_output=True, check=True)
+    except CalledProcessError as e:
+        return e.stderr.decode(errors='replace').strip(), time.perf_counter() - start
+    except OSError as e:
+        return str(e), time.perf_counter() - start
+    return None, time.perf_counter() - start
+
+def export_nutexb_from_blender_materials(operator: bpy.types.Operator, materials: set[bpy.types.Material], export_dir: Path, manifest: ExportManifest | None = None):
     images: set[bpy.types.Image] = set()
     
     linked_materials = get_linked_materials(materials)
@@ -25,48 +51,75 @@ def export_nutexb_from_blender_materials(operator: bpy.types.Operator, materials
 
     trim_names = would_trimmed_names_be_unique(texture_names)
 
-    temp_image_path = export_dir.joinpath("temp.png")
-    for image in images:
-        # Incase a user attempts to export placeholder images.
-        if not image.packed_file:
-            if image.source == 'FILE':
-                if image.filepath == '':
-                    operator.report({'WARNING'}, f"The image `{image.name}` is just a placeholder in blender (likely due to a failed import), so it has no data and cannot be exported.")
+    # Imported here, since registering the addon doesn't need the thread pool.
+    from multiprocessing.pool import ThreadPool
+
+    # BC7 encoding is slow, so run several ultimate_tex processes at once instead of one image at a time.
+    # Only the main thread uses bpy to save the .png files, while the pool threads just wait on the ultimate_tex processes.
+    start = time.perf_counter()
+    workers = max(1, min(len(images), os.cpu_count() or 1))
+    encoded_count = 0
+    with tempfile.TemporaryDirectory(prefix='smush_blender_nutexb_', ignore_cleanup_errors=True) as temp_dir, ThreadPool(processes=workers) as pool:
+        jobs = []
+        for image_index, image in enumerate(images):
+            # Incase a user attempts to export placeholder images.
+            if not image.packed_file:
+                if image.source == 'FILE':
+                    if image.filepath == '':
+                        operator.report({'WARNING'}, f"The image `{image.name}` is just a placeholder in blender (likely due to a failed import), so it has no data and cannot be exported.")
+                        continue
+            nutexb_filepath: Path
+            if trim_names:
+                nutexb_filepath = export_dir.joinpath(trim_name(image.name) + ".nutexb")
+            else:
+                nutexb_filepath = export_dir.joinpath(image.name + ".nutexb")
+
+            format: str
+            if image.colorspace_settings.name == 'sRGB':
+                format = "BC7Srgb"
+            elif image.colorspace_settings.name == 'Non-Color':
+                format = "BC7Unorm"
+            else:
+                operator.report({'WARNING'}, f"Image `{image.name}` has unsupported color space of `{image.colorspace_settings.name}`, defaulting to BC7Unorm")
+                format = "BC7Unorm"
+
+            pixel_hash = None
+            if manifest is not None:
+                pixel_hash = get_image_pixel_hash(image)
+                if manifest.is_texture_unchanged(nutexb_filepath, pixel_hash, format):
+                    manifest.skip_texture(nutexb_filepath)
                     continue
-        # For some image types, such as DDS, blender fails to save using "save", but "save_render" still works.
-        try:
-            image.file_format = 'PNG' # This feels like a hack... but changing this before saving ensures blender exports as a PNG even if its on-disk as a JPG or BMP etc
-            image.save(filepath=str(temp_image_path))
-        except Exception as e:
-            operator.report({'WARNING'}, f"Unable to save the blender image {image.name} to disk using `save`, but will attempt using `save_render`. Error = {e}")
+
+            # Unique file names, since earlier images may still be encoding.
+            temp_image_path = Path(temp_dir).joinpath(f"{image_index}.png")
+            # For some image types, such as DDS, blender fails to save using "save", but "save_render" still works.
             try:
-                image.save_render(filepath=str(temp_image_path))
+                image.file_format = 'PNG' # This feels like a hack... but changing this before saving ensures blender exports as a PNG even if its on-disk as a JPG or BMP etc
+                image.save(filepath=str(temp_image_path))
             except Exception as e:
-                operator.report({'ERROR'}, f"Failed to save the blender image `{image.name}` to disk using either `save` or `save_render`. Error = {e}")
-                continue
+                operator.report({'WARNING'}, f"Unable to save the blender image {image.name} to disk using `save`, but will attempt using `save_render`. Error = {e}")
+                try:
+                    image.save_render(filepath=str(temp_image_path))
+                except Exception as e:
+                    operator.report({'ERROR'}, f"Failed to save the blender image `{image.name}` to disk using either `save` or `save_render`. Error = {e}")
+                    continue
 
-        nutexb_filepath: Path
-        if trim_names:
-            nutexb_filepath = export_dir.joinpath(trim_name(image.name) + ".nutexb")
-        else:
-            nutexb_filepath = export_dir.joinpath(image.name + ".nutexb")
-
-        format: str
-        if image.colorspace_settings.name == 'sRGB':
-            format = "BC7Srgb"
-        elif image.colorspace_settings.name == 'Non-Color':
-            format = "BC7Unorm"
-        else:
-            operator.report({'WARNING'}, f"Image `{image.name}` has unsupported color space of `{image.colorspace_settings.name}`, defaulting to BC7Unorm")
-            format = "BC7Unorm"
-
-        try:
-            run([get_ultimate_tex_path(), str(temp_image_path), str(nutexb_filepath), "--format", format], capture_output=True, check=True)
-        except CalledProcessError as e:
-            operator.report({'WARNING'}, f"failed to export `{image.name}` as .NUTEXB, error = {e.stderr}")
+            # With a manifest, encode next to the .nutexb and only replace it if the bytes changed.
+            output_path = nutexb_filepath if manifest is None else get_temp_path(nutexb_filepath)
+            result = pool.apply_async(encode_nutexb, (temp_image_path, output_path, format))
+            jobs.append((image.name, nutexb_filepath, output_path, format, pixel_hash, result))
 
-    try:
-        if temp_image_path.exists():
-            temp_image_path.unlink()
-    except Exception as e:
-        operator.report({'WARNING'}, f"Failed to remove temporary .png file used for exporting textures, error = {e}")
+        for image_name, nutexb_filepath, output_path, format, pixel_hash, result in jobs:
+            error, seconds = result.get()
+            if error is not None:
+                operator.report({'WARNING'}, f"failed to export `{image_name}` as .NUTEXB, error = {error}")
+                if output_path != nutexb_filepath and output_path.exists():
+                    output_path.unlink()
+                continue
+            operator.report({'INFO'}, f"Encoded {nutexb_filepath.name} as {format} in {seconds:.2f} seconds")
+            encoded_count += 1
+            if manifest is not None:
+                manifest.replace_if_changed(nutexb_filepath, output_path)
+                manifest.record_texture(nutexb_filepath, pixel_hash, format)
+
+    operator.report({'INFO'}, f"Encoded {encoded_count} textures in {time.perf_counter() - start:.2f} seconds using {workers} parallel encodes.")
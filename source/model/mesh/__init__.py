@@ -0,0 +1,5 @@
+from . import mesh_object_arrays
+from . import export_cache
+from . import export_validation
+# vertex_cache, tangents, mesh_conversion, mesh_ex and shape_key_variants are only needed while exporting,
+# so they're imported by the export functions instead of when the addon is registered.
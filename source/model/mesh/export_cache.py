@@ -0,0 +1,112 @@
+import bpy
+import hashlib
+import numpy as np
+
+from .mesh_object_arrays import MeshObjectArrays
+
+# Object name -> (content hash, [(material_index, arrays), ...]) from the last export of that object in this session.
+# Only the latest entry per object is kept, so the cache never grows past the number of exported objects.
+_object_name_to_cache_entry: dict[str, tuple[str, list[tuple[int, MeshObjectArrays]]]] = {}
+
+def clear_export_cache():
+    _object_name_to_cache_entry.clear()
+
+def get_cached_mesh_objects(object_name: str, content_hash: str) -> list[tuple[int, MeshObjectArrays]] | None:
+    entry = _object_name_to_cache_entry.get(object_name)
+    if entry is None or entry[0] != content_hash:
+        return None
+    return entry[1]
+
+def store_cached_mesh_objects(object_name: str, content_hash: str, material_index_to_arrays: list[tuple[int, MeshObjectArrays]]):
+    _object_name_to_cache_entry[object_name] = (content_hash, material_index_to_arrays)
+
+def _update_with_collection(h, collection: bpy.types.bpy_prop_collection, attribute: str, components: int, dtype):
+    values = np.zeros(len(collection) * components, dtype=dtype)
+    collection.foreach_get(attribute, values)
+    h.update(values.tobytes())
+
+def _depends_on_other_data(value, arma: bpy.types.Object) -> bool:
+    # Only the name and transform of a pointer are hashed, so the geometry of a target object, node group or texture isn't covered.
+    # The export armature is the exception, since its pose is hashed below.
+    if isinstance(value, bpy.types.ID):
+        return value != arma
+    return False
+
+def _update_with_value(h, value):
+    # The export armature is the only ID pointer hashed, by name, transform and pose since the Armature modifier depends on them.
+    if isinstance(value, bpy.types.Object):
+        h.update(value.name.encode())
+        h.update(np.array(value.matrix_world, dtype=np.float32).tobytes())
+        if value.type == 'ARMATURE' and value.data.pose_position == 'POSE':
+            _update_with_collection(h, value.pose.bones, 'matrix', 16, np.float32)
+    elif isinstance(value, bpy.types.ID):
+        h.update(value.name.encode())
+    elif isinstance(value, (bool, int, float, str)) or value is None:
+        h.update(repr(value).encode())
+    else:
+        try:
+            h.update(repr(tuple(value)).encode())
+        except TypeError:
+            h.update(repr(value).encode())
+
+def get_mesh_object_hash(mesh_object: bpy.types.Object, arma: bpy.types.Object, export_options: tuple) -> str | None:
+    '''
+    Hashes everything the exported arrays depend on: the mesh data, shape keys, vertex groups, modifier stack,
+    object transform, the armature's bone names and the export options.
+    Only the blender data is read, the mesh isn't processed, so this is much cheaper than exporting the mesh.
+    Everything but the vertex groups is read with foreach_get. Vertex groups have no bulk access in blender,
+    so they are read per vertex like get_vertex_group_weights, about 0.2 s for 65k vertices in two groups each, even on cache hits.
+    Returns None if the object can't be cached, because a modifier depends on data outside the object and armature.
+    '''
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr(export_options).encode())
+    h.update(repr(sorted(bone.name for bone in arma.data.bones)).encode())
+    h.update(np.array(mesh_object.matrix_basis, dtype=np.float32).tobytes())
+    h.update(repr([vg.name for vg in mesh_object.vertex_groups]).encode())
+
+    for modifier in mesh_object.modifiers:
+        # Geometry Nodes modifiers read their node group and store their inputs as ID properties instead of RNA properties,
+        # so neither shows up in bl_rna.
+        if modifier.type == 'NODES':
+            return None
+        for prop in modifier.bl_rna.properties:
+            if prop.identifier == 'rna_type':
+                continue
+            value = getattr(modifier, prop.identifier, None)
+            if _depends_on_other_data(value, arma):
+                return None
+            h.update(prop.identifier.encode())
+            _update_with_value(h, value)
+
+    mesh: bpy.types.Mesh = mesh_object.data
+    _update_with_collection(h, mesh.vertices, 'co', 3, np.float32)
+    _update_with_collection(h, mesh.edges, 'vertices', 2, np.int32)
+    _update_with_collection(h, mesh.edges, 'use_edge_sharp', 1, bool)
+    _update_with_collection(h, mesh.loops, 'vertex_index', 1, np.int32)
+    # Custom normals are covered by the loop normals.
+    _update_with_collection(h, mesh.loops, 'normal', 3, np.float32)
+    _update_with_collection(h, mesh.polygons, 'loop_total', 1, np.int32)
+    _update_with_collection(h, mesh.polygons, 'material_index', 1, np.int32)
+    _update_with_collection(h, mesh.polygons, 'use_smooth', 1, bool)
+    # The active UV map is the one the tangents are calculated from.
+    h.update(repr(mesh.uv_layers.active.name if mesh.uv_layers.active is not None else None).encode())
+    for uv_layer in mesh.uv_layers:
+        h.update(uv_layer.name.encode())
+        _update_with_collection(h, uv_layer.data, 'uv', 2, np.float32)
+    for attribute in mesh.color_attributes:
+        h.update(f'{attribute.name} {attribute.domain} {attribute.data_type}'.encode())
+        _update_with_collection(h, attribute.data, 'color', 4, np.float32)
+
+    # The same flattened arrays make_corner_mesh reads, with every group since modifiers can read any of them.
+    if len(mesh_object.vertex_groups) > 0:
+        from ..export_model import get_vertex_group_weights
+        group_indices = [vg.index for vg in mesh_object.vertex_groups]
+        for values in get_vertex_group_weights(mesh, group_indices, np.arange(len(mesh.vertices))):
+            h.update(values.tobytes())
+
+    if mesh.shape_keys is not None:
+        for key_block in mesh.shape_keys.key_blocks:
+            h.update(f'{key_block.name} {key_block.value} {key_block.mute}'.encode())
+            _update_with_collection(h, key_block.data, 'co', 3, np.float32)
+
+    return h.hexdigest()
@@ -0,0 +1,155 @@
+import bpy
+import numpy as np
+
+from typing import NamedTuple
+
+# The names Smash Ultimate shaders look up, so any other name would be exported but never used in game.
+SMASH_UV_NAMES = ['map1', 'bake1', 'uvSet', 'uvSet1', 'uvSet2']
+SMASH_COLOR_NAMES = ['colorSet1', 'colorSet2', 'colorSet2_1', 'colorSet2_2', 'colorSet2_3', 'colorSet3', 'colorSet4', 'colorSet5', 'colorSet6', 'colorSet7']
+
+
+# The files that can't be exported when a check of the mesh data or the materials fails.
+# The .numshexb and .adjb are made from the .numshb data and the .nutexb from the .numatb materials.
+MESH_DATA_FILES = ('.numshb', '.numshexb')
+MATERIAL_FILES = ('.numdlb', '.numatb', '.nutexb')
+
+
+class ExportValidationError(NamedTuple):
+    message: str
+    files: tuple[str, ...]
+
+
+class ExportValidationReport(NamedTuple):
+    errors: list[ExportValidationError]
+    warnings: list[str]
+
+    def skipped_files(self) -> set[str]:
+        return {file for error in self.errors for file in error.files}
+
+    def message(self) -> str:
+        skipped_files = sorted(self.skipped_files())
+        lines = [f'Skipped exporting {", ".join(skipped_files)}, found {len(self.errors)} problems before processing any meshes:']
+        lines.extend(f'  - {error.message} Skipped {", ".join(error.files)}.' for error in self.errors)
+        return '\n'.join(lines)
+
+
+def _read(collection: bpy.types.bpy_prop_collection, attribute: str, components: int, dtype) -> np.ndarray:
+    values = np.zeros(len(collection) * components, dtype=dtype)
+    collection.foreach_get(attribute, values)
+    return values.reshape((-1, components)) if components > 1 else values
+
+def _changes_topology(mesh_object: bpy.types.Object, apply_modifiers: str) -> bool:
+    # Armature modifiers only move vertices, so the base mesh has the same vertices as the exported mesh.
+    if apply_modifiers == 'IGNORE':
+        return False
+    return any(m.show_viewport and m.type != 'ARMATURE' for m in mesh_object.modifiers)
+
+def _get_projected_vertex_counts(mesh_data: bpy.types.Mesh) -> dict[int, int]:
+    '''
+    Returns the exported vertex count for each material index, using the same vertex splitting as convert_corner_mesh.
+    Triangulating doesn't add face corners, so this works on the untriangulated mesh.
+    '''
+    from .mesh_conversion import find_unique_corners
+
+    loop_totals = _read(mesh_data.polygons, 'loop_total', 1, np.int32)
+    polygon_materials = _read(mesh_data.polygons, 'material_index', 1, np.int32)
+    loop_materials = np.repeat(polygon_materials, loop_totals)
+    loop_vertex_indices = _read(mesh_data.loops, 'vertex_index', 1, np.uint32)
+    per_loop_attributes = [np.round(_read(mesh_data.loops, 'normal', 3, np.float32) * 1024.0)]
+    per_loop_attributes.extend(_read(uv_layer.data, 'uv', 2, np.float32) for uv_layer in mesh_data.uv_layers)
+    per_loop_attributes.extend(
+        _read(attribute.data, 'color', 4, np.float32) for attribute in mesh_data.color_attributes
+        if attribute.domain == 'CORNER' and attribute.data_type in ('FLOAT_COLOR', 'BYTE_COLOR')
+    )
+
+    material_index_to_count = {}
+    for material_index in np.unique(polygon_materials).tolist():
+        material_loops = np.flatnonzero(loop_materials == material_index)
+        first_loops, _ = find_unique_corners(loop_vertex_indices[material_loops], [a[material_loops] for a in per_loop_attributes])
+        material_index_to_count[material_index] = len(first_loops)
+    return material_index_to_count
+
+def validate_export_meshes(mesh_objects: list[bpy.types.Object], arma: bpy.types.Object, apply_modifiers: str, split_shape_keys: str,
+                           check_mesh_data: bool, check_materials: bool) -> ExportValidationReport:
+    '''
+    Finds every problem that would stop exporting a mesh file, using bulk reads of the unmodified meshes.
+    This runs before any mesh is copied or processed, so all problems are reported at once within a second instead of one at a time.
+    Each error lists the files it affects, so only those files are skipped and the rest are still exported.
+    Modifiers can change the vertices, so the weight and vertex count checks only use meshes that modifiers won't change.
+    '''
+    from ..export_model import trim_name, get_slot_material
+    # The same limits as the conversion, so the validator and the converter always agree.
+    from .mesh_conversion import MAX_SKINNED_VERTEX_INDEX, MAX_INFLUENCES_PER_VERTEX
+
+    errors: list[ExportValidationError] = []
+    warnings: list[str] = []
+    exported_group_names = {trim_name(mesh_object.name) for mesh_object in mesh_objects}
+
+    for mesh_object in mesh_objects:
+        mesh_data: bpy.types.Mesh = mesh_object.data
+        name = mesh_object.name
+
+        if check_mesh_data:
+            invalid_uv_names = [uv_layer.name for uv_layer in mesh_data.uv_layers if uv_layer.name not in SMASH_UV_NAMES]
+            if len(invalid_uv_names) > 0:
+                message = f'Mesh {name} has invalid UV map names {", ".join(invalid_uv_names)}.'
+                message += f' Valid names are {", ".join(SMASH_UV_NAMES)}.'
+                errors.append(ExportValidationError(message, MESH_DATA_FILES))
+
+            for attribute in mesh_data.color_attributes:
+                if attribute.name == '_smush_blender_custom_normals':
+                    continue
+                if attribute.name not in SMASH_COLOR_NAMES:
+                    message = f'Mesh {name} has invalid vertex color name {attribute.name}. Valid names are {", ".join(SMASH_COLOR_NAMES)}.'
+                    errors.append(ExportValidationError(message, MESH_DATA_FILES))
+                if attribute.domain not in ('CORNER', 'POINT'):
+                    message = f'Color attribute {attribute.name} of mesh {name} has unsupported domain {attribute.domain}.'
+                    errors.append(ExportValidationError(message, MESH_DATA_FILES))
+                if attribute.data_type not in ('FLOAT_COLOR', 'BYTE_COLOR'):
+                    message = f'Color attribute {attribute.name} of mesh {name} has unsupported data type {attribute.data_type}.'
+                    errors.append(ExportValidationError(message, MESH_DATA_FILES))
+
+        if split_shape_keys != 'IGNORE_SHAPEKEYS' and mesh_data.shape_keys is not None:
+            # Split keys become new meshes named after the key, which would silently join any mesh group with the same name.
+            for key_block in mesh_data.shape_keys.key_blocks:
+                if '_VIS' in key_block.name and trim_name(key_block.name) in exported_group_names:
+                    warnings.append(f'Shape key {key_block.name} of mesh {name} has the same name as an exported mesh, so both will be exported in one group.')
+
+        polygon_materials = _read(mesh_data.polygons, 'material_index', 1, np.int32)
+        if check_materials:
+            if len(mesh_object.material_slots) == 0:
+                message = f'No material assigned for {name}. Assign a material or disable .NUMDLB and .NUMATB export.'
+                errors.append(ExportValidationError(message, MATERIAL_FILES))
+            else:
+                for material_index in np.unique(polygon_materials).tolist():
+                    if get_slot_material(mesh_object, material_index) is None:
+                        message = f'The mesh {name} has no material created for material slot {material_index}.'
+                        errors.append(ExportValidationError(message, MATERIAL_FILES))
+
+        if not check_mesh_data or _changes_topology(mesh_object, apply_modifiers):
+            continue
+
+        # Loose vertices are deleted on export, so only check vertices used by a face.
+        exported_vertices = np.zeros(len(mesh_data.vertices), dtype=bool)
+        exported_vertices[_read(mesh_data.loops, 'vertex_index', 1, np.int32)] = True
+        deform_group_indices = {vg.index for vg in mesh_object.vertex_groups if vg.name in arma.data.bones}
+        # Blender has no foreach_get for the nested MeshVertex.groups collection.
+        influence_counts = np.fromiter(
+            (sum(1 for g in v.groups if g.group in deform_group_indices) for v in mesh_data.vertices),
+            dtype=np.int32, count=len(mesh_data.vertices)
+        )
+        too_many = np.count_nonzero((influence_counts > MAX_INFLUENCES_PER_VERTEX) & exported_vertices)
+        if too_many > 0:
+            message = f'Mesh {name} has {too_many} vertices with more than {MAX_INFLUENCES_PER_VERTEX} weights.'
+            message += f' Select all in Edit Mode and click Mesh > Weights > Limit Total with the limit set to {MAX_INFLUENCES_PER_VERTEX}.'
+            errors.append(ExportValidationError(message, MESH_DATA_FILES))
+
+        if not np.any(influence_counts[exported_vertices] > 0):
+            continue
+        for material_index, vertex_count in _get_projected_vertex_counts(mesh_data).items():
+            if vertex_count - 1 > MAX_SKINNED_VERTEX_INDEX:
+                message = f'Mesh {name} material slot {material_index} will export {vertex_count} vertices after splitting UV seams and sharp edges,'
+                message += f' but skinned meshes are limited to {MAX_SKINNED_VERTEX_INDEX + 1}. Reduce the number of vertices or split the mesh into smaller meshes.'
+                errors.append(ExportValidationError(message, MESH_DATA_FILES))
+
+    return ExportValidationReport(errors, warnings)
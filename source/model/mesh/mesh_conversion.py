@@ -0,0 +1,304 @@
+'''
+Converts triangle meshes from blender's per corner layout to Ultimate's per vertex layout using only numpy arrays.
+Nothing here imports bpy, so the conversion can be tested, benchmarked or run in worker processes without blender.
+Adapters fill a CornerMesh from a blender mesh in export_model or from an ssbh_data_py MeshObjectData here.
+'''
+import numpy as np
+
+from typing import Callable, NamedTuple
+
+from .mesh_object_arrays import MeshObjectArrays
+from .tangents import calculate_tangents
+from .vertex_cache import tipsify, renumber_vertices_by_first_use, get_vertex_cache_stats
+
+# The same values as np.array(Matrix.Rotation(math.radians(90), 3, 'X')), which mathutils calculates in single precision.
+# Multiplying row vectors by this converts blender's Z up coordinates to Ultimate's Y up coordinates.
+_ANGLE = np.float32(np.pi / 2)
+AXIS_CORRECTION = np.array([
+    [1.0, 0.0, 0.0],
+    [0.0, np.cos(_ANGLE), -np.sin(_ANGLE)],
+    [0.0, np.sin(_ANGLE), np.cos(_ANGLE)],
+], dtype=np.float32).astype(np.float64)
+
+# Mesh version 1.10 only has 16-bit unsigned vertex indices for skin weights.
+MAX_SKINNED_VERTEX_INDEX = 65535
+MAX_INFLUENCES_PER_VERTEX = 4
+
+Report = Callable[[set[str], str], None]
+
+
+class CornerMesh(NamedTuple):
+    '''
+    A triangle mesh in blender's coordinates and conventions, where every three consecutive corners make one triangle.
+    Normals, UVs and corner colors have a value per corner, so a vertex can have several values until convert_corner_mesh splits it.
+    '''
+    positions: np.ndarray
+    corner_vertices: np.ndarray
+    corner_normals: np.ndarray
+    # (name, uvs) for every UV map, with V pointing up like blender.
+    corner_uvs: list[tuple[str, np.ndarray]]
+    # (name, colors, is_per_corner) for every color set, with RGBA values per corner or per vertex.
+    colors: list[tuple[str, np.ndarray, bool]]
+    # Precalculated tangents per corner, or None to calculate them from the UV map named tangent_uv_name.
+    corner_tangents: np.ndarray | None
+    corner_bitangent_signs: np.ndarray | None
+    tangent_uv_name: str | None
+    triangle_materials: np.ndarray
+    # Flat (vertex_index, group_index, weight) arrays for every weight, where group_names[group_index] is the bone name.
+    weight_vertex_indices: np.ndarray
+    weight_group_indices: np.ndarray
+    weights: np.ndarray
+    group_names: list[str]
+    # The original vertex of each vertex if processing changed the vertex order, or None if it didn't.
+    source_vertex_indices: np.ndarray | None
+    # The original corner of each corner before triangulating, or None if it isn't known.
+    source_corner_indices: np.ndarray | None = None
+
+
+def get_material_corners(mesh: CornerMesh, material_index: int) -> np.ndarray:
+    # Returns the corners of every triangle using the given material, in triangle order.
+    return np.flatnonzero(np.repeat(mesh.triangle_materials, 3) == material_index)
+
+def find_unique_corners(loop_vertex_indices: np.ndarray, per_loop_attributes: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Blender stores normals, uvs and corner colors per loop rather than per vertex.
+    Loops that share a vertex and all attribute values become one exported vertex, anything else becomes a new vertex.
+    Returns (first_loops, loop_to_vertex), where first_loops[v] is the loop whose values exported vertex v uses,
+    and loop_to_vertex is the new vertex index of every loop. Vertices are numbered in order of first use.
+    '''
+    if len(loop_vertex_indices) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint32)
+
+    # Compare the raw bits of every column at once, with -0.0 changed to 0.0 so it matches 0.0.
+    columns = [loop_vertex_indices.astype(np.uint32).reshape((-1, 1))]
+    for attribute in per_loop_attributes:
+        columns.append((attribute.reshape((len(loop_vertex_indices), -1)).astype(np.float32) + np.float32(0.0)).view(np.uint32))
+    keys = np.ascontiguousarray(np.concatenate(columns, axis=1))
+    keys = keys.view(np.dtype((np.void, keys.dtype.itemsize * keys.shape[1]))).ravel()
+
+    _, first_loops, unique_loop_to_vertex = np.unique(keys, return_index=True, return_inverse=True)
+    # np.unique sorts by key bytes, so renumber the vertices in order of first use.
+    order = np.argsort(first_loops)
+    sorted_to_first_use = np.empty_like(order)
+    sorted_to_first_use[order] = np.arange(len(order))
+    loop_to_vertex = sorted_to_first_use[unique_loop_to_vertex.ravel()].astype(np.uint32)
+    return first_loops[order], loop_to_vertex
+
+def group_vertex_weights_by_group(vertex_indices: np.ndarray, group_indices: np.ndarray, weights: np.ndarray):
+    '''
+    Yields (group_index, vertex_indices, weights) in ascending group index order, with the weights of each group in vertex order.
+    '''
+    if len(group_indices) == 0:
+        return
+    order = np.lexsort((vertex_indices, group_indices))
+    sorted_groups = group_indices[order]
+    sorted_vertices = vertex_indices[order]
+    sorted_weights = weights[order]
+    starts = np.flatnonzero(np.diff(sorted_groups, prepend=-1))
+    ends = np.append(starts[1:], len(sorted_groups))
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        yield int(sorted_groups[start]), sorted_vertices[start:end], sorted_weights[start:end]
+
+def expand_vertex_weights(weight_vertex_indices: np.ndarray, new_vertex_to_vertex: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Each blender vertex may become several exported vertices, which all need the blender vertex's weights.
+    Returns (weight_indices, new_vertex_indices), where weight_indices selects the weight to copy for each new vertex.
+    '''
+    copy_counts = np.bincount(new_vertex_to_vertex, minlength=weight_vertex_indices.max(initial=-1) + 1)
+    new_vertices_by_vertex = np.argsort(new_vertex_to_vertex, kind='stable')
+    first_new_vertex = np.cumsum(copy_counts) - copy_counts
+
+    weight_copy_counts = copy_counts[weight_vertex_indices]
+    weight_indices = np.repeat(np.arange(len(weight_vertex_indices)), weight_copy_counts)
+    copy_offsets = np.arange(len(weight_indices)) - np.repeat(np.cumsum(weight_copy_counts) - weight_copy_counts, weight_copy_counts)
+    new_vertex_indices = new_vertices_by_vertex[first_new_vertex[weight_vertex_indices][weight_indices] + copy_offsets]
+    return weight_indices, new_vertex_indices
+
+def convert_corner_mesh(mesh: CornerMesh, corners: np.ndarray, mesh_name: str, subindex: int,
+                        optimize_vertex_cache: bool=False, report: Report | None=None) -> MeshObjectArrays:
+    '''
+    Converts the triangles of the given corners, usually the corners of one material, to exported vertex arrays.
+    mesh_name and subindex are only used in messages. report is called like Operator.report for warnings and info.
+    Raises RuntimeError for meshes that can't be exported.
+    '''
+    corner_vertices = mesh.corner_vertices[corners]
+    corner_normals = mesh.corner_normals[corners]
+    corner_uvs = [(name, uvs[corners]) for name, uvs in mesh.corner_uvs]
+
+    # Split vertices where the corners disagree on any per corner attribute.
+    # Small fluctuations in normal vectors are expected during processing, so compare normals on a grid of about 0.001.
+    per_loop_attributes = [np.round(corner_normals * 1024.0)]
+    per_loop_attributes.extend(uvs for _, uvs in corner_uvs)
+    per_loop_attributes.extend(colors[corners] for _, colors, is_per_corner in mesh.colors if is_per_corner)
+    first_loops, vertex_indices = find_unique_corners(corner_vertices, per_loop_attributes)
+    tangent_vertex_indices = vertex_indices
+    if optimize_vertex_cache and len(vertex_indices) > 0:
+        # Reorder the triangles for the in game vertex cache, then renumber the vertices in the order the new triangles use them.
+        acmr_before, atvr_before = get_vertex_cache_stats(vertex_indices)
+        triangles = vertex_indices.reshape((-1, 3))
+        triangle_order = tipsify(triangles.astype(np.int64), len(first_loops))
+        vertex_indices, old_vertices = renumber_vertices_by_first_use(triangles[triangle_order].ravel())
+        first_loops = first_loops[old_vertices]
+        # Calculate tangents with the original triangle order, since the first corner of each vertex picks its tangent like blender.
+        new_vertices = np.empty_like(old_vertices)
+        new_vertices[old_vertices] = np.arange(len(old_vertices))
+        tangent_vertex_indices = new_vertices[tangent_vertex_indices]
+        acmr_after, atvr_after = get_vertex_cache_stats(vertex_indices)
+        if report is not None:
+            message = f'Mesh {mesh_name} subindex {subindex} vertex cache: ACMR {acmr_before:.3f} -> {acmr_after:.3f}, ATVR {atvr_before:.3f} -> {atvr_after:.3f}'
+            report({'INFO'}, message)
+    new_vertex_to_vertex = corner_vertices[first_loops].astype(np.int64)
+
+    positions = mesh.positions[new_vertex_to_vertex] @ AXIS_CORRECTION
+
+    # Pad normals to 4 components instead of 3 components.
+    # This actually results in smaller file sizes since HalFloat4 is smaller than Float3.
+    normals = corner_normals[first_loops] @ AXIS_CORRECTION
+    normals = np.append(normals, np.zeros((normals.shape[0],1)), axis=1)
+
+    bone_influences = get_bone_influences(mesh, new_vertex_to_vertex, mesh_name, report)
+
+    # Mesh version 1.10 only has 16-bit unsigned vertex indices for skin weights.
+    # Meshes without vertex skinning can use the full range of 32-bit unsigned vertex indices.
+    vertex_index = vertex_indices.max(initial=0)
+    if len(bone_influences) > 0 and vertex_index > MAX_SKINNED_VERTEX_INDEX:
+        message = f'Vertex index {vertex_index} exceeds the limit of {MAX_SKINNED_VERTEX_INDEX} for mesh {mesh_name}.'
+        message += ' Reduce the number of vertices or split the mesh into smaller meshes.'
+        message += ' Note that splitting duplicate UVs will increase the vertex count.'
+        raise RuntimeError(message)
+
+    texture_coordinates: list[tuple[str, np.ndarray]] = []
+    for name, uvs in corner_uvs:
+        uvs = uvs[first_loops]
+        # Flip vertical.
+        uvs[:,1] = 1.0 - uvs[:,1]
+        texture_coordinates.append((name, uvs))
+
+    color_sets: list[tuple[str, np.ndarray]] = []
+    for name, colors, is_per_corner in mesh.colors:
+        if is_per_corner:
+            color_sets.append((name, colors[corners][first_loops]))
+        else:
+            color_sets.append((name, colors[new_vertex_to_vertex]))
+
+    if mesh.corner_tangents is None:
+        # Use the UVs before flipping, the same as blender's calc_tangents.
+        uv_name_to_uvs = dict(corner_uvs)
+        if mesh.tangent_uv_name in uv_name_to_uvs:
+            uvs = uv_name_to_uvs[mesh.tangent_uv_name][first_loops]
+        else:
+            uvs = np.zeros((len(first_loops), 2), dtype=np.float32)
+        tangents, bitangent_signs = calculate_tangents(positions, normals, uvs, tangent_vertex_indices, new_vertex_to_vertex)
+        tangents = np.append(tangents, bitangent_signs.reshape((-1, 1)) * -1.0, axis=1)
+    else:
+        tangents = mesh.corner_tangents[corners][first_loops]
+        bitangent_signs = mesh.corner_bitangent_signs[corners][first_loops].reshape((-1, 1))
+        tangents = np.append(tangents @ AXIS_CORRECTION, bitangent_signs * -1.0, axis=1)
+
+    source_vertex_indices = new_vertex_to_vertex
+    if mesh.source_vertex_indices is not None:
+        source_vertex_indices = mesh.source_vertex_indices[new_vertex_to_vertex].astype(np.int64)
+
+    return MeshObjectArrays(vertex_indices, positions, normals, tangents, texture_coordinates, color_sets, bone_influences, source_vertex_indices)
+
+def get_bone_influences(mesh: CornerMesh, new_vertex_to_vertex: np.ndarray, mesh_name: str,
+                        report: Report | None=None) -> list[tuple[str, np.ndarray, np.ndarray]]:
+    '''
+    Returns (bone_name, vertex_indices, weights) for every bone with at least one weight, indexed by exported vertex.
+    '''
+    vertex_count = len(mesh.positions)
+    weight_vertex_indices = mesh.weight_vertex_indices
+    weight_group_indices = mesh.weight_group_indices
+    weights = mesh.weights
+
+    # Loose vertices and the vertices of other materials aren't exported, so only check the vertices that are.
+    exported_vertices = np.zeros(vertex_count, dtype=bool)
+    exported_vertices[new_vertex_to_vertex] = True
+
+    deform_group_counts = np.bincount(weight_vertex_indices, minlength=vertex_count)
+    if np.any(deform_group_counts[exported_vertices] > MAX_INFLUENCES_PER_VERTEX):
+        # We won't fix this automatically since removing influences may break animations.
+        message = f'Vertex with more than {MAX_INFLUENCES_PER_VERTEX} weights detected for mesh {mesh_name}.'
+        message += f' Select all in Edit Mode and click Mesh > Weights > Limit Total with the limit set to {MAX_INFLUENCES_PER_VERTEX}.'
+        message += ' Weights may need to be reassigned after limiting totals.'
+        raise RuntimeError(message)
+
+    # Blender doesn't enforce normalization, since it normalizes while animating.
+    # Normalize on export to ensure the weights work correctly in game.
+    weight_sums = np.bincount(weight_vertex_indices, weights=weights, minlength=vertex_count)
+    if np.any(weight_sums[exported_vertices] == 0.0) and report is not None:
+        message = f'Mesh {mesh_name} has unweighted vertices or vertices with only 0.0 weights.'
+        report({'WARNING'}, message)
+
+    # Remove unused weights on export, including the weights of vertices that aren't exported.
+    used = (weights > 0.0) & exported_vertices[weight_vertex_indices]
+    weight_vertex_indices = weight_vertex_indices[used]
+    weight_group_indices = weight_group_indices[used]
+    weights = weights[used] / weight_sums[weight_vertex_indices]
+
+    # Copy the weights to every exported vertex made from the same blender vertex.
+    weight_indices, weight_vertex_indices = expand_vertex_weights(weight_vertex_indices, new_vertex_to_vertex)
+    weight_group_indices = weight_group_indices[weight_indices]
+    weights = weights[weight_indices]
+
+    # Assume all influence names are valid since some in game models have influences not in the skel.
+    # For example, fighter/miifighter/model/b_deacon_m weights vertices to effect bones.
+    return [
+        (mesh.group_names[group_index], group_vertex_indices, group_weights)
+        for group_index, group_vertex_indices, group_weights in group_vertex_weights_by_group(weight_vertex_indices, weight_group_indices, weights)
+    ]
+
+def corner_mesh_from_ssbh_mesh_object(mesh_object) -> CornerMesh:
+    '''
+    Fills a CornerMesh from an ssbh_data_py MeshObjectData, undoing the axis correction and UV flip.
+    Converting the result again gives the same vertices, so this can be used to test or benchmark the conversion without blender.
+    '''
+    vertex_indices = np.asarray(mesh_object.vertex_indices, dtype=np.int64)
+    positions = np.asarray(mesh_object.positions[0].data, dtype=np.float64)[:,:3] @ AXIS_CORRECTION.T
+    normals = np.asarray(mesh_object.normals[0].data, dtype=np.float64)[:,:3] @ AXIS_CORRECTION.T
+
+    corner_uvs = []
+    for attribute in mesh_object.texture_coordinates:
+        uvs = np.array(attribute.data, dtype=np.float32)[:,:2]
+        # Flip vertical.
+        uvs[:,1] = 1.0 - uvs[:,1]
+        corner_uvs.append((attribute.name, uvs[vertex_indices]))
+
+    # Colors are already per vertex, so they don't need to be expanded to corners.
+    colors = [(attribute.name, np.asarray(attribute.data, dtype=np.float32)[:,:4], False) for attribute in mesh_object.color_sets]
+
+    group_names = [influence.bone_name for influence in mesh_object.bone_influences]
+    weight_counts = [len(influence.vertex_weights) for influence in mesh_object.bone_influences]
+    weight_vertex_indices = np.fromiter(
+        (w.vertex_index for influence in mesh_object.bone_influences for w in influence.vertex_weights),
+        dtype=np.int64, count=sum(weight_counts)
+    )
+    weights = np.fromiter(
+        (w.vertex_weight for influence in mesh_object.bone_influences for w in influence.vertex_weights),
+        dtype=np.float64, count=sum(weight_counts)
+    )
+    weight_group_indices = np.repeat(np.arange(len(group_names), dtype=np.int64), weight_counts)
+
+    corner_tangents = None
+    corner_bitangent_signs = None
+    if len(mesh_object.tangents) > 0:
+        tangents = np.asarray(mesh_object.tangents[0].data, dtype=np.float64)
+        corner_tangents = (tangents[:,:3] @ AXIS_CORRECTION.T)[vertex_indices]
+        corner_bitangent_signs = tangents[:,3][vertex_indices] * -1.0
+
+    return CornerMesh(
+        positions,
+        vertex_indices,
+        normals[vertex_indices],
+        corner_uvs,
+        colors,
+        corner_tangents,
+        corner_bitangent_signs,
+        corner_uvs[0][0] if len(corner_uvs) > 0 else None,
+        np.zeros(len(vertex_indices) // 3, dtype=np.int64),
+        weight_vertex_indices,
+        weight_group_indices,
+        weights,
+        group_names,
+        None
+    )
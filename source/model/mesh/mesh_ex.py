@@ -0,0 +1,82 @@
+'''
+The .numshexb bounding spheres and .adjb vertex adjacency, calculated from the exported arrays with numpy.
+These give the same values as ssbh_data_py's MeshExData.from_mesh_objects and AdjEntryData.from_mesh_object,
+without converting every exported MeshObjectData again or walking its vertices in a single thread.
+'''
+import numpy as np
+
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+# Each vertex stores the other two vertices of up to this many faces, padded with -1.
+MAX_ADJACENT_FACES = 9
+
+
+def _map_in_threads(function, items: list) -> list:
+    # numpy releases the GIL for sorting and most array math, so large meshes run in parallel.
+    if len(items) <= 1:
+        return [function(item) for item in items]
+    with ThreadPool(processes=min(len(items), cpu_count())) as pool:
+        return pool.map(function, items)
+
+def calculate_bounding_sphere(positions: np.ndarray) -> tuple[list[float], float]:
+    '''
+    Returns (center, radius) for a sphere centered on the average position, in single precision like ssbh_data.
+    '''
+    positions = np.asarray(positions, dtype=np.float32)[:, :3]
+    if len(positions) == 0:
+        return [0.0, 0.0, 0.0], 0.0
+    center = positions.mean(axis=0, dtype=np.float32)
+    radius = np.sqrt(np.sum((positions - center) ** 2, axis=1, dtype=np.float32)).max()
+    return center.tolist(), float(radius)
+
+def get_group_bounding_spheres(names: list[str], positions: list[np.ndarray]) -> list[tuple[list[float], float]]:
+    '''
+    Returns one bounding sphere for each run of consecutive mesh objects with the same name, the same groups as MeshExData.
+    '''
+    starts = [i for i in range(len(names)) if i == 0 or names[i] != names[i - 1]]
+    ends = starts[1:] + [len(names)]
+    groups = [np.concatenate([np.asarray(p, dtype=np.float32)[:, :3] for p in positions[start:end]]) for start, end in zip(starts, ends)]
+    return _map_in_threads(calculate_bounding_sphere, groups)
+
+def calculate_vertex_adjacency(vertex_indices: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    '''
+    Returns MAX_ADJACENT_FACES * 2 values per vertex, flattened, with the other two vertices of every face using any vertex at the same position.
+    Vertices at the same position share the faces of every such vertex in ascending vertex order,
+    so normals recalculated in game stay smooth across UV seams.
+    '''
+    positions = np.asarray(positions, dtype=np.float32)[:, :3]
+    vertex_count = len(positions)
+    if vertex_count == 0 or len(vertex_indices) == 0:
+        return np.full(vertex_count * MAX_ADJACENT_FACES * 2, -1, dtype=np.int16)
+
+    # Compare positions by value, with -0.0 changed to 0.0 so it matches 0.0.
+    keys = np.ascontiguousarray((positions + np.float32(0.0)).view(np.uint32))
+    keys = keys.view(np.dtype((np.void, keys.dtype.itemsize * keys.shape[1]))).ravel()
+    _, position_groups = np.unique(keys, return_inverse=True)
+    position_groups = position_groups.ravel()
+
+    triangles = np.asarray(vertex_indices, dtype=np.int64).reshape((-1, 3))
+    corner_vertices = triangles.ravel()
+    # The other two vertices of each corner in winding order.
+    next_vertices = np.roll(triangles, -1, axis=1).ravel()
+    previous_vertices = np.roll(triangles, -2, axis=1).ravel()
+
+    # Sort corners by position, then by vertex, then by face, and keep the first faces of each position.
+    corner_groups = position_groups[corner_vertices]
+    order = np.lexsort((np.arange(len(corner_vertices)), corner_vertices, corner_groups))
+    sorted_groups = corner_groups[order]
+    group_starts = np.flatnonzero(np.diff(sorted_groups, prepend=-1))
+    ranks = np.arange(len(order)) - np.repeat(group_starts, np.diff(np.append(group_starts, len(order))))
+    kept = ranks < MAX_ADJACENT_FACES
+
+    group_adjacency = np.full((position_groups.max() + 1, MAX_ADJACENT_FACES, 2), -1, dtype=np.int32)
+    group_adjacency[sorted_groups[kept], ranks[kept], 0] = next_vertices[order][kept]
+    group_adjacency[sorted_groups[kept], ranks[kept], 1] = previous_vertices[order][kept]
+
+    # The .adjb format stores signed 16-bit indices, so larger indices wrap around the same as in ssbh_data.
+    return group_adjacency[position_groups].ravel().astype(np.int16)
+
+def calculate_vertex_adjacencies(mesh_objects: list[tuple[np.ndarray, np.ndarray]]) -> list[np.ndarray]:
+    # Calculates the adjacency of every (vertex_indices, positions) in parallel.
+    return _map_in_threads(lambda mesh_object: calculate_vertex_adjacency(*mesh_object), mesh_objects)
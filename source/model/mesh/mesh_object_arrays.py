@@ -0,0 +1,41 @@
+import numpy as np
+
+from typing import NamedTuple
+
+from ....dependencies import ssbh_data_py
+
+
+class MeshObjectArrays(NamedTuple):
+    '''
+    The exported data of one mesh object as plain numpy arrays, already converted to Ultimate's coordinates and conventions.
+    This doesn't hold the mesh object name or subindex, so the same arrays can be reused under any name.
+    '''
+    vertex_indices: np.ndarray
+    positions: np.ndarray
+    normals: np.ndarray
+    tangents: np.ndarray
+    texture_coordinates: list[tuple[str, np.ndarray]]
+    color_sets: list[tuple[str, np.ndarray]]
+    # (bone_name, vertex_indices, weights) for every bone with at least one weight.
+    bone_influences: list[tuple[str, np.ndarray, np.ndarray]]
+    # The blender vertex each exported vertex was made from, for reading other per vertex data like shape keys.
+    source_vertex_indices: np.ndarray
+
+
+def make_ssbh_mesh_object(name: str, subindex: int, arrays: MeshObjectArrays) -> ssbh_data_py.mesh_data.MeshObjectData:
+    # ssbh_data_py accepts lists, tuples, or numpy arrays for AttributeData.data.
+    ssbh_mesh_object = ssbh_data_py.mesh_data.MeshObjectData(name, subindex)
+    ssbh_mesh_object.vertex_indices = arrays.vertex_indices
+    ssbh_mesh_object.positions = [ssbh_data_py.mesh_data.AttributeData('Position0', arrays.positions)]
+    ssbh_mesh_object.normals = [ssbh_data_py.mesh_data.AttributeData('Normal0', arrays.normals)]
+    ssbh_mesh_object.tangents = [ssbh_data_py.mesh_data.AttributeData('Tangent0', arrays.tangents)]
+    ssbh_mesh_object.texture_coordinates = [ssbh_data_py.mesh_data.AttributeData(n, data) for n, data in arrays.texture_coordinates]
+    ssbh_mesh_object.color_sets = [ssbh_data_py.mesh_data.AttributeData(n, data) for n, data in arrays.color_sets]
+    # Avoid adding unused influences if there are no weights.
+    # Some meshes are parented to a bone instead of using vertex skinning.
+    # This requires the influence list to be empty to save properly.
+    ssbh_mesh_object.bone_influences = [
+        ssbh_data_py.mesh_data.BoneInfluence(bone_name, list(map(ssbh_data_py.mesh_data.VertexWeight, vertex_indices.tolist(), weights.tolist())))
+        for bone_name, vertex_indices, weights in arrays.bone_influences
+    ]
+    return ssbh_mesh_object
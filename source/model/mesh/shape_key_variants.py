@@ -0,0 +1,50 @@
+'''
+Converts "_VIS" shape keys split into their own meshes from the already processed base mesh, without object copies.
+The key's positions and blender's corner normals for the key replace those of the base CornerMesh,
+and the result goes through convert_corner_mesh like any other mesh, so vertices split wherever the key's normals differ.
+'''
+import numpy as np
+
+from .mesh_conversion import AXIS_CORRECTION, CornerMesh, convert_corner_mesh
+
+
+def get_affected_vertices(corner_vertices: np.ndarray, moved_vertices: np.ndarray) -> np.ndarray:
+    '''
+    Returns a mask of the vertices used by any triangle with a moved vertex, since only these can have different normals.
+    '''
+    triangles = corner_vertices.reshape((-1, 3))
+    moved_triangles = np.any(moved_vertices[triangles], axis=1)
+    affected_vertices = np.zeros(len(moved_vertices), dtype=bool)
+    affected_vertices[triangles[moved_triangles].ravel()] = True
+    return affected_vertices
+
+def calculate_corner_tangents(mesh: CornerMesh) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Returns (corner_tangents, corner_bitangent_signs) for every corner, calculated like the 'VECTORIZED' tangent method.
+    The whole mesh is used like blender's calc_tangents, so vertices on material seams see the triangles of both materials.
+    '''
+    corners = np.arange(len(mesh.corner_vertices))
+    arrays = convert_corner_mesh(mesh._replace(corner_tangents=None, corner_bitangent_signs=None), corners, '', 0)
+    tangents = arrays.tangents[arrays.vertex_indices.astype(np.int64)]
+    # Undo the axis correction and bitangent flip of convert_corner_mesh.
+    return tangents[:, :3] @ AXIS_CORRECTION.T, tangents[:, 3] * -1.0
+
+def make_shape_key_corner_mesh(base: CornerMesh, positions: np.ndarray, corner_normals: np.ndarray, moved_vertices: np.ndarray) -> CornerMesh:
+    '''
+    Replaces the positions and normals of the base mesh with those of the shape key, in the same space as base.
+    positions and moved_vertices have a value per vertex and corner_normals has a value per corner of base.
+    Vertices without a moved triangle keep the base positions, normals and precalculated tangents exactly.
+    The tangents of the other vertices are calculated for the key.
+    '''
+    affected_corners = get_affected_vertices(base.corner_vertices, moved_vertices)[base.corner_vertices]
+    positions = np.where(moved_vertices[:, None], positions, base.positions).astype(base.positions.dtype)
+    corner_normals = np.where(affected_corners[:, None], corner_normals, base.corner_normals).astype(base.corner_normals.dtype)
+    mesh = base._replace(positions=positions, corner_normals=corner_normals)
+    if base.corner_tangents is None or not np.any(affected_corners):
+        # convert_corner_mesh calculates every tangent from the key's positions and normals.
+        return mesh
+
+    tangents, bitangent_signs = calculate_corner_tangents(mesh)
+    corner_tangents = np.where(affected_corners[:, None], tangents, base.corner_tangents).astype(base.corner_tangents.dtype)
+    corner_bitangent_signs = np.where(affected_corners, bitangent_signs, base.corner_bitangent_signs).astype(base.corner_bitangent_signs.dtype)
+    return mesh._replace(corner_tangents=corner_tangents, corner_bitangent_signs=corner_bitangent_signs)
@@ -0,0 +1,175 @@
+import numpy as np
+
+
+def _normalize(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Returns (normalized, valid), leaving vectors that are too short to normalize as zero.
+    lengths = np.linalg.norm(vectors, axis=-1)
+    valid = lengths > 1e-20
+    normalized = np.zeros_like(vectors)
+    normalized[valid] = vectors[valid] / lengths[valid, None]
+    return normalized, valid
+
+def _project_onto_plane(vectors: np.ndarray, normals: np.ndarray) -> np.ndarray:
+    return vectors - np.sum(vectors * normals, axis=-1, keepdims=True) * normals
+
+def calculate_tangents(positions: np.ndarray, normals: np.ndarray, uvs: np.ndarray, vertex_indices: np.ndarray,
+                       source_vertex_indices: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Calculates tangents for triangles like MikkTSpace, using only the exported vertex and index arrays.
+    Returns (tangents, bitangent_signs), where the bitangent is bitangent_sign * cross(normal, tangent), the same as blender's loop attributes.
+
+    Like MikkTSpace, each face's tangent is projected onto the normal at each corner and weighted by the corner angle.
+    Corners share a tangent if their triangles are connected around the same welded vertex and have the same UV winding.
+    Vertices are welded if they have the same vertex, normal and UV,
+    where source_vertex_indices optionally joins vertices that were only split for other attributes like colors.
+    Corners that aren't connected to any triangle with UV area get MikkTSpace's default of the X axis and a negative bitangent sign.
+    Compare the results with blender using test/test_tangent_parity.py after changing this function.
+    '''
+    vertex_count = len(positions)
+    normals = _normalize(np.asarray(normals, dtype=np.float64)[:, :3])[0]
+    tangents = np.zeros((vertex_count, 3), dtype=np.float64)
+    tangents[:, 0] = 1.0
+    bitangent_signs = np.full(vertex_count, -1.0, dtype=np.float64)
+    if len(vertex_indices) == 0:
+        return tangents, bitangent_signs
+
+    triangles = vertex_indices.reshape((-1, 3)).astype(np.int64)
+    p = np.asarray(positions, dtype=np.float64)[triangles]
+    t = np.asarray(uvs, dtype=np.float64)[triangles]
+    n = normals[triangles]
+
+    d1 = p[:, 1] - p[:, 0]
+    d2 = p[:, 2] - p[:, 0]
+    t21 = t[:, 1] - t[:, 0]
+    t31 = t[:, 2] - t[:, 0]
+    signed_uv_area = t21[:, 0] * t31[:, 1] - t21[:, 1] * t31[:, 0]
+    orientation_preserving = signed_uv_area > 0.0
+    has_uv_area = np.abs(signed_uv_area) > 1e-20
+
+    # The direction of increasing U in the plane of the face, flipped for mirrored UVs so it still follows U.
+    face_tangents = t31[:, 1:2] * d1 - t21[:, 1:2] * d2
+    face_tangents = _normalize(face_tangents)[0] * np.where(orientation_preserving, 1.0, -1.0)[:, None]
+    face_tangents[~has_uv_area] = 0.0
+
+    corner_tangents = _normalize(_project_onto_plane(face_tangents[:, None, :], n))[0]
+    corner_angles = np.zeros((len(triangles), 3), dtype=np.float64)
+    for corner in range(3):
+        edge1 = _normalize(_project_onto_plane(p[:, (corner + 1) % 3] - p[:, corner], n[:, corner]))[0]
+        edge2 = _normalize(_project_onto_plane(p[:, (corner + 2) % 3] - p[:, corner], n[:, corner]))[0]
+        corner_angles[:, corner] = np.arccos(np.clip(np.sum(edge1 * edge2, axis=1), -1.0, 1.0))
+    weighted_tangents = (corner_tangents * corner_angles[:, :, None]).reshape((-1, 3))
+
+    corner_vertices = triangles.ravel()
+    identity = source_vertex_indices[corner_vertices] if source_vertex_indices is not None else corner_vertices
+    welded_keys = np.column_stack([
+        identity.astype(np.float64),
+        np.round(normals[corner_vertices] * 1024.0),
+        np.asarray(uvs, dtype=np.float64)[corner_vertices]
+    ])
+    welded = np.unique(welded_keys, axis=0, return_inverse=True)[1].ravel()
+
+    corner_links, triangle_neighbors = _find_neighbor_corners(welded)
+    orientation_preserving = _resolve_degenerate_orientations(orientation_preserving, has_uv_area, triangle_neighbors)
+    corner_orientations = np.repeat(orientation_preserving, 3)
+
+    # Like MikkTSpace, corners only share a tangent if their triangles are connected through edges around the vertex
+    # and have the same UV winding, so UV seams and mirrored UVs split the tangents.
+    same_orientation = corner_orientations[corner_links[:, 0]] == corner_orientations[corner_links[:, 1]]
+    groups = _connected_components(len(corner_vertices), corner_links[same_orientation])
+    group_tangents = np.zeros((len(corner_vertices), 3), dtype=np.float64)
+    np.add.at(group_tangents, groups, weighted_tangents)
+    group_has_uv_area = np.zeros(len(corner_vertices), dtype=bool)
+    np.logical_or.at(group_has_uv_area, groups, np.repeat(has_uv_area, 3))
+
+    # Each vertex uses the tangent of the first corner that uses it, like the first loop of each exported vertex.
+    vertices, first_corners = np.unique(corner_vertices, return_index=True)
+    first_groups = groups[first_corners]
+    vertex_tangents, valid = _normalize(_project_onto_plane(group_tangents[first_groups], normals[vertices]))
+    valid &= group_has_uv_area[first_groups]
+    tangents[vertices[valid]] = vertex_tangents[valid]
+    bitangent_signs[vertices[valid]] = np.where(corner_orientations[first_corners[valid]], 1.0, -1.0)
+    return tangents, bitangent_signs
+
+def _find_neighbor_corners(welded: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Finds triangles that share an edge in opposite directions, where welded is the welded vertex of each corner.
+    Returns (corner_links, triangle_neighbors) as pairs of corners at the same vertex and pairs of neighboring triangles.
+    '''
+    corners = np.arange(len(welded))
+    next_corners = corners - corners % 3 + (corners + 1) % 3
+    starts = welded
+    ends = welded[next_corners]
+    edge_keys = np.column_stack([np.minimum(starts, ends), np.maximum(starts, ends)])
+    # Sort by corner last, so edges on the same vertices are in triangle order like MikkTSpace.
+    order = np.lexsort((corners, edge_keys[:, 1], edge_keys[:, 0]))
+    sorted_keys = edge_keys[order]
+    block_starts = np.flatnonzero(np.concatenate([[True], np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1)]))
+    block_sizes = np.diff(np.append(block_starts, len(order)))
+
+    pairs = block_starts[block_sizes == 2]
+    edge1 = order[pairs]
+    edge2 = order[pairs + 1]
+    # Edges in the same direction mean inconsistent winding.
+    reversed_edges = (starts[edge1] == ends[edge2]) & (ends[edge1] == starts[edge2])
+    edge1 = edge1[reversed_edges]
+    edge2 = edge2[reversed_edges]
+
+    # Edges shared by more than two triangles are rare, so match them in a loop.
+    # Each edge gets the first unmatched reversed edge after it, the same as MikkTSpace.
+    extra_edges = []
+    for start, size in zip(block_starts[block_sizes > 2], block_sizes[block_sizes > 2]):
+        block = order[start:start+size]
+        matched = np.zeros(size, dtype=bool)
+        for i in range(size):
+            if matched[i]:
+                continue
+            for j in range(i + 1, size):
+                if not matched[j] and starts[block[i]] == ends[block[j]] and ends[block[i]] == starts[block[j]]:
+                    matched[i] = matched[j] = True
+                    extra_edges.append((block[i], block[j]))
+                    break
+    if len(extra_edges) > 0:
+        edge1 = np.append(edge1, [e1 for e1, _ in extra_edges])
+        edge2 = np.append(edge2, [e2 for _, e2 in extra_edges])
+
+    # Edges along the collapsed side of a degenerate triangle don't connect anything.
+    collapsed = starts[edge1] == ends[edge1]
+    edge1 = edge1[~collapsed]
+    edge2 = edge2[~collapsed]
+
+    # The start of each edge is at the same vertex as the end of the other edge.
+    corner_links = np.concatenate([
+        np.column_stack([edge1, next_corners[edge2]]),
+        np.column_stack([next_corners[edge1], edge2])
+    ])
+    triangle_neighbors = np.column_stack([edge1 // 3, edge2 // 3])
+    return corner_links, triangle_neighbors
+
+def _resolve_degenerate_orientations(orientation_preserving: np.ndarray, has_uv_area: np.ndarray,
+                                     triangle_neighbors: np.ndarray) -> np.ndarray:
+    # MikkTSpace gives triangles without UV area the UV winding of the first neighboring group that reaches them.
+    # Use the winding of the lowest neighboring triangle with a known winding, repeating for chains of such triangles.
+    orientation_preserving = orientation_preserving.copy()
+    resolved = has_uv_area.copy()
+    neighbors = np.concatenate([triangle_neighbors, triangle_neighbors[:, ::-1]])
+    while True:
+        candidates = neighbors[~resolved[neighbors[:, 0]] & resolved[neighbors[:, 1]]]
+        if len(candidates) == 0:
+            return orientation_preserving
+        candidates = candidates[np.lexsort((candidates[:, 1], candidates[:, 0]))]
+        triangles, first = np.unique(candidates[:, 0], return_index=True)
+        orientation_preserving[triangles] = orientation_preserving[candidates[first, 1]]
+        resolved[triangles] = True
+
+def _connected_components(count: int, links: np.ndarray) -> np.ndarray:
+    # Label propagation with path shortcuts, which only takes a few passes since links only join corners around one vertex.
+    labels = np.arange(count)
+    while True:
+        smallest = np.minimum(labels[links[:, 0]], labels[links[:, 1]])
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, links[:, 0], smallest)
+        np.minimum.at(new_labels, links[:, 1], smallest)
+        new_labels = new_labels[new_labels]
+        if np.array_equal(new_labels, labels):
+            return labels
+        labels = new_labels
@@ -0,0 +1,120 @@
+import numpy as np
+
+from collections import deque
+
+# Post transform vertex cache size to optimize for and to measure with.
+# Smaller than most current hardware caches, since optimizing for a smaller cache still works well on bigger ones.
+VERTEX_CACHE_SIZE = 16
+
+def get_triangle_adjacency(triangles: np.ndarray, vertex_count: int) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Returns (offsets, adjacent_triangles), where adjacent_triangles[offsets[v]:offsets[v+1]] are the triangles using vertex v.
+    '''
+    corner_vertices = triangles.ravel()
+    corner_triangles = np.repeat(np.arange(len(triangles)), 3)
+    order = np.argsort(corner_vertices, kind='stable')
+    valences = np.bincount(corner_vertices, minlength=vertex_count)
+    offsets = np.zeros(vertex_count + 1, dtype=np.int64)
+    np.cumsum(valences, out=offsets[1:])
+    return offsets, corner_triangles[order]
+
+def tipsify(triangles: np.ndarray, vertex_count: int, cache_size: int = VERTEX_CACHE_SIZE) -> np.ndarray:
+    '''
+    Returns a new triangle order that improves post transform vertex cache reuse.
+    This is the linear time "Tipsify" algorithm from Sander, Nehab and Barczak, "Fast Triangle Reordering for Vertex Locality and Reduced Overdraw" (2007).
+    It fans around one vertex at a time, and picks the next vertex to fan around from the ones still likely to be in the cache.
+    '''
+    triangle_count = len(triangles)
+    if triangle_count == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    offsets, adjacent_triangles = get_triangle_adjacency(triangles, vertex_count)
+    offsets = offsets.tolist()
+    adjacent_triangles = adjacent_triangles.tolist()
+    triangle_vertices = triangles.tolist()
+    live_triangles = np.bincount(triangles.ravel(), minlength=vertex_count).tolist()
+    cache_times = [0] * vertex_count
+    emitted = [False] * triangle_count
+    dead_end_stack: list[int] = []
+    triangle_order: list[int] = []
+
+    timestamp = cache_size + 1
+    cursor = 0
+    fanning_vertex = int(triangles[0][0])
+    while fanning_vertex >= 0:
+        candidates: list[int] = []
+        for triangle in adjacent_triangles[offsets[fanning_vertex]:offsets[fanning_vertex + 1]]:
+            if emitted[triangle]:
+                continue
+            emitted[triangle] = True
+            triangle_order.append(triangle)
+            for vertex in triangle_vertices[triangle]:
+                dead_end_stack.append(vertex)
+                candidates.append(vertex)
+                live_triangles[vertex] -= 1
+                if timestamp - cache_times[vertex] > cache_size:
+                    cache_times[vertex] = timestamp
+                    timestamp += 1
+
+        # Prefer the candidate that will stay in the cache the longest while its remaining triangles are emitted.
+        fanning_vertex = -1
+        best_priority = -1
+        for vertex in candidates:
+            if live_triangles[vertex] > 0:
+                priority = 0
+                if timestamp - cache_times[vertex] + 2 * live_triangles[vertex] <= cache_size:
+                    priority = timestamp - cache_times[vertex]
+                if priority > best_priority:
+                    best_priority = priority
+                    fanning_vertex = vertex
+
+        if fanning_vertex < 0:
+            # Dead end, so go back to a recently used vertex or start over at the next unfinished vertex.
+            while len(dead_end_stack) > 0:
+                vertex = dead_end_stack.pop()
+                if live_triangles[vertex] > 0:
+                    fanning_vertex = vertex
+                    break
+            else:
+                while cursor < vertex_count and live_triangles[cursor] == 0:
+                    cursor += 1
+                fanning_vertex = cursor if cursor < vertex_count else -1
+
+    return np.array(triangle_order, dtype=np.int64)
+
+def renumber_vertices_by_first_use(vertex_indices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Returns (new_vertex_indices, old_vertices), where vertices are renumbered in the order the index buffer first uses them.
+    old_vertices[new_vertex] is the previous index of each vertex, for reordering the vertex attributes.
+    '''
+    if len(vertex_indices) == 0:
+        return vertex_indices.copy(), np.zeros(0, dtype=np.int64)
+    old_vertices, first_uses = np.unique(vertex_indices, return_index=True)
+    old_vertices = old_vertices[np.argsort(first_uses)]
+    old_to_new = np.zeros(old_vertices.max() + 1, dtype=np.int64)
+    old_to_new[old_vertices] = np.arange(len(old_vertices))
+    return old_to_new[vertex_indices].astype(vertex_indices.dtype), old_vertices.astype(np.int64)
+
+def get_vertex_cache_stats(vertex_indices: np.ndarray, cache_size: int = VERTEX_CACHE_SIZE) -> tuple[float, float]:
+    '''
+    Simulates a FIFO post transform vertex cache and returns (ACMR, ATVR).
+    ACMR is the average cache misses per triangle, with a best case of about 0.5 for large meshes.
+    ATVR is the average cache misses per vertex, with a best case of 1.0.
+    '''
+    triangle_count = len(vertex_indices) // 3
+    vertex_count = len(np.unique(vertex_indices))
+    if triangle_count == 0 or vertex_count == 0:
+        return 0.0, 0.0
+
+    cache: deque[int] = deque()
+    cached: set[int] = set()
+    misses = 0
+    for vertex in vertex_indices.tolist():
+        if vertex in cached:
+            continue
+        misses += 1
+        cache.append(vertex)
+        cached.add(vertex)
+        if len(cache) > cache_size:
+            cached.discard(cache.popleft())
+    return misses / triangle_count, misses / vertex_count
@@ -1 +1,2 @@
-from . import helper_bone_data
\ No newline at end of file
+from . import helper_bone_data
+from . import bone_order
\ No newline at end of file
@@ -0,0 +1,113 @@
+'''
+Bone ordering for .nusktb export, on plain (name, parent_name) tuples so it doesn't need blender.
+Everything here is linear in the bone count apart from sorting by depth, since large stage rigs can have thousands of bones.
+'''
+
+def is_helper_or_swing_bone(name: str) -> bool:
+    return name.startswith('H_') or name.startswith('S_')
+
+def get_parent_first_order(bones: list[tuple[str, str | None]]) -> list[tuple[str, str | None]]:
+    '''
+    Bones in armature order aren't guaranteed to appear after their parent.
+    Returns each root bone in armature order, followed by all its descendants sorted by depth and then by armature order.
+    This is the same order as appending each root's EditBone.children_recursive.
+    '''
+    name_to_parent = dict(bones)
+    depths: dict[str, int] = {}
+    roots: dict[str, str] = {}
+    for name, _ in bones:
+        # Walk up until a bone with a known depth, then fill in the depths on the way back down.
+        path = []
+        current = name
+        while current not in depths and name_to_parent[current] is not None:
+            path.append(current)
+            current = name_to_parent[current]
+        if current not in depths:
+            depths[current] = 0
+            roots[current] = current
+        for bone in reversed(path):
+            depths[bone] = depths[current] + 1
+            roots[bone] = roots[current]
+            current = bone
+
+    root_to_descendants: dict[str, list[str]] = {name: [] for name, parent in bones if parent is None}
+    for name, parent in bones:
+        if parent is not None:
+            root_to_descendants[roots[name]].append(name)
+
+    ordered: list[tuple[str, str | None]] = []
+    for root, descendants in root_to_descendants.items():
+        ordered.append((root, None))
+        # sort is stable, so bones at the same depth keep their armature order.
+        descendants.sort(key=depths.__getitem__)
+        ordered.extend((name, name_to_parent[name]) for name in descendants)
+    return ordered
+
+def get_vanilla_order(bones: list[tuple[str, str | None]], vanilla_bone_names: list[str]) -> tuple[list[tuple[str, str | None]], list[str]]:
+    '''
+    Orders bones like the vanilla skeleton, where bones is in parent first order.
+    Bones in the vanilla skeleton keep the vanilla order.
+    New helper and swing bones go at the end, and other new bones go right after their parent,
+    or after their closest non helper ancestor so they don't end up in the helper bone section at the end.
+    Returns (ordered_bones, names_not_in_vanilla).
+    '''
+    name_to_parent = dict(bones)
+
+    # A singly linked list, since bones are only ever inserted right after another bone or at the end.
+    head = None
+    tail = None
+    next_name: dict[str, str | None] = {}
+
+    def append(name: str):
+        nonlocal head, tail
+        next_name[name] = None
+        if tail is None:
+            head = name
+        else:
+            next_name[tail] = name
+        tail = name
+
+    def insert_after(previous: str, name: str):
+        nonlocal tail
+        next_name[name] = next_name[previous]
+        next_name[previous] = name
+        if tail == previous:
+            tail = name
+
+    for name in vanilla_bone_names:
+        if name in name_to_parent and name not in next_name:
+            append(name)
+
+    names_not_in_vanilla: list[str] = []
+    for name, parent in bones:
+        if name in next_name:
+            continue
+        names_not_in_vanilla.append(name)
+        if is_helper_or_swing_bone(name) or parent is None:
+            append(name)
+        elif parent.startswith('H_'):
+            ancestor = find_non_helper_ancestor(name, name_to_parent)
+            if ancestor is not None:
+                insert_after(ancestor, name)
+            else:
+                append(name)
+        else:
+            insert_after(parent, name)
+
+    ordered: list[tuple[str, str | None]] = []
+    current = head
+    while current is not None:
+        ordered.append((current, name_to_parent[current]))
+        current = next_name[current]
+    return ordered, names_not_in_vanilla
+
+def find_non_helper_ancestor(name: str, name_to_parent: dict[str, str | None]) -> str | None:
+    # The closest ancestor that isn't a helper bone, or None if every ancestor is a helper bone.
+    parent = name_to_parent[name]
+    while parent is not None and parent.startswith('H_'):
+        parent = name_to_parent[parent]
+    return parent
+
+def get_parent_indices(ordered_bones: list[tuple[str, str | None]]) -> list[int | None]:
+    name_to_index = {name: index for index, (name, _) in enumerate(ordered_bones)}
+    return [name_to_index[parent] if parent is not None else None for _, parent in ordered_bones]
@@ -1,10 +1,63 @@
+import os
 import re
-import requests
+import json
+import time
+import threading
+
+from pathlib import Path
 
 COMPATIBLE_UPDATE_AVAILABLE: bool = None
 LATEST_COMPATIBLE_VERSION: tuple[int,int,int] = None
 
-def check_for_newer_version():
+CACHE_FILE_NAME = 'smush_blender_version_check.json'
+# Set to a number of hours to change how often github is checked, where 0 checks on every startup and a negative number never checks.
+CHECK_INTERVAL_ENVIRONMENT_VARIABLE = 'SMUSH_BLENDER_VERSION_CHECK_HOURS'
+DEFAULT_CHECK_INTERVAL_HOURS = 24.0
+
+def get_cache_path() -> Path:
+    import bpy
+    return Path(bpy.utils.user_resource('CONFIG')) / CACHE_FILE_NAME
+
+def get_check_interval_seconds() -> float | None:
+    # Returns None if the version check is disabled.
+    try:
+        hours = float(os.environ.get(CHECK_INTERVAL_ENVIRONMENT_VARIABLE, DEFAULT_CHECK_INTERVAL_HOURS))
+    except ValueError:
+        hours = DEFAULT_CHECK_INTERVAL_HOURS
+    return hours * 3600.0 if hours >= 0.0 else None
+
+def read_cache(path: Path) -> dict | None:
+    try:
+        cache = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cache, dict) or not isinstance(cache.get('checked_at'), (int, float)) or not isinstance(cache.get('versions'), list):
+        return None
+    if not all(isinstance(v, list) and len(v) == 3 and all(isinstance(i, int) for i in v) for v in cache['versions']):
+        return None
+    return cache
+
+def write_cache(path: Path, versions: list[tuple[int,int,int]]):
+    # Write to a temporary file first, so another blender instance never reads half a file.
+    temp_path = path.with_name(path.name + '.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path.write_text(json.dumps({'checked_at': time.time(), 'versions': [list(v) for v in versions]}))
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Smash_ultimate_blender: Couldn't save the version check result to {path}. exception info=`{e}`")
+
+def get_versions_from_refs(refs: set[str]) -> list[tuple[int,int,int]]:
+    #example of "refs" {'refs/tags/v1.3.0', 'refs/tags/v1.3.1',...}
+    regex_pattern = r"^refs/tags/v(\d*)\.(\d*)\.(\d*)$"
+    versions = []
+    for ref in refs:
+        if match:= re.match(regex_pattern, ref or ''):
+            if groups:= match.groups():
+                versions.append((int(groups[0]), int(groups[1]), int(groups[2])))
+    return sorted(versions)
+
+def update_latest_compatible_version(versions: list[tuple[int,int,int]]):
     """
     The latest version should only check for a newer version compatible with the current blender version.
     By convention, the major version number will only be incremented with a breaking blender version change,
@@ -13,32 +66,55 @@ def check_for_newer_version():
     Many users won't be able to upgrade to a newer blender version right away, so don't notify them of an update they can't install yet.
     """
     from ...__init__ import bl_info
+    global COMPATIBLE_UPDATE_AVAILABLE
+    global LATEST_COMPATIBLE_VERSION
+
+    current_major, current_minor, current_patch = bl_info["version"][0], bl_info["version"][1], bl_info["version"][2]
+    current_minor_patch_version = (current_minor, current_patch)
+    for found_major, found_minor, found_patch in versions:
+        found_version = (found_major, found_minor, found_patch)
+        if found_major == current_major and current_minor_patch_version < (found_minor, found_patch):
+            COMPATIBLE_UPDATE_AVAILABLE = True
+            if LATEST_COMPATIBLE_VERSION is None or LATEST_COMPATIBLE_VERSION < found_version:
+                LATEST_COMPATIBLE_VERSION = found_version
 
+def fetch_versions_and_update_cache(cache_path: Path, cached_versions: list[tuple[int,int,int]]):
+    # Runs on a daemon thread, so a slow or missing connection never blocks blender.
     try:
-        response = requests.get("https://api.github.com/repos/ssbucarlos/smash-ultimate-blender/git/refs/tags", timeout=.5)
+        import requests
+        response = requests.get("https://api.github.com/repos/ssbucarlos/smash-ultimate-blender/git/refs/tags", timeout=10)
+        refs = {s.get("ref") for s in response.json()}
     except Exception as e:
         print(f"Smash_ultimate_blender: Couldn't check for newer version, please check your internet connection. exception info=`{e}`")
+        # Still record the attempt, so offline machines only try once per interval.
+        write_cache(cache_path, cached_versions)
         return
-    
-    #example of "refs" {'refs/tags/v1.3.0', 'refs/tags/v1.3.1',...}
-    refs = {s.get("ref") for s in response.json()}
-    regex_pattern = r"^refs/tags/v(\d*)\.(\d*)\.(\d*)$"
-    current_major, current_minor, current_patch = bl_info["version"][0], bl_info["version"][1], bl_info["version"][2]
-    current_minor_patch_version = (current_minor, current_patch)
 
-    for ref in refs:
-        if match:= re.match(regex_pattern, ref):
-            if groups:= match.groups():
-                found_major, found_minor, found_patch = int(groups[0]), int(groups[1]), int(groups[2])
-                found_version = (found_major, found_minor, found_patch)
-                found_minor_patch_version = (found_minor, found_patch)
-                if found_major == current_major:
-                    if current_minor_patch_version < found_minor_patch_version:
-                        global COMPATIBLE_UPDATE_AVAILABLE
-                        global LATEST_COMPATIBLE_VERSION
-                        COMPATIBLE_UPDATE_AVAILABLE = True
-                        if LATEST_COMPATIBLE_VERSION is None:
-                            LATEST_COMPATIBLE_VERSION = found_version
-                        elif LATEST_COMPATIBLE_VERSION < found_version:
-                            LATEST_COMPATIBLE_VERSION = found_version
-    
\ No newline at end of file
+    versions = get_versions_from_refs(refs)
+    write_cache(cache_path, versions)
+    update_latest_compatible_version(versions)
+
+def check_for_newer_version():
+    """
+    Reads the cached result of the last check, which never touches the network.
+    If the cached result is older than the check interval, github is checked again on a background thread.
+    The update panel polls the module globals, so it appears on the next redraw after the background check finishes.
+    """
+    try:
+        cache_path = get_cache_path()
+    except Exception as e:
+        print(f"Smash_ultimate_blender: Couldn't find the version check cache. exception info=`{e}`")
+        return
+
+    cache = read_cache(cache_path)
+    cached_versions = [tuple(v) for v in cache['versions']] if cache is not None else []
+    update_latest_compatible_version(cached_versions)
+
+    interval = get_check_interval_seconds()
+    if interval is None:
+        return
+    if cache is not None and 0.0 <= time.time() - cache['checked_at'] < interval:
+        return
+
+    thread = threading.Thread(target=fetch_versions_and_update_cache, args=(cache_path, cached_versions), name='smush_blender_version_check', daemon=True)
+    thread.start()
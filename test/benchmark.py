@@ -0,0 +1,355 @@
+"""
+Benchmarks the import and export hot paths on synthetic ssbh_data_py files of a configurable size.
+The bpy free stages like the mesh conversion core run under plain python:
+    python test/benchmark.py run --vertices 100000 --bones 500 --output baseline.json
+Running the same command in Blender also times creating and exporting the armature, meshes and animation:
+    blender -b --factory-startup --python test/benchmark.py -- run --output baseline.json
+Compare a new run against a saved baseline, which exits with 1 if any stage got slower than the threshold:
+    python test/benchmark.py compare baseline.json current.json --threshold 1.25
+"""
+
+import sys
+import json
+import math
+import time
+import types
+import argparse
+import platform
+import statistics
+import tempfile
+import importlib
+import importlib.util
+
+import numpy as np
+
+from pathlib import Path
+
+PACKAGE = 'smush_blender_benchmark'
+RESULTS_VERSION = 1
+# Stages faster than this are mostly noise, so they never count as regressions.
+NOISE_FLOOR_SECONDS = 0.005
+
+
+def load_package(use_blender: bool):
+    '''
+    Imports the add-on as PACKAGE from this repository.
+    Without blender, the parent packages are created empty so only bpy free modules like mesh.mesh_conversion can be imported.
+    '''
+    root = Path(__file__).parent.parent
+    if use_blender:
+        spec = importlib.util.spec_from_file_location(PACKAGE, root / '__init__.py', submodule_search_locations=[str(root)])
+        package = importlib.util.module_from_spec(spec)
+        sys.modules[PACKAGE] = package
+        spec.loader.exec_module(package)
+        package.register()
+        return
+
+    for name, path in [('', root), ('.source', root / 'source'), ('.source.model', root / 'source' / 'model'),
+                       ('.source.model.mesh', root / 'source' / 'model' / 'mesh'), ('.source.model.skel', root / 'source' / 'model' / 'skel')]:
+        module = types.ModuleType(PACKAGE + name)
+        module.__path__ = [str(path)]
+        sys.modules[PACKAGE + name] = module
+
+def import_module(name: str):
+    return importlib.import_module(f'{PACKAGE}.{name}')
+
+class BenchmarkOperator():
+    # Stands in for the operator the import and export functions report to.
+    def __init__(self):
+        self.messages: list[tuple[str, str]] = []
+
+    def report(self, type: set[str], message: str):
+        level = next(iter(type))
+        self.messages.append((level, message))
+        if level in ('WARNING', 'ERROR'):
+            print(f'{level}: {message}')
+
+
+def make_skel_data(ssbh_data_py, bone_count: int, rng: np.random.Generator):
+    skel = ssbh_data_py.skel_data.SkelData()
+    for i in range(bone_count):
+        # Every few bones is a helper bone, which affects the exported bone order.
+        name = 'Trans' if i == 0 else f'H_Bone{i:05}' if i % 7 == 0 else f'Bone{i:05}'
+        parent_index = None if i == 0 else int(rng.integers(0, i))
+        translation = rng.uniform(-1.0, 1.0, 3).tolist()
+        # ssbh_data_py matrices are stored by row with the translation in the last row.
+        transform = [[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0], translation + [1.0]]
+        skel.bones.append(ssbh_data_py.skel_data.BoneData(name, transform, parent_index))
+    return skel
+
+def make_grid(vertex_count: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Returns (positions, vertex_indices, uvs) for a wavy square grid with about vertex_count vertices.
+    size = max(2, math.isqrt(max(vertex_count, 4)))
+    u, v = np.meshgrid(np.linspace(0.0, 1.0, size), np.linspace(0.0, 1.0, size))
+    positions = np.stack([u.ravel() * 10.0, np.sin(u.ravel() * 6.0) * np.cos(v.ravel() * 6.0), v.ravel() * 10.0], axis=1)
+
+    corners = np.arange(size * size).reshape((size, size))[:-1, :-1].ravel()
+    a, b, c, d = corners, corners + 1, corners + size, corners + size + 1
+    vertex_indices = np.stack([a, c, b, b, c, d], axis=1).ravel().astype(np.uint32)
+    uvs = np.stack([u.ravel(), v.ravel()], axis=1)
+    return positions.astype(np.float32), vertex_indices, uvs.astype(np.float32)
+
+def make_mesh_data(ssbh_data_py, vertex_count: int, material_count: int, bone_names: list[str], rng: np.random.Generator):
+    mesh_data = ssbh_data_py.mesh_data.MeshData()
+    AttributeData = ssbh_data_py.mesh_data.AttributeData
+    for i in range(material_count):
+        positions, vertex_indices, uvs = make_grid(vertex_count // material_count)
+        count = len(positions)
+        normals = np.zeros((count, 4), dtype=np.float32)
+        normals[:, :3] = rng.normal(0.0, 0.1, (count, 3)) + [0.0, 1.0, 0.0]
+        normals[:, :3] /= np.linalg.norm(normals[:, :3], axis=1, keepdims=True)
+
+        mesh_object = ssbh_data_py.mesh_data.MeshObjectData(f'mesh{i}', 0)
+        mesh_object.vertex_indices = vertex_indices
+        mesh_object.positions = [AttributeData('Position0', positions)]
+        mesh_object.normals = [AttributeData('Normal0', normals)]
+        mesh_object.tangents = [AttributeData('Tangent0', np.tile(np.array([1.0, 0.0, 0.0, 1.0], dtype=np.float32), (count, 1)))]
+        mesh_object.texture_coordinates = [AttributeData('map1', uvs)]
+        mesh_object.color_sets = [AttributeData('colorSet1', rng.uniform(0.0, 1.0, (count, 4)).astype(np.float32))]
+
+        # Two influences per vertex, since most in game vertices have more than one.
+        influence_bones = rng.integers(0, len(bone_names), (count, 2))
+        influence_bones[:, 1] = (influence_bones[:, 0] + 1) % len(bone_names)
+        first_weights = rng.uniform(0.0, 1.0, count)
+        vertices = np.concatenate([np.arange(count), np.arange(count)])
+        bones = np.concatenate([influence_bones[:, 0], influence_bones[:, 1]])
+        weights = np.concatenate([first_weights, 1.0 - first_weights])
+        for bone in np.unique(bones).tolist():
+            selected = bones == bone
+            vertex_weights = list(map(ssbh_data_py.mesh_data.VertexWeight, vertices[selected].tolist(), weights[selected].tolist()))
+            mesh_object.bone_influences.append(ssbh_data_py.mesh_data.BoneInfluence(bone_names[bone], vertex_weights))
+        mesh_data.objects.append(mesh_object)
+    return mesh_data
+
+def make_matl_data(ssbh_data_py, material_count: int):
+    matl_data = ssbh_data_py.matl_data.MatlData()
+    ParamId = ssbh_data_py.matl_data.ParamId
+    for i in range(material_count):
+        entry = ssbh_data_py.matl_data.MatlEntryData(f'material{i}', 'SFX_PBS_0100000008008269_opaque')
+        entry.vectors = [ssbh_data_py.matl_data.Vector4Param(ParamId.CustomVector0, [1.0, 0.0, 0.0, 0.0])]
+        entry.floats = [ssbh_data_py.matl_data.FloatParam(ParamId.CustomFloat8, 0.5)]
+        entry.textures = [ssbh_data_py.matl_data.TextureParam(ParamId.Texture0, f'def_texture{i}_col')]
+        matl_data.entries.append(entry)
+    return matl_data
+
+def make_modl_data(ssbh_data_py, material_count: int):
+    modl_data = ssbh_data_py.modl_data.ModlData()
+    modl_data.model_name = 'model'
+    modl_data.skeleton_file_name = 'model.nusktb'
+    modl_data.material_file_names = ['model.numatb']
+    modl_data.mesh_file_name = 'model.numshb'
+    modl_data.entries = [ssbh_data_py.modl_data.ModlEntryData(f'mesh{i}', 0, f'material{i}') for i in range(material_count)]
+    return modl_data
+
+def make_anim_data(ssbh_data_py, bone_names: list[str], frame_count: int, track_count: int, rng: np.random.Generator):
+    anim_data = ssbh_data_py.anim_data.AnimData()
+    anim_data.final_frame_index = float(frame_count - 1)
+    Transform = ssbh_data_py.anim_data.Transform
+    nodes = []
+    for name in bone_names[:track_count]:
+        angles = np.linspace(0.0, rng.uniform(0.5, 3.0), frame_count)
+        translation = rng.uniform(-1.0, 1.0, 3).tolist()
+        values = [Transform([1.0, 1.0, 1.0], [math.sin(a / 2.0), 0.0, 0.0, math.cos(a / 2.0)], translation) for a in angles.tolist()]
+        track = ssbh_data_py.anim_data.TrackData('Transform', values=values)
+        nodes.append(ssbh_data_py.anim_data.NodeData(name, [track]))
+    anim_data.groups = [ssbh_data_py.anim_data.GroupData(ssbh_data_py.anim_data.GroupType.Transform, nodes)]
+    return anim_data
+
+
+class Timer():
+    def __init__(self):
+        self.stage_to_times: dict[str, list[float]] = {}
+
+    def time(self, stage: str, function, *args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        self.stage_to_times.setdefault(stage, []).append(time.perf_counter() - start)
+        return result
+
+def run_file_stages(timer: Timer, ssbh_data_py, folder: Path, files: dict[str, object]):
+    # Saving and reading go through ssbh_data_py, which the import and export both pay for.
+    readers = {
+        'model.numshb': ssbh_data_py.mesh_data.read_mesh,
+        'model.nusktb': ssbh_data_py.skel_data.read_skel,
+        'model.numatb': ssbh_data_py.matl_data.read_matl,
+        'model.numdlb': ssbh_data_py.modl_data.read_modl,
+        'model.nuanmb': ssbh_data_py.anim_data.read_anim,
+    }
+    for file_name, data in files.items():
+        path = str(folder / file_name)
+        extension = file_name.split('.')[-1]
+        timer.time(f'ssbh.save_{extension}', data.save, path)
+        timer.time(f'ssbh.read_{extension}', readers[file_name], path)
+
+def run_core_stages(timer: Timer, mesh_data, skel_data):
+    mesh_conversion = import_module('source.model.mesh.mesh_conversion')
+    mesh_ex = import_module('source.model.mesh.mesh_ex')
+    bone_order = import_module('source.model.skel.bone_order')
+
+    corner_meshes = timer.time('core.corner_mesh_from_ssbh', lambda: [mesh_conversion.corner_mesh_from_ssbh_mesh_object(o) for o in mesh_data.objects])
+
+    def convert(corner_meshes, optimize_vertex_cache=False):
+        arrays = []
+        for i, corner_mesh in enumerate(corner_meshes):
+            corners = mesh_conversion.get_material_corners(corner_mesh, 0)
+            arrays.append(mesh_conversion.convert_corner_mesh(corner_mesh, corners, f'mesh{i}', 0, optimize_vertex_cache))
+        return arrays
+
+    mesh_object_arrays = timer.time('core.convert_mesh', convert, corner_meshes)
+    timer.time('core.convert_mesh_vectorized_tangents', convert, [m._replace(corner_tangents=None, corner_bitangent_signs=None) for m in corner_meshes])
+    timer.time('core.convert_mesh_vertex_cache', convert, corner_meshes, True)
+
+    names = [mesh_object.name for mesh_object in mesh_data.objects]
+    timer.time('core.meshex_bounding_spheres', mesh_ex.get_group_bounding_spheres, names, [arrays.positions for arrays in mesh_object_arrays])
+    timer.time('core.adjb_vertex_adjacency', mesh_ex.calculate_vertex_adjacencies, [(arrays.vertex_indices, arrays.positions) for arrays in mesh_object_arrays])
+
+    names = [bone.name for bone in skel_data.bones]
+    bones = [(bone.name, names[bone.parent_index] if bone.parent_index is not None else None) for bone in skel_data.bones]
+    # Reversing the names puts most children before their parents, which is the slow case for ordering.
+    ordered = timer.time('core.bone_parent_first_order', bone_order.get_parent_first_order, bones[::-1])
+    timer.time('core.bone_vanilla_order', bone_order.get_vanilla_order, ordered, names[:len(names) // 2])
+
+def run_blender_stages(timer: Timer, ssbh_data_py, folder: Path, mesh_data, skel_data):
+    import bpy
+    import_model = import_module('source.model.import_model')
+    export_model = import_module('source.model.export_model')
+    import_anim = import_module('source.anim.import_anim')
+    export_anim = import_module('source.anim.export_anim')
+
+    bpy.ops.wm.read_homefile(use_empty=True)
+    context = bpy.context
+    operator = BenchmarkOperator()
+
+    arma = timer.time('blender.import_skel', import_model.create_armature, operator, skel_data, context)
+
+    def import_meshes():
+        for mesh_object in mesh_data.objects:
+            blender_mesh = import_model.create_blender_mesh(mesh_object, skel_data, {})
+            obj = bpy.data.objects.new(blender_mesh.name, blender_mesh)
+            context.collection.objects.link(obj)
+            import_model.attach_armature_create_vertex_groups(obj, skel_data, arma, mesh_object)
+    timer.time('blender.import_mesh', import_meshes)
+
+    context.view_layer.objects.active = arma
+    timer.time('blender.import_anim', import_anim.import_model_anim, context, str(folder / 'model.nuanmb'), True, False, False, 1)
+
+    ssp = context.scene.sub_scene_properties
+    ssp.model_export_arma = arma
+    timer.time('blender.export_skel', export_model.make_skel, operator, context, 'NO_LINK')
+
+    def export_meshes():
+        arma.data.pose_position = 'REST'
+        unprocessed_meshes = export_model.get_unprocessed_meshes(arma, 'NONE')
+        group_name_to_unprocessed_meshes = {export_model.trim_name(mesh.name): {mesh} for mesh in unprocessed_meshes}
+        processed, new_shape_key_meshes = export_model.get_processed_meshes(operator, context, group_name_to_unprocessed_meshes, 'APPLY', 'IGNORE_SHAPEKEYS', 'REST')
+        try:
+            export_model.make_ssbh_mesh_data(operator, context, processed)
+        finally:
+            for unprocessed_meshes_to_export_meshes in processed.values():
+                temp_meshes = {e.mesh_data for export_meshes in unprocessed_meshes_to_export_meshes.values() for e in export_meshes}
+                for temp_mesh in temp_meshes:
+                    bpy.data.meshes.remove(temp_mesh)
+    timer.time('blender.export_mesh', export_meshes)
+
+    scene = context.scene
+    anim_path = str(folder / 'export.nuanmb')
+    timer.time('blender.export_anim', export_anim.export_model_anim_fast, context, operator, arma, anim_path, True, False, False, scene.frame_start, scene.frame_end)
+
+def run(args):
+    try:
+        import bpy
+        use_blender = True
+    except ImportError:
+        use_blender = False
+    load_package(use_blender)
+    ssbh_data_py = import_module('dependencies.ssbh_data_py')
+
+    rng = np.random.default_rng(args.seed)
+    skel_data = make_skel_data(ssbh_data_py, args.bones, rng)
+    bone_names = [bone.name for bone in skel_data.bones]
+    mesh_data = make_mesh_data(ssbh_data_py, args.vertices, args.materials, bone_names, rng)
+    anim_data = make_anim_data(ssbh_data_py, bone_names, args.frames, args.tracks, rng)
+    files = {
+        'model.numshb': mesh_data,
+        'model.nusktb': skel_data,
+        'model.numatb': make_matl_data(ssbh_data_py, args.materials),
+        'model.numdlb': make_modl_data(ssbh_data_py, args.materials),
+        'model.nuanmb': anim_data,
+    }
+
+    timer = Timer()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        folder = Path(temp_dir)
+        for _ in range(args.repeat):
+            run_file_stages(timer, ssbh_data_py, folder, files)
+            run_core_stages(timer, mesh_data, skel_data)
+            if use_blender:
+                run_blender_stages(timer, ssbh_data_py, folder, mesh_data, skel_data)
+
+    results = {
+        'version': RESULTS_VERSION,
+        'sizes': {'vertices': args.vertices, 'bones': args.bones, 'frames': args.frames, 'materials': args.materials, 'tracks': args.tracks},
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__, 'blender': bpy.app.version_string if use_blender else None},
+        'stages': {
+            stage: {'median': statistics.median(times), 'min': min(times), 'runs': len(times)}
+            for stage, times in timer.stage_to_times.items()
+        },
+    }
+    for stage, result in results['stages'].items():
+        print(f'{stage:<45} {result["median"]:>10.4f} s')
+    if args.output is not None:
+        Path(args.output).write_text(json.dumps(results, indent=4))
+        print(f'Saved results to {args.output}')
+
+def compare(args) -> int:
+    baseline = json.loads(Path(args.baseline).read_text())
+    current = json.loads(Path(args.current).read_text())
+    if baseline.get('sizes') != current.get('sizes'):
+        print(f'Warning: the runs used different sizes {baseline.get("sizes")} and {current.get("sizes")}.')
+
+    regressions = []
+    for stage, result in current['stages'].items():
+        baseline_result = baseline['stages'].get(stage)
+        if baseline_result is None:
+            print(f'{stage:<45} {"new":>10} {result["median"]:>10.4f} s')
+            continue
+        ratio = result['median'] / max(baseline_result['median'], 1e-9)
+        slower = ratio > args.threshold and result['median'] > NOISE_FLOOR_SECONDS
+        if slower:
+            regressions.append(stage)
+        print(f'{stage:<45} {baseline_result["median"]:>10.4f} s {result["median"]:>10.4f} s {ratio:>6.2f}x{"  SLOWER" if slower else ""}')
+
+    if len(regressions) > 0:
+        print(f'{len(regressions)} stages are more than {args.threshold}x slower than the baseline: {", ".join(regressions)}')
+        return 1
+    return 0
+
+def main():
+    # Blender passes the script's own arguments after '--'.
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description='Benchmark the import and export hot paths on synthetic data.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Time every stage and optionally save the results as JSON.')
+    run_parser.add_argument('--vertices', type=int, default=50000, help='Total vertices across every mesh object.')
+    run_parser.add_argument('--bones', type=int, default=300)
+    run_parser.add_argument('--frames', type=int, default=60)
+    run_parser.add_argument('--materials', type=int, default=4, help='Mesh objects, each with its own material.')
+    run_parser.add_argument('--tracks', type=int, default=100, help='Animated bones.')
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--output', help='Path for the JSON results, like a baseline to compare against later.')
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two saved results and exit with 1 if any stage regressed.')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=1.25, help='The slowdown ratio counted as a regression.')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+if __name__ == '__main__':
+    main()
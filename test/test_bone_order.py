@@ -0,0 +1,288 @@
+"""
+Checks that source/model/skel/bone_order.py orders bones exactly like the list based ordering it replaced.
+bone_order doesn't need blender, so this runs with plain python:
+    python test/test_bone_order.py
+test/fixtures/model.nusktb is VANILLA_FIGHTER_BONES saved with ssbh_data_py, so the skeleton reading is checked without game files.
+Set SMUSH_BLENDER_VANILLA_SKELETONS to a folder of dumped fighter models to also check every model.nusktb in it.
+"""
+
+import os
+import random
+import unittest
+import importlib.util
+
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+VANILLA_SKELETONS_ENVIRONMENT_VARIABLE = 'SMUSH_BLENDER_VANILLA_SKELETONS'
+FIXTURE_SKELETON = ROOT / 'test' / 'fixtures' / 'model.nusktb'
+
+
+def load_bone_order():
+    # bone_order has no imports, so it can be loaded without the add-on package or bpy.
+    spec = importlib.util.spec_from_file_location('bone_order', ROOT / 'source' / 'model' / 'skel' / 'bone_order.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+bone_order = load_bone_order()
+
+# The layout of a vanilla fighter model.nusktb in file order: body bones first, then the helper and swing bones.
+VANILLA_FIGHTER_BONES: list[tuple[str, str | None]] = [
+    ('Trans', None), ('Rot', 'Trans'), ('Throw', 'Trans'), ('Hip', 'Rot'),
+    ('LegL', 'Hip'), ('KneeL', 'LegL'), ('FootL', 'KneeL'), ('ToeL', 'FootL'),
+    ('LegR', 'Hip'), ('KneeR', 'LegR'), ('FootR', 'KneeR'), ('ToeR', 'FootR'),
+    ('Waist', 'Hip'), ('Bust', 'Waist'),
+    ('ClavicleL', 'Bust'), ('ShoulderL', 'ClavicleL'), ('ArmL', 'ShoulderL'), ('HandL', 'ArmL'),
+    ('FingerL10', 'HandL'), ('FingerL11', 'FingerL10'), ('FingerL12', 'FingerL11'),
+    ('FingerL20', 'HandL'), ('FingerL21', 'FingerL20'), ('FingerL22', 'FingerL21'),
+    ('ClavicleR', 'Bust'), ('ShoulderR', 'ClavicleR'), ('ArmR', 'ShoulderR'), ('HandR', 'ArmR'),
+    ('FingerR10', 'HandR'), ('FingerR11', 'FingerR10'), ('FingerR12', 'FingerR11'),
+    ('FingerR20', 'HandR'), ('FingerR21', 'FingerR20'), ('FingerR22', 'FingerR21'),
+    ('Neck', 'Bust'), ('Head', 'Neck'), ('Mouth', 'Head'), ('EyeL', 'Head'), ('EyeR', 'Head'),
+    ('HaveL', 'HandL'), ('HaveR', 'HandR'),
+    ('H_ShoulderL', 'ClavicleL'), ('H_ElbowL', 'ShoulderL'), ('H_WristL', 'ArmL'),
+    ('H_ShoulderR', 'ClavicleR'), ('H_ElbowR', 'ShoulderR'), ('H_WristR', 'ArmR'),
+    ('H_LegL', 'Hip'), ('H_KneeL', 'LegL'), ('H_LegR', 'Hip'), ('H_KneeR', 'LegR'),
+    ('H_Waist', 'Waist'), ('H_Neck', 'Bust'),
+    ('S_Hair1', 'Head'), ('S_Hair2', 'S_Hair1'), ('S_Hair3', 'S_Hair2'),
+    ('S_CapeL1', 'Bust'), ('S_CapeL2', 'S_CapeL1'), ('S_CapeR1', 'Bust'), ('S_CapeR2', 'S_CapeR1'),
+]
+
+
+class EditBone():
+    # Stands in for bpy.types.EditBone, with children_recursive implemented like blender's bpy_types.py.
+    def __init__(self, name: str, armature_bones: list['EditBone']):
+        self.name = name
+        self.parent: EditBone | None = None
+        self.armature_bones = armature_bones
+
+    def parent_index(self, parent_test: 'EditBone') -> int:
+        parent = self.parent
+        index = 1
+        while parent is not None:
+            if parent is parent_test:
+                return index
+            parent = parent.parent
+            index += 1
+        return 0
+
+    @property
+    def children_recursive(self) -> list['EditBone']:
+        bones_children = []
+        for bone in self.armature_bones:
+            index = bone.parent_index(self)
+            if index:
+                bones_children.append((index, bone))
+        bones_children.sort(key=lambda bone_pair: bone_pair[0])
+        return [bone for _, bone in bones_children]
+
+def make_edit_bones(bones: list[tuple[str, str | None]]) -> list[EditBone]:
+    edit_bones: list[EditBone] = []
+    name_to_bone = {name: EditBone(name, edit_bones) for name, _ in bones}
+    for name, parent in bones:
+        name_to_bone[name].parent = name_to_bone[parent] if parent is not None else None
+        edit_bones.append(name_to_bone[name])
+    return edit_bones
+
+def to_tuples(edit_bones: list[EditBone]) -> list[tuple[str, str | None]]:
+    return [(bone.name, bone.parent.name if bone.parent else None) for bone in edit_bones]
+
+# The previous list based ordering from export_model.py, kept here as the reference.
+def old_get_parent_first_ordered_bones(edit_bones: list[EditBone]) -> list[EditBone]:
+    parent_first_ordered_bones: list[EditBone] = []
+    for bone in edit_bones:
+        if not bone.parent:
+            parent_first_ordered_bones.append(bone)
+            parent_first_ordered_bones.extend(child for child in bone.children_recursive)
+    return parent_first_ordered_bones
+
+def old_find_non_helper_ancestor_index(bone: EditBone, bones: list[EditBone]) -> int:
+    if bone.parent is None:
+        return None
+    if bone.parent.name.startswith('H_'):
+        return old_find_non_helper_ancestor_index(bone.parent, bones)
+    return bones.index(bone.parent)
+
+def old_vanilla_order(parent_first_ordered_bones: list[EditBone], vanilla_bone_names: list[str]) -> tuple[list[EditBone], list[EditBone]]:
+    name_to_bone = {bone.name: bone for bone in parent_first_ordered_bones}
+    new_bones: list[EditBone] = []
+    for vanilla_bone_name in vanilla_bone_names:
+        blender_bone = name_to_bone.get(vanilla_bone_name)
+        if blender_bone:
+            new_bones.append(blender_bone)
+
+    bones_not_in_vanilla: list[EditBone] = []
+    for blender_bone in parent_first_ordered_bones:
+        if blender_bone not in new_bones:
+            bones_not_in_vanilla.append(blender_bone)
+            if blender_bone.name.startswith('H_') or blender_bone.name.startswith('S_'):
+                new_bones.append(blender_bone)
+                continue
+            if blender_bone.parent:
+                if blender_bone.parent.name.startswith('H_'):
+                    non_helper_ancestor_index = old_find_non_helper_ancestor_index(blender_bone, new_bones)
+                    if non_helper_ancestor_index is not None:
+                        new_bones.insert(non_helper_ancestor_index + 1, blender_bone)
+                    else:
+                        new_bones.append(blender_bone)
+                else:
+                    parent_index = new_bones.index(blender_bone.parent)
+                    new_bones.insert(parent_index + 1, blender_bone)
+            else:
+                new_bones.append(blender_bone)
+    return new_bones, bones_not_in_vanilla
+
+def old_parent_indices(new_bones: list[EditBone]) -> list[int | None]:
+    return [new_bones.index(bone.parent) if bone.parent else None for bone in new_bones]
+
+def make_random_bones(rng: random.Random, count: int) -> list[tuple[str, str | None]]:
+    # Random trees in a shuffled armature order, with some helper, swing and extra root bones.
+    names: list[str] = []
+    bones: list[tuple[str, str | None]] = []
+    for index in range(count):
+        name = rng.choice(['', '', 'H_', 'S_']) + f'Bone{index}'
+        parent = rng.choice(names) if names and rng.random() > 0.05 else None
+        names.append(name)
+        bones.append((name, parent))
+    rng.shuffle(bones)
+    return bones
+
+def load_ssbh_data_py():
+    # Only the binary for the current platform is needed, so load it directly instead of through the add-on package.
+    import sys
+    sys.path.insert(0, str(ROOT / 'dependencies' / 'ssbh_data_py' / ('win' if sys.platform.startswith('win') else 'linux')))
+    try:
+        import ssbh_data_py
+    except ImportError:
+        return None
+    return ssbh_data_py
+
+def read_skeleton(ssbh_data_py, path: Path) -> list[tuple[str, str | None]]:
+    skel = ssbh_data_py.skel_data.read_skel(str(path))
+    return [(bone.name, skel.bones[bone.parent_index].name if bone.parent_index is not None else None) for bone in skel.bones]
+
+def read_vanilla_skeletons() -> list[tuple[Path, list[tuple[str, str | None]]]]:
+    folder = os.environ.get(VANILLA_SKELETONS_ENVIRONMENT_VARIABLE)
+    if not folder:
+        return []
+    ssbh_data_py = load_ssbh_data_py()
+    return [(path, read_skeleton(ssbh_data_py, path)) for path in sorted(Path(folder).rglob('model.nusktb'))]
+
+class TestBoneOrder(unittest.TestCase):
+    def assert_same_as_old(self, armature_bones: list[tuple[str, str | None]], vanilla_bone_names: list[str]):
+        edit_bones = make_edit_bones(armature_bones)
+        old_parent_first = old_get_parent_first_ordered_bones(edit_bones)
+        parent_first = bone_order.get_parent_first_order(armature_bones)
+        self.assertEqual(parent_first, to_tuples(old_parent_first))
+        self.assertEqual(bone_order.get_parent_indices(parent_first), old_parent_indices(old_parent_first))
+
+        old_new_bones, old_bones_not_in_vanilla = old_vanilla_order(old_parent_first, vanilla_bone_names)
+        ordered_bones, names_not_in_vanilla = bone_order.get_vanilla_order(parent_first, vanilla_bone_names)
+        self.assertEqual(ordered_bones, to_tuples(old_new_bones))
+        self.assertEqual(names_not_in_vanilla, [bone.name for bone in old_bones_not_in_vanilla])
+        self.assertEqual(bone_order.get_parent_indices(ordered_bones), old_parent_indices(old_new_bones))
+        return ordered_bones, names_not_in_vanilla
+
+    def test_vanilla_skeleton_keeps_vanilla_order(self):
+        vanilla_names = [name for name, _ in VANILLA_FIGHTER_BONES]
+        ordered_bones, names_not_in_vanilla = self.assert_same_as_old(VANILLA_FIGHTER_BONES, vanilla_names)
+        self.assertEqual(ordered_bones, VANILLA_FIGHTER_BONES)
+        self.assertEqual(names_not_in_vanilla, [])
+
+    def test_shuffled_armature_order(self):
+        vanilla_names = [name for name, _ in VANILLA_FIGHTER_BONES]
+        rng = random.Random(0)
+        for _ in range(20):
+            bones = list(VANILLA_FIGHTER_BONES)
+            rng.shuffle(bones)
+            ordered_bones, _ = self.assert_same_as_old(bones, vanilla_names)
+            self.assertEqual(ordered_bones, VANILLA_FIGHTER_BONES)
+
+    def test_missing_vanilla_bones(self):
+        vanilla_names = [name for name, _ in VANILLA_FIGHTER_BONES]
+        removed = {'FingerL20', 'FingerL21', 'FingerL22', 'S_CapeR1', 'S_CapeR2', 'H_Neck'}
+        bones = [bone for bone in VANILLA_FIGHTER_BONES if bone[0] not in removed]
+        ordered_bones, _ = self.assert_same_as_old(bones, vanilla_names)
+        self.assertEqual(ordered_bones, bones)
+
+    def test_new_bones_under_helper_bones(self):
+        vanilla_names = [name for name, _ in VANILLA_FIGHTER_BONES]
+        bones = VANILLA_FIGHTER_BONES + [('SleeveL', 'H_WristL'), ('SleeveL2', 'SleeveL'), ('KneePad', 'H_KneeR')]
+        ordered_bones, names_not_in_vanilla = self.assert_same_as_old(bones, vanilla_names)
+        # New bones under helper bones go right after the closest non helper ancestor, not into the helper section.
+        names = [name for name, _ in ordered_bones]
+        self.assertEqual(names[names.index('ArmL') + 1], 'SleeveL')
+        self.assertEqual(names[names.index('LegR') + 1], 'KneePad')
+        # New bones are placed in parent first order, which sorts each root's descendants by depth.
+        self.assertEqual(names_not_in_vanilla, ['KneePad', 'SleeveL', 'SleeveL2'])
+
+    def test_new_helper_and_swing_bones(self):
+        vanilla_names = [name for name, _ in VANILLA_FIGHTER_BONES]
+        bones = VANILLA_FIGHTER_BONES + [('H_Extra', 'Head'), ('S_Tail1', 'Hip'), ('S_Tail2', 'S_Tail1'), ('Sword', 'HaveR')]
+        ordered_bones, _ = self.assert_same_as_old(bones, vanilla_names)
+        names = [name for name, _ in ordered_bones]
+        self.assertEqual(names[-3:], ['S_Tail1', 'S_Tail2', 'H_Extra'])
+        self.assertEqual(names[names.index('HaveR') + 1], 'Sword')
+
+    def test_only_helper_ancestors(self):
+        vanilla_names = [name for name, _ in VANILLA_FIGHTER_BONES]
+        bones = VANILLA_FIGHTER_BONES + [('H_Root', None), ('H_Inner', 'H_Root'), ('Prop', 'H_Inner'), ('Extra', None)]
+        ordered_bones, _ = self.assert_same_as_old(bones, vanilla_names)
+        name_to_parent = dict(bones)
+        self.assertIsNone(bone_order.find_non_helper_ancestor('Prop', name_to_parent))
+        self.assertEqual(bone_order.find_non_helper_ancestor('SleeveL', {**name_to_parent, 'SleeveL': 'H_WristL'}), 'ArmL')
+        # With no non helper ancestor, the bone is appended after its helper parents.
+        self.assertEqual([name for name, _ in ordered_bones][-4:], ['H_Root', 'H_Inner', 'Prop', 'Extra'])
+
+    def test_find_non_helper_ancestor(self):
+        rng = random.Random(1)
+        for _ in range(50):
+            bones = bone_order.get_parent_first_order(make_random_bones(rng, 60))
+            name_to_parent = dict(bones)
+            edit_bones = make_edit_bones(bones)
+            for edit_bone in edit_bones:
+                old_index = old_find_non_helper_ancestor_index(edit_bone, edit_bones)
+                ancestor = bone_order.find_non_helper_ancestor(edit_bone.name, name_to_parent)
+                self.assertEqual(ancestor, edit_bones[old_index].name if old_index is not None else None)
+
+    def test_random_rigs(self):
+        rng = random.Random(2)
+        for _ in range(200):
+            bones = make_random_bones(rng, rng.randint(1, 80))
+            names = [name for name, _ in bones]
+            vanilla_names = rng.sample(names, rng.randint(0, len(names)))
+            # Vanilla skeletons are in parent first order, so keep the sampled names in that order.
+            parent_first_names = [name for name, _ in bone_order.get_parent_first_order(bones)]
+            vanilla_names.sort(key=parent_first_names.index)
+            self.assert_same_as_old(bones, vanilla_names + ['NotInArmature'])
+
+    def assert_keeps_vanilla_order(self, vanilla_bones: list[tuple[str, str | None]], rng: random.Random):
+        vanilla_names = [name for name, _ in vanilla_bones]
+        ordered_bones, _ = self.assert_same_as_old(vanilla_bones, vanilla_names)
+        self.assertEqual(ordered_bones, vanilla_bones)
+        # The same skeleton with new bones added under random bones, in a shuffled armature order.
+        new_bones = [(f'{rng.choice(["", "H_", "S_"])}New{i}', rng.choice(vanilla_names)) for i in range(20)]
+        bones = vanilla_bones + new_bones
+        rng.shuffle(bones)
+        self.assert_same_as_old(bones, vanilla_names)
+
+    def test_fixture_skeleton(self):
+        ssbh_data_py = load_ssbh_data_py()
+        if ssbh_data_py is None:
+            self.skipTest('ssbh_data_py has no binary for this platform.')
+        vanilla_bones = read_skeleton(ssbh_data_py, FIXTURE_SKELETON)
+        self.assertEqual(vanilla_bones, VANILLA_FIGHTER_BONES)
+        self.assert_keeps_vanilla_order(vanilla_bones, random.Random(4))
+
+    def test_real_vanilla_skeletons(self):
+        skeletons = read_vanilla_skeletons()
+        if len(skeletons) == 0:
+            self.skipTest(f'Set {VANILLA_SKELETONS_ENVIRONMENT_VARIABLE} to a folder with vanilla model.nusktb files.')
+        rng = random.Random(3)
+        for path, vanilla_bones in skeletons:
+            with self.subTest(path=str(path)):
+                self.assert_keeps_vanilla_order(vanilla_bones, rng)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Compares sample_fcurve against blender's fcurve.evaluate() on every frame.
+    python -m pytest test/test_fcurve_index.py
+"""
+
+import importlib.util
+
+from pathlib import Path
+
+import pytest
+import numpy as np
+
+bpy = pytest.importorskip('bpy')
+
+
+@pytest.fixture(scope='module')
+def fcurve_index():
+    path = Path(__file__).parent.parent / 'source' / 'anim' / 'fcurve_index.py'
+    spec = importlib.util.spec_from_file_location('smush_blender_fcurve_index', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def make_fcurve(name: str, keys: list[tuple[float, float, str]], handle_type: str='AUTO_CLAMPED') -> bpy.types.FCurve:
+    action = bpy.data.actions.new(name)
+    fcurve = action.fcurves.new('location', index=0)
+    for frame, value, interpolation in keys:
+        keyframe = fcurve.keyframe_points.insert(frame, value)
+        keyframe.interpolation = interpolation
+        keyframe.handle_left_type = handle_type
+        keyframe.handle_right_type = handle_type
+    fcurve.update()
+    return fcurve
+
+def expected_values(fcurve: bpy.types.FCurve, first_frame: int, last_frame: int) -> np.ndarray:
+    return np.array([fcurve.evaluate(frame) for frame in range(first_frame, last_frame + 1)])
+
+@pytest.mark.parametrize('handle_type', ['AUTO_CLAMPED', 'AUTO', 'VECTOR'])
+@pytest.mark.parametrize('extrapolation', ['CONSTANT', 'LINEAR'])
+def test_matches_evaluate(fcurve_index, handle_type, extrapolation):
+    rng = np.random.default_rng(0)
+    interpolations = ['BEZIER', 'LINEAR', 'CONSTANT', 'SINE']
+    frames = np.cumsum(rng.integers(1, 12, size=40)).astype(np.float64) + rng.random(40) * 0.5
+    keys = [(frame, rng.normal() * 10.0, interpolations[rng.integers(0, len(interpolations))]) for frame in frames]
+    fcurve = make_fcurve(f'{handle_type}_{extrapolation}', keys, handle_type)
+    fcurve.extrapolation = extrapolation
+
+    first_frame, last_frame = -5, int(frames[-1]) + 5
+    actual = fcurve_index.sample_fcurve(fcurve, first_frame, last_frame)
+    assert np.allclose(actual, expected_values(fcurve, first_frame, last_frame), rtol=0.0, atol=1e-4)
+
+def test_overlapping_free_handles(fcurve_index):
+    # Handles longer than their segment are shortened by blender before evaluating.
+    fcurve = make_fcurve('free_handles', [(1.0, 0.0, 'BEZIER'), (5.0, 3.0, 'BEZIER'), (20.0, -2.0, 'BEZIER')], 'FREE')
+    fcurve.keyframe_points[0].handle_right = (8.0, 6.0)
+    fcurve.keyframe_points[1].handle_left = (-1.0, 1.0)
+    fcurve.keyframe_points[1].handle_right = (6.0, 4.0)
+    fcurve.keyframe_points[2].handle_left = (19.0, -8.0)
+
+    actual = fcurve_index.sample_fcurve(fcurve, 0, 21)
+    assert np.allclose(actual, expected_values(fcurve, 0, 21), rtol=0.0, atol=1e-4)
+
+def test_other_bone_fcurves(fcurve_index):
+    action = bpy.data.actions.new('other_bone_fcurves')
+    location = action.fcurves.new('pose.bones["Hip"].location', index=1)
+    custom_property = action.fcurves.new('pose.bones["Hip"]["stretch"]')
+    constraint = action.fcurves.new('pose.bones["Hip"].constraints["IK"].influence')
+    index = fcurve_index.FCurveIndex(action)
+
+    assert [item[:3] for item in index.get_bone_transform_items()] == [('Hip', 'location', 1)]
+    # These aren't exported, but they are still removed along with their bone.
+    assert set(index.get_other_bone_fcurves()) == {custom_property, constraint}
+    assert set(index.get_bone_fcurves('Hip')) == {location, custom_property, constraint}
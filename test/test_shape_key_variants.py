@@ -0,0 +1,150 @@
+"""
+Compares "_VIS" shape keys split from the processed base mesh against the object copies of split_mesh_shape_keys_to_new_meshes.
+    python -m pytest test/test_shape_key_variants.py
+"""
+
+import sys
+import importlib
+import importlib.util
+
+from pathlib import Path
+
+import pytest
+import numpy as np
+
+bpy = pytest.importorskip('bpy')
+import bmesh
+
+PACKAGE = 'smush_blender_shape_key_variants'
+UV_NAME = 'map1'
+SHAPE_KEY_NAME = 'Blink_VIS'
+# The largest allowed angle between normals or tangents in degrees.
+TOLERANCE_DEGREES = 0.5
+
+
+class Operator:
+    def __init__(self):
+        self.reports = []
+
+    def report(self, level, message):
+        self.reports.append((level, message))
+
+@pytest.fixture(scope='module')
+def package():
+    root = Path(__file__).parent.parent
+    spec = importlib.util.spec_from_file_location(PACKAGE, root / '__init__.py', submodule_search_locations=[str(root)])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE] = package
+    spec.loader.exec_module(package)
+    package.register()
+    yield package
+    package.unregister()
+
+def make_object(name: str, flat, custom_normals: bool) -> bpy.types.Object:
+    bm = bmesh.new()
+    bm.loops.layers.uv.new(UV_NAME)
+    bmesh.ops.create_uvsphere(bm, u_segments=24, v_segments=12, radius=1.0, calc_uvs=True)
+    for face in bm.faces:
+        face.smooth = not flat(face)
+        # Split the sphere into two materials at the equator.
+        face.material_index = 1 if face.calc_center_median().z > 0.0 else 0
+    # Exporting triangulates quads along their shortest diagonal, which the key can change for the object copy.
+    bmesh.ops.triangulate(bm, faces=bm.faces[:])
+    mesh = bpy.data.meshes.new(name)
+    bm.to_mesh(mesh)
+    bm.free()
+    mesh.materials.append(bpy.data.materials.new(f'{name}_bottom'))
+    mesh.materials.append(bpy.data.materials.new(f'{name}_top'))
+    if custom_normals:
+        # Bend the normals towards +Y, like the custom normals of imported meshes.
+        normals = np.zeros(len(mesh.loops) * 3, dtype=np.float32)
+        mesh.loops.foreach_get('normal', normals)
+        normals = normals.reshape((-1, 3)) + np.array([0.0, 0.5, 0.0])
+        normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+        mesh.normals_split_custom_set(normals.tolist())
+
+    mesh_object = bpy.data.objects.new(name, mesh)
+    bpy.context.collection.objects.link(mesh_object)
+    mesh_object.location = (0.5, -1.0, 2.0)
+    mesh_object.rotation_euler = (0.3, 0.0, 1.2)
+    mesh_object.scale = (1.5, 1.5, 1.5)
+
+    mesh_object.shape_key_add(name='Basis')
+    key_block = mesh_object.shape_key_add(name=SHAPE_KEY_NAME)
+    # Move the front of the sphere across the material seam, leaving the rest of the sphere where it is.
+    for point in key_block.data:
+        if point.co.y < -0.5:
+            point.co.y += 0.3 * point.co.y
+            point.co.z *= 0.5
+    return mesh_object
+
+def export_arrays(export_model, mesh_conversion, mesh_object: bpy.types.Object) -> dict[int, object]:
+    context = bpy.context
+    mesh_object_copy = mesh_object.copy()
+    mesh_object_copy.data = mesh_object.data.copy()
+    context.collection.objects.link(mesh_object_copy)
+    export_meshes = export_model.process_mesh(Operator(), context, mesh_object_copy, mesh_object.name, 'IGNORE', 'REST')
+    corner_mesh = export_model.make_corner_mesh(context, mesh_object, export_meshes[0].mesh_data, mesh_object.name)
+    return corner_mesh, {export_mesh.material_index: mesh_conversion.get_material_corners(corner_mesh, export_mesh.material_index)
+                         for export_mesh in export_meshes}
+
+def angles(expected: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    expected = expected[:, :3].astype(np.float64)
+    actual = actual[:, :3].astype(np.float64)
+    cosines = np.sum(expected * actual, axis=1)
+    cosines /= np.maximum(np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1), 1e-20)
+    return np.degrees(np.arccos(np.clip(cosines, -1.0, 1.0)))
+
+@pytest.mark.parametrize('name,flat,custom_normals', [
+    ('smooth', lambda face: False, False),
+    # The front faces are flat, so the key bends coplanar flat faces.
+    ('flat_front', lambda face: face.calc_center_median().y < -0.3, False),
+    ('custom_normals', lambda face: False, True),
+])
+def test_matches_object_copy(package, name, flat, custom_normals):
+    export_model = importlib.import_module(f'{PACKAGE}.source.model.export_model')
+    mesh_conversion = importlib.import_module(f'{PACKAGE}.source.model.mesh.mesh_conversion')
+    shape_key_variants = importlib.import_module(f'{PACKAGE}.source.model.mesh.shape_key_variants')
+
+    mesh_object = make_object(name, flat, custom_normals)
+    (shape_key_copy,) = export_model.split_mesh_shape_keys_to_new_meshes(Operator(), bpy.context, mesh_object)
+    base, material_corners = export_arrays(export_model, mesh_conversion, mesh_object)
+    copy, copy_material_corners = export_arrays(export_model, mesh_conversion, shape_key_copy)
+    positions, corner_normals, moved_vertices = export_model.get_shape_key_corner_data(mesh_object, SHAPE_KEY_NAME, base)
+    assert np.any(moved_vertices) and not np.all(moved_vertices)
+
+    shape_key = shape_key_variants.make_shape_key_corner_mesh(base, positions, corner_normals, moved_vertices)
+    for material_index, corners in material_corners.items():
+        actual = mesh_conversion.convert_corner_mesh(shape_key, corners, name, material_index)
+        expected = mesh_conversion.convert_corner_mesh(copy, copy_material_corners[material_index], name, material_index)
+
+        # Normals on the edge of the 1/1024 grid can split vertices differently, so compare the vertex of each corner instead.
+        actual_corners = actual.vertex_indices.astype(np.int64)
+        expected_corners = expected.vertex_indices.astype(np.int64)
+        assert np.array_equal(actual.source_vertex_indices[actual_corners], expected.source_vertex_indices[expected_corners])
+        assert np.allclose(actual.positions[actual_corners], expected.positions[expected_corners], atol=1e-5)
+        assert angles(expected.normals[expected_corners], actual.normals[actual_corners]).max() < TOLERANCE_DEGREES
+        assert angles(expected.tangents[expected_corners], actual.tangents[actual_corners]).max() < TOLERANCE_DEGREES
+        assert np.array_equal(actual.tangents[actual_corners, 3], expected.tangents[expected_corners, 3])
+
+        # Vertices away from the key keep the base mesh normals and tangents exactly.
+        base_arrays = mesh_conversion.convert_corner_mesh(base, corners, name, material_index)
+        affected = shape_key_variants.get_affected_vertices(base.corner_vertices, moved_vertices)
+        unaffected = ~np.isin(actual.source_vertex_indices, base.source_vertex_indices[affected])
+        assert np.any(unaffected)
+        # Vertices are split by normal and UV, so those find the same vertex in the base mesh.
+        def vertex_keys(arrays):
+            (_, uvs), = arrays.texture_coordinates
+            return [(source, *normal, *uv) for source, normal, uv in zip(arrays.source_vertex_indices, arrays.normals.tolist(), uvs.tolist())]
+        base_vertex_indices = {key: index for index, key in enumerate(vertex_keys(base_arrays))}
+        actual_keys = vertex_keys(actual)
+        for index in np.flatnonzero(unaffected):
+            assert np.array_equal(actual.tangents[index], base_arrays.tangents[base_vertex_indices[actual_keys[index]]])
+
+def test_non_uniform_scale_uses_object_copies(package):
+    export_model = importlib.import_module(f'{PACKAGE}.source.model.export_model')
+    mesh_object = make_object('non_uniform_scale', lambda face: False, False)
+    assert export_model.can_split_shape_keys_from_arrays(mesh_object, 'IGNORE', 'REST')
+    # Smooth normals weight faces by corner angles, which change under non uniform scale.
+    mesh_object.scale = (1.0, 2.0, 0.5)
+    assert not export_model.can_split_shape_keys_from_arrays(mesh_object, 'IGNORE', 'REST')
@@ -0,0 +1,154 @@
+"""
+Compares the 'VECTORIZED' export tangents against blender's MikkTSpace tangents from calc_tangents on sample meshes.
+The samples cover UV seams, mirrored UVs, degenerate UVs and mixed smooth and flat shading,
+with and without the vertex cache optimization.
+    python -m pytest test/test_tangent_parity.py
+"""
+
+import sys
+import math
+import importlib
+import importlib.util
+
+from pathlib import Path
+
+import pytest
+import numpy as np
+
+bpy = pytest.importorskip('bpy')
+import bmesh
+
+PACKAGE = 'smush_blender_tangent_parity'
+UV_NAME = 'map1'
+# The largest allowed angle between tangents in degrees.
+TOLERANCE_DEGREES = 1.0
+
+
+@pytest.fixture(scope='module')
+def mesh_conversion():
+    root = Path(__file__).parent.parent
+    spec = importlib.util.spec_from_file_location(PACKAGE, root / '__init__.py', submodule_search_locations=[str(root)])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE] = package
+    spec.loader.exec_module(package)
+    package.register()
+    yield importlib.import_module(f'{PACKAGE}.source.model.mesh.mesh_conversion')
+    package.unregister()
+
+def set_smooth(bm: bmesh.types.BMesh, smooth):
+    for face in bm.faces:
+        face.smooth = smooth(face)
+
+def make_uv_sphere(bm: bmesh.types.BMesh):
+    bmesh.ops.create_uvsphere(bm, u_segments=32, v_segments=16, radius=1.0, calc_uvs=True)
+    set_smooth(bm, lambda face: True)
+
+def make_flat_cube(bm: bmesh.types.BMesh):
+    bmesh.ops.create_cube(bm, size=2.0, calc_uvs=True)
+    set_smooth(bm, lambda face: False)
+
+def make_smooth_and_flat_cylinder(bm: bmesh.types.BMesh):
+    bmesh.ops.create_cone(bm, cap_ends=True, segments=24, radius1=1.0, radius2=1.0, depth=2.0, calc_uvs=True)
+    # Smooth sides with flat caps, so the vertices on the rim are split by normal.
+    set_smooth(bm, lambda face: len(face.verts) == 4)
+
+def make_wavy_grid(bm: bmesh.types.BMesh):
+    bmesh.ops.create_grid(bm, x_segments=24, y_segments=24, size=1.0, calc_uvs=True)
+    for vert in bm.verts:
+        vert.co.z = 0.2 * math.sin(vert.co.x * 4.0) * math.cos(vert.co.y * 3.0)
+    set_smooth(bm, lambda face: True)
+
+def make_mirrored_uvs(bm: bmesh.types.BMesh):
+    # The left half uses the same UVs as the right half mirrored, like a symmetrical character texture.
+    make_wavy_grid(bm)
+    uv_layer = bm.loops.layers.uv.active
+    for face in bm.faces:
+        for loop in face.loops:
+            if loop.vert.co.x < 0.0:
+                loop[uv_layer].uv.x = 1.0 - loop[uv_layer].uv.x
+
+def make_degenerate_uvs(bm: bmesh.types.BMesh):
+    # Some faces have every UV at one point, and some have every UV on one line.
+    make_wavy_grid(bm)
+    uv_layer = bm.loops.layers.uv.active
+    for index, face in enumerate(bm.faces):
+        if index % 7 == 0:
+            for loop in face.loops:
+                loop[uv_layer].uv = (0.5, 0.5)
+        elif index % 11 == 0:
+            for loop in face.loops:
+                loop[uv_layer].uv.y = 0.25
+
+def make_monkey(bm: bmesh.types.BMesh):
+    bmesh.ops.create_monkey(bm, calc_uvs=True)
+    set_smooth(bm, lambda face: True)
+
+SAMPLE_MESHES = {
+    'uv_sphere_seams': make_uv_sphere,
+    'flat_cube': make_flat_cube,
+    'smooth_and_flat_cylinder': make_smooth_and_flat_cylinder,
+    'mirrored_uvs': make_mirrored_uvs,
+    'degenerate_uvs': make_degenerate_uvs,
+    'monkey': make_monkey,
+}
+
+def read(collection, attribute: str, components: int, dtype) -> np.ndarray:
+    values = np.zeros(len(collection) * components, dtype=dtype)
+    collection.foreach_get(attribute, values)
+    return values.reshape((-1, components)) if components > 1 else values
+
+def make_blender_mesh(name: str, build) -> bpy.types.Mesh:
+    bm = bmesh.new()
+    # calc_uvs fills the existing UV layer.
+    bm.loops.layers.uv.new(UV_NAME)
+    build(bm)
+    # The exporter triangulates before calc_tangents, so do the same here.
+    bmesh.ops.triangulate(bm, faces=bm.faces[:])
+    mesh = bpy.data.meshes.new(name)
+    bm.to_mesh(mesh)
+    bm.free()
+    mesh.calc_tangents(uvmap=UV_NAME)
+    return mesh
+
+def make_corner_meshes(mesh_conversion, mesh: bpy.types.Mesh):
+    '''
+    Returns (blender, vectorized) CornerMesh, where only the blender one has precalculated tangents.
+    '''
+    triangle_count = len(mesh.polygons)
+    blender = mesh_conversion.CornerMesh(
+        positions=read(mesh.vertices, 'co', 3, np.float32),
+        corner_vertices=read(mesh.loops, 'vertex_index', 1, np.uint32),
+        corner_normals=read(mesh.loops, 'normal', 3, np.float32),
+        corner_uvs=[(UV_NAME, read(mesh.uv_layers[UV_NAME].data, 'uv', 2, np.float32))],
+        colors=[],
+        corner_tangents=read(mesh.loops, 'tangent', 3, np.float32),
+        corner_bitangent_signs=read(mesh.loops, 'bitangent_sign', 1, np.float32),
+        tangent_uv_name=UV_NAME,
+        triangle_materials=np.zeros(triangle_count, dtype=np.int32),
+        weight_vertex_indices=np.zeros(0, dtype=np.int64),
+        weight_group_indices=np.zeros(0, dtype=np.int64),
+        weights=np.zeros(0, dtype=np.float32),
+        group_names=[],
+        source_vertex_indices=None,
+    )
+    return blender, blender._replace(corner_tangents=None, corner_bitangent_signs=None)
+
+@pytest.mark.parametrize('name', SAMPLE_MESHES)
+# Reordering triangles for the vertex cache shouldn't change which corner picks each vertex's tangent.
+@pytest.mark.parametrize('optimize_vertex_cache', [False, True])
+def test_matches_calc_tangents(mesh_conversion, name, optimize_vertex_cache):
+    mesh = make_blender_mesh(f'{name}_{optimize_vertex_cache}', SAMPLE_MESHES[name])
+    blender_mesh, vectorized_mesh = make_corner_meshes(mesh_conversion, mesh)
+    corners = mesh_conversion.get_material_corners(blender_mesh, 0)
+    expected = mesh_conversion.convert_corner_mesh(blender_mesh, corners, name, 0, optimize_vertex_cache)
+    actual = mesh_conversion.convert_corner_mesh(vectorized_mesh, corners, name, 0, optimize_vertex_cache)
+    # Both use the same vertex splitting, since tangents aren't part of the vertex key.
+    assert np.array_equal(expected.vertex_indices, actual.vertex_indices)
+
+    expected_tangents = expected.tangents[:, :3].astype(np.float64)
+    actual_tangents = actual.tangents[:, :3].astype(np.float64)
+    cosines = np.sum(expected_tangents * actual_tangents, axis=1)
+    cosines /= np.maximum(np.linalg.norm(expected_tangents, axis=1) * np.linalg.norm(actual_tangents, axis=1), 1e-20)
+    angles = np.degrees(np.arccos(np.clip(cosines, -1.0, 1.0)))
+    assert angles.max(initial=0.0) < TOLERANCE_DEGREES
+    assert np.array_equal(expected.tangents[:, 3], actual.tangents[:, 3])
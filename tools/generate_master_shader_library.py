@@ -0,0 +1,30 @@
+"""
+Builds the "Smash Ultimate Master Shader" node group and saves it as the library that importing materials appends.
+Run this after changing matl_params, material_inputs or master_shader, and commit the new .blend file:
+    blender -b --factory-startup --python tools/generate_master_shader_library.py
+The file name contains a checksum of the sockets and nodes they define, so an out of date library is ignored and the node group is built instead.
+"""
+
+import sys
+import importlib
+import importlib.util
+
+from pathlib import Path
+
+PACKAGE = 'smush_blender_generate_library'
+
+
+def main():
+    root = Path(__file__).parent.parent
+    spec = importlib.util.spec_from_file_location(PACKAGE, root / '__init__.py', submodule_search_locations=[str(root)])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE] = package
+    spec.loader.exec_module(package)
+    package.register()
+
+    master_shader = importlib.import_module(f'{PACKAGE}.source.model.material.master_shader')
+    library_path = master_shader.save_master_shader_library()
+    print(f'Saved the master shader library to {library_path}')
+
+if __name__ == '__main__':
+    main()